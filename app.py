@@ -1,10 +1,28 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from scipy import stats
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 import os
+import time
+import uuid
+
+from energia.background import BackgroundBuilds
+from energia.charts import needs_aggregation
+from energia.clients import parse_ids
+from energia.dataset import HotReloader, build_dataset
+from energia.export import EXPORT_FORMATS, export_file
+from energia.memo import FilterMemo
+from energia.ordering import PAGE_SIZE
+from energia.panels import (ORDEN_TABLA, PANEL_TIMES, get_bloques_tabla, get_estados_ineficientes,
+                            get_ineficientes, get_kpis, get_mascara_ineficientes, get_panel,
+                            get_selection, panel_args, prewarm_version)
+from energia.periods import STORE_DIR, list_periods, load_periods
+from energia.prewarm import PrewarmRunner
+from energia.profiling import (SUMMARY_TAIL, RerunProfiler, profiling_requested, read_log,
+                               summarize)
+from energia.query import open_backend
+from energia.simulation import DEFAULT_COST_M2, N_SIMS, SIM_WORKERS, Scenario, simulate
 
 # ============================================================
 # CONFIGURACIÓN DE LA PÁGINA
@@ -16,14 +34,19 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Perfilado opcional del rerun (ENERGIA_PROFILE=1 o ?debug=1)
+prof = RerunProfiler(profiling_requested(st.query_params),
+                     session_id=st.session_state.setdefault('profile_session', uuid.uuid4().hex[:12]))
+
 # ============================================================
 # CSS PERSONALIZADO — Diseño profesional de portafolio
 # ============================================================
 st.markdown("""
 <style>
-    /* Tipografía */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    html, body, [class*="css"] { font-family: 'Inter', sans-serif; }
+    /* Tipografía del sistema: no se descargan fuentes externas */
+    html, body, [class*="css"] {
+        font-family: system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif;
+    }
 
     /* Fondo principal */
     .stApp { background: linear-gradient(135deg, #0f0c29 0%, #302b63 50%, #24243e 100%); }
@@ -68,15 +91,15 @@ st.markdown("""
         border-radius: 12px !important;
     }
     
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] { gap: 8px; }
-    .stTabs [data-baseweb="tab"] {
+    /* Selector de paneles (radio horizontal con aspecto de pestañas) */
+    .st-key-panel_activo div[role="radiogroup"] { gap: 8px; }
+    .st-key-panel_activo div[role="radiogroup"] label {
         background: rgba(255,255,255,0.05);
         border-radius: 8px;
         color: #a5b4fc;
         padding: 8px 20px;
     }
-    .stTabs [aria-selected="true"] {
+    .st-key-panel_activo div[role="radiogroup"] label:has(input:checked) {
         background: rgba(99, 102, 241, 0.3) !important;
         color: #fff !important;
     }
@@ -98,38 +121,96 @@ st.markdown("""
 # ============================================================
 # CARGA DE DATOS
 # ============================================================
-@st.cache_data
-def load_data():
-    """Carga el CSV y genera métricas derivadas."""
-    # Determinar la ruta del archivo
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(script_dir, 'energy_consumption_mexico.csv')
-    
-    df = pd.read_csv(csv_path)
-    
-    # Métricas derivadas
-    df['costo_por_m2'] = df['costo_energia_mxn'] / df['superficie_m2']
-    df['costo_por_ocupante'] = df['costo_energia_mxn'] / df['ocupantes']
-    
-    # Eficiencia relativa (0 = más eficiente, 1 = menos eficiente)
-    min_val = df['costo_por_m2'].min()
-    max_val = df['costo_por_m2'].max()
-    df['eficiencia_relativa'] = (df['costo_por_m2'] - min_val) / (max_val - min_val)
+CSV_PATH = os.environ.get(
+    'ENERGIA_CSV',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'energy_consumption_mexico.csv'))
+
+
+@st.cache_resource
+def load_memo():
+    """Caché LRU de resultados por selección de filtros, compartida entre sesiones."""
+    return FilterMemo()
+
+
+@st.cache_resource
+def load_background_pool():
+    """Un hilo en segundo plano para pre-calcular los paneles no visibles."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='paneles')
+
+
+@st.cache_resource
+def load_prewarm_runner():
+    """Pre-cálculo de las selecciones comunes; uno por versión del dataset."""
+    return PrewarmRunner(load_background_pool())
+
+
+@st.cache_resource
+def load_reloader():
+    """Dataset del CSV compartido por todas las sesiones, recargado en segundo plano si cambia.
+
+    El DataFrame no se copia por sesión (sus columnas apuntan al memory-map del
+    snapshot), así que es de sólo lectura; junto con él se arman el umbral P75,
+    el cubo y los índices de la versión. Cada versión nueva lanza su
+    pre-cálculo en cuanto se publica, sin esperar al siguiente rerun.
+    """
+    reloader = HotReloader(CSV_PATH)
+    runner, memo_compartida = load_prewarm_runner(), load_memo()
+    reloader.subscribe('prewarm', lambda nuevo: prewarm_version(runner, memo_compartida, nuevo))
+    return reloader
+
+
+# Combinaciones de periodos con su Dataset en memoria (las usadas más recientemente)
+MAX_PERIOD_DATASETS = int(os.environ.get('ENERGIA_PERIOD_DATASETS', 3))
+
+
+@st.cache_resource(max_entries=MAX_PERIOD_DATASETS)
+def load_period_dataset(periodos):
+    """Dataset de los ``periodos`` elegidos, leyendo sólo sus particiones del almacén.
+
+    Cada combinación guarda el DataFrame, el cubo y todos los índices, así que
+    sólo se conservan las ``MAX_PERIOD_DATASETS`` más recientes.
+    """
+    df = load_periods(periodos, STORE_DIR)
+    return build_dataset(df, open_backend(periodos=periodos, store=STORE_DIR, df=df))
+
+# Periodos de facturación disponibles (vacío si no hay almacén por periodos)
+periodos_disponibles = list_periods(STORE_DIR)
+
+with st.sidebar:
+    st.markdown("## ⚡ Panel de Control")
+    st.markdown("---")
     
-    return df
+    periodos = None
+    if periodos_disponibles:
+        st.markdown("### 🗓️ Periodo")
+        periodos = tuple(st.multiselect(
+            "Periodo de facturación",
+            options=periodos_disponibles,
+            default=periodos_disponibles[-1:]
+        )) or tuple(periodos_disponibles[-1:])
 
-df = load_data()
+# Se lee la versión actual una sola vez: todo el rerun usa el mismo Dataset
+# aunque una recarga la reemplace mientras tanto
+with prof.section('carga_datos'):
+    reloader = None if periodos else load_reloader()
+    datos = load_period_dataset(periodos) if periodos else reloader.current
 
-# Umbral global de ineficiencia (Percentil 75)
-UMBRAL_INEFICIENCIA = df['costo_por_m2'].quantile(0.75)
+df = datos.df
+UMBRAL_P75 = datos.umbral
+cube = datos.cube
+threshold_index = datos.threshold_index
+mw_engine = datos.mw_engine
+peer_index, peer_scores = datos.peer_index, datos.peer_scores
+client_index = datos.client_index
+sort_index = datos.sort_index
+
+# Con perfilado activo cada consulta a la caché se registra como sección
+memo = prof.wrap_memo(load_memo())
 
 # ============================================================
 # SIDEBAR — Filtros y Metadata
 # ============================================================
 with st.sidebar:
-    st.markdown("## ⚡ Panel de Control")
-    st.markdown("---")
-    
     st.markdown("### 🔎 Filtros")
     tipo_filter = st.multiselect(
         "Tipo de Cliente",
@@ -143,6 +224,26 @@ with st.sidebar:
         default=sorted(df['estado'].unique())
     )
     
+    # Umbral what-if: por defecto el P75 global de costo/m²
+    st.markdown("### 🎚️ Umbral de Ineficiencia")
+    modo_umbral = st.radio("Definir por", ['Percentil', 'MXN/m²'], horizontal=True,
+                           key='modo_umbral')
+    if modo_umbral == 'Percentil':
+        percentil_umbral = st.slider("Percentil global de costo/m²", 50, 99, 75,
+                                     key='percentil_umbral')
+        UMBRAL_INEFICIENCIA = threshold_index.quantile(percentil_umbral / 100)
+    else:
+        UMBRAL_INEFICIENCIA = st.slider(
+            "Costo/m² (MXN)",
+            min_value=round(float(threshold_index.quantile(0.01)), 2),
+            max_value=round(float(threshold_index.quantile(0.99)), 2),
+            value=round(float(UMBRAL_P75), 2),
+            step=0.05,
+            key='umbral_m2'
+        )
+    ETIQUETA_UMBRAL = f"P{threshold_index.percentile_of(UMBRAL_INEFICIENCIA):.0f}"
+    st.caption(f"Costo/m² > ${UMBRAL_INEFICIENCIA:.2f} ({ETIQUETA_UMBRAL} global)")
+    
     st.markdown("---")
     st.markdown("### 📋 Sobre este proyecto")
     st.markdown("""
@@ -159,10 +260,13 @@ with st.sidebar:
 # ============================================================
 # FILTRAR DATOS
 # ============================================================
-df_filtered = df[
-    (df['tipo_cliente'].isin(tipo_filter)) &
-    (df['estado'].isin(estado_filter))
-]
+with prof.section('filtro', rows=len(df)):
+    # Máscara de filas, celdas del cubo, clave canónica (con la que se memoizan
+    # los cálculos de abajo) y vista por posiciones de las filas filtradas
+    sel = get_selection(datos, tipo_filter, estado_filter)
+df_filtered = sel.rows
+filter_key = sel.key
+prof.rows = len(df_filtered)
 
 # ============================================================
 # HEADER
@@ -176,11 +280,12 @@ st.markdown("---")
 # ============================================================
 col1, col2, col3, col4 = st.columns(4)
 
-avg_cost = df_filtered['costo_energia_mxn'].mean()
-avg_cost_m2 = df_filtered['costo_por_m2'].mean()
-avg_cost_occ = df_filtered['costo_por_ocupante'].mean()
-pct_ineficientes = (df_filtered['costo_por_m2'] > UMBRAL_INEFICIENCIA).mean() * 100
-n_ineficientes = (df_filtered['costo_por_m2'] > UMBRAL_INEFICIENCIA).sum()
+kpis = get_kpis(datos, memo, sel, UMBRAL_INEFICIENCIA)
+avg_cost = kpis['avg_cost']
+avg_cost_m2 = kpis['avg_cost_m2']
+avg_cost_occ = kpis['avg_cost_occ']
+pct_ineficientes = kpis['pct_ineficientes']
+n_ineficientes = kpis['n_ineficientes']
 
 col1.metric("💰 Costo Promedio Mensual", f"${avg_cost:,.0f} MXN")
 col2.metric("📐 Costo / m²", f"${avg_cost_m2:.2f} MXN")
@@ -190,53 +295,21 @@ col4.metric("🚨 Clientes Ineficientes", f"{n_ineficientes:,} ({pct_ineficiente
 st.markdown("---")
 
 # ============================================================
-# GRÁFICOS PRINCIPALES (Tabs)
+# GRÁFICOS PRINCIPALES (Paneles)
 # ============================================================
-tab1, tab2, tab3, tab4 = st.tabs([
-    "📊 Costos por Estado", 
-    "🔬 Superficie vs Costo", 
-    "📈 Distribuciones",
-    "🗺️ Mapa de Ineficiencia"
-])
-
-# --- TAB 1: Top estados ---
-with tab1:
+# Sólo se calcula el panel visible. Cada panel separa la construcción de
+# figuras/tablas (energia.panels, memoizada por filtros) del dibujo con
+# Streamlit, así que los demás paneles pueden prepararse en segundo plano y
+# reutilizarse al abrirse.
+def render_costos(panel):
     col_a, col_b = st.columns([3, 2])
     
     with col_a:
-        top_states = (df_filtered.groupby('estado')['costo_por_m2']
-                      .mean()
-                      .sort_values(ascending=True)
-                      .tail(15)
-                      .reset_index())
-        
-        fig_bar = px.bar(
-            top_states,
-            x='costo_por_m2',
-            y='estado',
-            orientation='h',
-            title="Top 15 Estados — Costo Promedio por m²",
-            labels={'costo_por_m2': 'Costo / m² (MXN)', 'estado': ''},
-            color='costo_por_m2',
-            color_continuous_scale='Inferno'
-        )
-        fig_bar.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font_color='#cbd5e1',
-            title_font_size=18,
-            showlegend=False,
-            coloraxis_showscale=False,
-            height=500
-        )
-        st.plotly_chart(fig_bar, width='stretch')
+        plotly_chart('fig_bar', panel['fig_bar'])
     
     with col_b:
         st.markdown("#### 🔍 Interpretación")
-        top5 = (df_filtered.groupby('estado')['costo_por_m2']
-                .mean()
-                .sort_values(ascending=False)
-                .head(5))
+        top5 = panel['top5']
         
         st.markdown(f"""
         **Estado más caro:** {top5.index[0]} con **${top5.iloc[0]:.2f} MXN/m²**
@@ -248,147 +321,54 @@ with tab1:
         
         st.markdown(f"""
         ---
-        **Promedio nacional:** ${df_filtered['costo_por_m2'].mean():.2f}/m²
+        **Promedio nacional:** ${avg_cost_m2:.2f}/m²
         
         Los estados con mayor costo superan el promedio 
-        en un **{((top5.iloc[0] / df_filtered['costo_por_m2'].mean()) - 1) * 100:.1f}%**.
+        en un **{((top5.iloc[0] / avg_cost_m2) - 1) * 100:.1f}%**.
         """)
 
-# --- TAB 2: Scatter ---
-with tab2:
-    fig_scatter = px.scatter(
-        df_filtered,
-        x='superficie_m2',
-        y='costo_energia_mxn',
-        color='tipo_cliente',
-        size='ocupantes',
-        title="Correlación: Superficie vs Costo Energético",
-        labels={
-            'superficie_m2': 'Superficie (m²)',
-            'costo_energia_mxn': 'Costo Mensual (MXN)',
-            'tipo_cliente': 'Tipo'
-        },
-        opacity=0.5,
-        color_discrete_map={'Residencial': '#6366f1', 'Comercial': '#f97316'},
-        hover_data=['cliente_id', 'estado', 'costo_por_m2']
-    )
-    
-    # Línea de tendencia
-    z = np.polyfit(df_filtered['superficie_m2'], df_filtered['costo_energia_mxn'], 1)
-    x_line = np.linspace(df_filtered['superficie_m2'].min(), df_filtered['superficie_m2'].max(), 100)
-    y_line = z[0] * x_line + z[1]
-    fig_scatter.add_trace(go.Scatter(
-        x=x_line, y=y_line,
-        mode='lines',
-        name=f'Tendencia (pendiente={z[0]:.2f})',
-        line=dict(color='#f43f5e', width=2, dash='dash')
-    ))
-    
-    fig_scatter.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font_color='#cbd5e1',
-        title_font_size=18,
-        height=550
-    )
-    st.plotly_chart(fig_scatter, width='stretch')
+
+def render_scatter(panel):
+    plotly_chart('fig_scatter', panel['fig_scatter'])
+    if panel['agregado']:
+        st.caption(f"⚙️ Agregado en servidor: {panel['n_filas']:,} filas → {panel['n_puntos']:,} "
+                   f"{'celdas' if panel['modo'] == 'Densidad' else 'puntos'} · "
+                   f"payload {panel['payload'] / 1024:,.0f} KB")
     
     st.info(f"""
-    📌 **Interpretación:** La pendiente de la regresión es **{z[0]:.2f} MXN por m² adicional**. 
+    📌 **Interpretación:** La pendiente de la regresión es **{panel['pendiente']:.2f} MXN por m² adicional**. 
     Los puntos que se encuentran muy por encima de la línea roja son clientes con potencial de mejora.
-    Correlación (Pearson): **{df_filtered['superficie_m2'].corr(df_filtered['costo_energia_mxn']):.3f}**
+    Correlación (Pearson): **{panel['pearson']:.3f}**
     """)
 
-# --- TAB 3: Distribuciones ---
-with tab3:
+
+def render_distribuciones(panel):
     col_d1, col_d2 = st.columns(2)
     
     with col_d1:
-        fig_hist = px.histogram(
-            df_filtered,
-            x='costo_energia_mxn',
-            color='tipo_cliente',
-            marginal='box',
-            title="Distribución de Costo Energético",
-            labels={'costo_energia_mxn': 'Costo (MXN)', 'tipo_cliente': 'Tipo'},
-            color_discrete_map={'Residencial': '#6366f1', 'Comercial': '#f97316'},
-            barmode='overlay',
-            opacity=0.7
-        )
-        fig_hist.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font_color='#cbd5e1',
-            height=450
-        )
-        st.plotly_chart(fig_hist, width='stretch')
+        plotly_chart('fig_hist', panel['fig_hist'])
+        if panel['agregado']:
+            st.caption(f"⚙️ Agregado en servidor: {panel['n_filas']:,} filas → {panel['n_bins']} bins · "
+                       f"payload {panel['payload'] / 1024:,.0f} KB")
     
     with col_d2:
-        # Heatmap de correlación
-        numeric_cols = ['superficie_m2', 'ocupantes', 'costo_energia_mxn', 
-                        'costo_por_m2', 'costo_por_ocupante', 'eficiencia_relativa']
-        corr_matrix = df_filtered[numeric_cols].corr()
-        
-        fig_heatmap = px.imshow(
-            corr_matrix,
-            text_auto='.2f',
-            title="Matriz de Correlación",
-            color_continuous_scale='RdBu_r',
-            aspect='auto'
-        )
-        fig_heatmap.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font_color='#cbd5e1',
-            height=450
-        )
-        st.plotly_chart(fig_heatmap, width='stretch')
+        plotly_chart('fig_heatmap', panel['fig_heatmap'])
+
 
-# --- TAB 4: Mapa de Ineficiencia ---
-with tab4:
+def render_ineficiencia(panel):
     col_m1, col_m2 = st.columns([3, 2])
     
     with col_m1:
-        inef_by_state = (df_filtered
-                         .groupby('estado')
-                         .agg(
-                             pct_ineficientes=('costo_por_m2', lambda x: (x > UMBRAL_INEFICIENCIA).mean() * 100),
-                             costo_medio_m2=('costo_por_m2', 'mean'),
-                             n_clientes=('cliente_id', 'count')
-                         )
-                         .reset_index()
-                         .sort_values('pct_ineficientes', ascending=True))
-        
-        fig_inef = px.bar(
-            inef_by_state,
-            x='pct_ineficientes',
-            y='estado',
-            orientation='h',
-            title="Porcentaje de Clientes Ineficientes por Estado",
-            labels={'pct_ineficientes': '% Ineficientes', 'estado': ''},
-            color='pct_ineficientes',
-            color_continuous_scale='YlOrRd',
-            hover_data=['costo_medio_m2', 'n_clientes']
-        )
-        fig_inef.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font_color='#cbd5e1',
-            title_font_size=18,
-            coloraxis_showscale=False,
-            height=600
-        )
-        st.plotly_chart(fig_inef, width='stretch')
+        plotly_chart('fig_inef', panel['fig_inef'])
     
     with col_m2:
         st.markdown("#### 📊 Estadísticas de Ineficiencia")
         
         # Mann-Whitney
-        comercial = df_filtered[df_filtered['tipo_cliente'] == 'Comercial']['costo_por_m2']
-        residencial = df_filtered[df_filtered['tipo_cliente'] == 'Residencial']['costo_por_m2']
+        mw = panel['mw']
         
-        if len(comercial) > 0 and len(residencial) > 0:
-            _, p_val = stats.mannwhitneyu(comercial, residencial)
+        if mw['n_a'] > 0 and mw['n_b'] > 0:
+            p_val = mw['p_value']
             significativo = "✅ Sí" if p_val < 0.05 else "❌ No"
             
             st.markdown(f"""
@@ -399,57 +379,304 @@ with tab4:
             |:--------|:------|
             | p-value | {p_val:.4f} |
             | ¿Significativo? | {significativo} |
-            | Media Comercial | ${comercial.mean():.2f}/m² |
-            | Media Residencial | ${residencial.mean():.2f}/m² |
+            | Media Comercial | ${mw['mean_a']:.2f}/m² |
+            | Media Residencial | ${mw['mean_b']:.2f}/m² |
             """)
+            
+            with st.expander("Significancia por estado"):
+                por_estado = panel['mw_por_estado']
+                st.dataframe(
+                    por_estado[['n_a', 'n_b', 'p_value']]
+                    .rename(columns={'n_a': 'n Comercial', 'n_b': 'n Residencial'})
+                    .assign(significativo=por_estado['p_value'] < 0.05),
+                    use_container_width=True
+                )
         
         st.markdown("---")
         
         # Ahorro potencial
-        inef_df = df_filtered[df_filtered['costo_por_m2'] > UMBRAL_INEFICIENCIA]
-        promedio_global = df_filtered['costo_por_m2'].mean()
+        ahorro = panel['ahorro']
         
-        if len(inef_df) > 0:
-            ahorro_individual = ((inef_df['costo_por_m2'] - promedio_global) * inef_df['superficie_m2']).mean()
-            ahorro_total = ((inef_df['costo_por_m2'] - promedio_global) * inef_df['superficie_m2']).sum()
+        if ahorro['n_ineficientes'] > 0:
+            ahorro_individual = ahorro['ahorro_individual']
+            ahorro_total = ahorro['ahorro_total']
             
             st.markdown(f"""
             **💡 Oportunidad de Ahorro**
             
             | Concepto | Valor |
             |:---------|:------|
-            | Umbral P75 | ${UMBRAL_INEFICIENCIA:.2f}/m² |
-            | Clientes afectados | {len(inef_df):,} |
+            | Umbral {ETIQUETA_UMBRAL} | ${panel['umbral']:.2f}/m² |
+            | Clientes afectados | {ahorro['n_ineficientes']:,} |
             | Ahorro/cliente/mes | **${ahorro_individual:,.0f} MXN** |
             | Ahorro total/mes | **${ahorro_total:,.0f} MXN** |
             """)
 
+
+def plotly_chart(nombre, fig):
+    """``st.plotly_chart`` que registra el tamaño del payload cuando se perfila."""
+    prof.record_figure(nombre, fig)
+    st.plotly_chart(fig, width='stretch')
+
+
+# Panel -> (nombre en la caché y en energia.panels.BUILDS, dibujo)
+PANELES = {
+    "📊 Costos por Estado": ('panel_costos', render_costos),
+    "🔬 Superficie vs Costo": ('panel_scatter', render_scatter),
+    "📈 Distribuciones": ('panel_distribuciones', render_distribuciones),
+    "🗺️ Mapa de Ineficiencia": ('panel_ineficiencia', render_ineficiencia),
+}
+
+panel_times = PANEL_TIMES
+
+panel_activo = st.radio("Panel", list(PANELES), horizontal=True, key='panel_activo',
+                        label_visibility='collapsed')
+
+modo_scatter = 'Muestra'
+if panel_activo == "🔬 Superficie vs Costo" and needs_aggregation(len(df_filtered)):
+    modo_scatter = st.radio("Vista", ['Muestra', 'Densidad'], horizontal=True, key='modo_scatter')
+
+
+nombre, render = PANELES[panel_activo]
+panel = get_panel(datos, memo, nombre, sel, modo_scatter, UMBRAL_INEFICIENCIA)
+with prof.section(f'render:{nombre}'):
+    render(panel)
+
+
+# La selección por defecto y las populares se calculan una vez por versión (las
+# versiones nuevas de la recarga en caliente ya lo lanzaron al publicarse)
+prewarm_job = prewarm_version(load_prewarm_runner(), load_memo(), datos)
+
+@st.cache_resource
+def load_background_builds():
+    """Cola deduplicada y acotada de paneles en segundo plano, compartida entre sesiones."""
+    return BackgroundBuilds(load_memo(), load_background_pool())
+
+
+ahorro_paneles = sum(panel_times.get(n, 0.0) for p, (n, _) in PANELES.items() if p != panel_activo)
+st.caption(f"⏱️ Paneles no visibles omitidos en este rerun: ~{ahorro_paneles * 1000:,.0f} ms ahorrados · "
+           + " · ".join(f"{p.split(' ', 1)[1]}: {panel_times[n] * 1000:,.0f} ms"
+                        for p, (n, _) in PANELES.items() if n in panel_times))
+
 # ============================================================
 # SECCIÓN: CLIENTES INEFICIENTES (Descargable)
 # ============================================================
 st.markdown("---")
 st.markdown("### 🚨 Tabla de Clientes Ineficientes")
 
-ineficientes_df = df_filtered[df_filtered['costo_por_m2'] > UMBRAL_INEFICIENCIA].sort_values('costo_por_m2', ascending=False)
+# El conteo sale del cubo del umbral (búsqueda binaria por celda); la tabla
+# pagina con la máscara y las posiciones ordenadas sólo se calculan al
+# exportar o simular
+n_ineficientes = kpis['n_ineficientes']
+mascara_inef = get_mascara_ineficientes(datos, memo, sel, UMBRAL_INEFICIENCIA)
 
-st.markdown(f"Mostrando **{len(ineficientes_df):,}** clientes con Costo/m² > **${UMBRAL_INEFICIENCIA:.2f}** (Percentil 75 global)")
+st.markdown(f"Mostrando **{n_ineficientes:,}** clientes con Costo/m² > **${UMBRAL_INEFICIENCIA:.2f}** ({ETIQUETA_UMBRAL} global)")
+n_inef_pares = memo.get('ineficientes_pares', (sel.key, UMBRAL_INEFICIENCIA), lambda: int(
+    np.count_nonzero(mascara_inef & peer_scores['ineficiente_pares'].to_numpy())))
+st.caption(f"👥 {n_inef_pares:,} de ellos también superan el P75 de sus {peer_index.k} edificios "
+           f"más parecidos (mismo tipo y estado, superficie y ocupantes similares)")
 
 with st.expander("📋 Ver tabla completa", expanded=False):
     display_cols = ['cliente_id', 'tipo_cliente', 'estado', 'superficie_m2', 
                     'ocupantes', 'costo_energia_mxn', 'costo_por_m2', 'costo_por_ocupante']
-    st.dataframe(
-        ineficientes_df[display_cols].head(100),
-        use_container_width=True,
-        hide_index=True
-    )
+    # Página servida desde los ordenamientos precalculados de la versión (sin ordenar la selección)
+    n_paginas = max(1, -(-n_ineficientes // PAGE_SIZE))
+    # Si el filtro deja menos páginas, se queda en la última
+    st.session_state['tabla_pagina'] = min(st.session_state.get('tabla_pagina', 1), n_paginas)
+    col_t1, col_t2, col_t3 = st.columns([2, 1, 1])
+    orden_col = col_t1.selectbox("Ordenar por", sort_index.columns,
+                                 index=sort_index.columns.index(ORDEN_TABLA), key='tabla_orden')
+    descendente = col_t2.toggle("Descendente", value=True, key='tabla_desc')
+    pagina = col_t3.number_input(f"Página (de {n_paginas:,})", min_value=1, max_value=n_paginas,
+                                 key='tabla_pagina')
+    with prof.section('tabla_ineficientes', rows=PAGE_SIZE):
+        pagina_pos = sort_index.page(orden_col, mascara_inef, pagina - 1, PAGE_SIZE, descendente,
+                                     get_bloques_tabla(datos, memo, sel, UMBRAL_INEFICIENCIA,
+                                                       orden_col, descendente))
+        st.dataframe(
+            df.iloc[pagina_pos][display_cols]
+            .assign(**peer_scores.iloc[pagina_pos][['pares_mediana_m2', 'percentil_pares']]
+                    .set_axis(df.index[pagina_pos])),
+            use_container_width=True,
+            hide_index=True
+        )
+    if len(pagina_pos):
+        inicio_pagina = (pagina - 1) * PAGE_SIZE
+        st.caption(f"Filas {inicio_pagina + 1:,}–{inicio_pagina + len(pagina_pos):,} "
+                   f"de {n_ineficientes:,}")
     
-    csv = ineficientes_df.to_csv(index=False).encode('utf-8')
-    st.download_button(
-        label="⬇️ Descargar CSV completo de clientes ineficientes",
-        data=csv,
-        file_name='clientes_ineficientes.csv',
-        mime='text/csv',
+    # El archivo se genera sólo al pedirlo, por bloques y directo a disco
+    formato = st.selectbox("Formato de descarga", list(EXPORT_FORMATS), key='formato_export')
+    extension, mime = EXPORT_FORMATS[formato]
+    if st.button("📦 Preparar archivo de clientes ineficientes"):
+        with st.spinner("Generando archivo..."), prof.section('export', rows=n_ineficientes):
+            export_path = export_file(df, get_ineficientes(datos, memo, sel, UMBRAL_INEFICIENCIA),
+                                      formato, (filter_key, UMBRAL_INEFICIENCIA))
+        # El botón se dibuja sólo en el rerun que preparó el archivo; los
+        # siguientes no lo vuelven a leer
+        with open(export_path, 'rb') as f:
+            st.download_button(
+                label=f"⬇️ Descargar {formato} completo ({os.path.getsize(export_path) / 2**20:,.1f} MB)",
+                data=f,
+                file_name='clientes_ineficientes' + extension,
+                mime=mime,
+            )
+
+@st.cache_resource
+def load_sim_pool():
+    """Procesos para la simulación Monte Carlo (``None`` si hay un solo núcleo)."""
+    if SIM_WORKERS <= 1:
+        return None
+    # spawn: no se hace fork del proceso de Streamlit con sus hilos
+    return ProcessPoolExecutor(max_workers=SIM_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+
+with st.expander("🎲 Simulación de programa de retrofit", expanded=False):
+    st.caption(f"Miles de programas posibles sobre los {n_ineficientes:,} clientes ineficientes: "
+               "cada uno se inscribe según la adopción de su estado, reduce su costo un % incierto "
+               "y, con presupuesto, se financian primero los de mayor costo/m².")
+    estados_sim = get_estados_ineficientes(datos, memo, sel, UMBRAL_INEFICIENCIA)
+    col_s1, col_s2 = st.columns(2)
+    with col_s1:
+        adopcion_base = st.slider("Adopción base (%)", 1, 100, 30, key='sim_adopcion')
+        reduccion = st.slider("Reducción del costo (%)", 0, 50, (15, 20), key='sim_reduccion')
+        n_sims = st.select_slider("Simulaciones", [1000, 2000, 5000, 10000], N_SIMS, key='sim_n')
+    with col_s2:
+        presupuesto = st.number_input("Presupuesto (MXN, 0 = sin tope)", min_value=0.0,
+                                      value=0.0, step=100000.0, key='sim_presupuesto')
+        costo_m2 = st.number_input("Costo del retrofit (MXN/m²)", min_value=0.0,
+                                   value=DEFAULT_COST_M2, step=10.0, key='sim_costo_m2')
+    adopcion = st.data_editor(
+        pd.DataFrame({'estado': estados_sim,
+                      'adopcion_pct': float(adopcion_base)}),
+        column_config={'estado': st.column_config.TextColumn("Estado", disabled=True),
+                       'adopcion_pct': st.column_config.NumberColumn("Adopción (%)", min_value=0,
+                                                                     max_value=100)},
+        hide_index=True, use_container_width=True, key=f'sim_adopcion_estado_{adopcion_base}'
     )
+    escenario = Scenario(tuple(adopcion['adopcion_pct'].fillna(0).to_numpy() / 100),
+                         (reduccion[0] / 100, reduccion[1] / 100),
+                         presupuesto or None, costo_m2)
+    sim_key = (filter_key, UMBRAL_INEFICIENCIA, escenario, n_sims)
+    if st.button("▶️ Simular programas") and n_ineficientes:
+        with st.spinner("Simulando..."), prof.section('simulacion', rows=n_ineficientes):
+            inicio = time.perf_counter()
+            ineficientes_pos = get_ineficientes(datos, memo, sel, UMBRAL_INEFICIENCIA)
+            estados_inef = df['estado'].iloc[ineficientes_pos].cat.set_categories(estados_sim)
+            resultado = memo.get('simulacion', (sel.key, UMBRAL_INEFICIENCIA, escenario, n_sims),
+                                 lambda: simulate(
+                                     df['costo_energia_mxn'].to_numpy()[ineficientes_pos],
+                                     df['superficie_m2'].to_numpy()[ineficientes_pos],
+                                     estados_inef, escenario, n_sims, executor=load_sim_pool()))
+            st.session_state['simulacion'] = (sim_key, resultado, time.perf_counter() - inicio)
+
+    simulacion = st.session_state.get('simulacion')
+    if simulacion and simulacion[0] == sim_key:
+        _, resultado, segundos = simulacion
+        total = resultado.loc['Total']
+        c1, c2, c3 = st.columns(3)
+        c1.metric("💰 Ahorro anual (P50)", f"${total['anual_p50']:,.0f}",
+                  f"P5–P95: ${total['anual_p5']:,.0f} – ${total['anual_p95']:,.0f}", delta_color='off')
+        c2.metric("🔧 Retrofits (P50)", f"{total['retrofits_p50']:,.0f}")
+        c3.metric("🏗️ Inversión (P50)", f"${total['inversion_p50']:,.0f}")
+        st.dataframe(resultado.round(0), use_container_width=True)
+        st.caption(f"{n_sims:,} programas simulados en {segundos:.2f} s")
+
+# ============================================================
+# SECCIÓN: DETALLE DE CLIENTE
+# ============================================================
+st.markdown("### 🔍 Detalle de Cliente")
+
+cliente = st.text_input("ID de cliente", placeholder="CLIENTE_0001", key='cliente_detalle')
+if cliente:
+    with prof.section('detalle_cliente', rows=1):
+        pos = client_index.position(cliente.strip())
+    if pos is None:
+        st.warning(f"No se encontró el cliente '{cliente}'.")
+    else:
+        detalle = client_index.details([cliente.strip()], UMBRAL_INEFICIENCIA).iloc[0]
+        score = peer_scores.iloc[pos]
+        st.markdown(f"**{detalle['cliente_id']}** · {detalle['tipo_cliente']} · {detalle['estado']} · "
+                    f"{detalle['superficie_m2']} m² · {detalle['ocupantes']} ocupantes")
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("📐 Costo / m²", f"${detalle['costo_por_m2']:.2f} MXN")
+        c2.metric("📊 Percentil (estado y tipo)", f"{detalle['percentil_estado_tipo']:.0f}")
+        c3.metric(f"🎯 Distancia al umbral {ETIQUETA_UMBRAL}", f"{detalle['distancia_umbral_m2']:+.2f} MXN/m²",
+                  f"exceso ${detalle['exceso_mensual']:,.0f}/mes" if detalle['exceso_mensual'] > 0 else None,
+                  delta_color='inverse')
+        c4.metric("👥 Mediana de sus pares", f"${score['pares_mediana_m2']:.2f}",
+                  f"{(score['razon_vs_pares'] - 1) * 100:+.1f}%", delta_color='inverse')
+        
+        with st.expander(f"Sus {peer_index.k} edificios más parecidos", expanded=False):
+            with prof.section('pares_cliente', rows=1):
+                pares_pos, distancias = peer_index.peers_of(pos)
+            st.dataframe(
+                df.iloc[pares_pos][['cliente_id', 'superficie_m2', 'ocupantes',
+                                    'costo_energia_mxn', 'costo_por_m2']]
+                .assign(distancia=distancias),
+                use_container_width=True,
+                hide_index=True
+            )
+
+with st.expander("📑 Consulta por lote", expanded=False):
+    lote = st.text_area("IDs de cliente (separados por comas, espacios o saltos de línea)",
+                        key='clientes_lote')
+    ids_lote = parse_ids(lote)
+    if ids_lote:
+        with prof.section('detalle_lote', rows=len(ids_lote)):
+            detalle_lote = client_index.details(ids_lote, UMBRAL_INEFICIENCIA)
+        faltantes = len(ids_lote) - len(detalle_lote)
+        st.caption(f"{len(detalle_lote):,} clientes encontrados"
+                   + (f" · {faltantes:,} IDs no existen" if faltantes else ""))
+        st.dataframe(detalle_lote, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="⬇️ Descargar detalle (CSV)",
+            data=detalle_lote.to_csv(index=False).encode('utf-8'),
+            file_name='detalle_clientes.csv',
+            mime='text/csv',
+        )
+
+# Los demás paneles de esta selección se preparan en segundo plano y quedan en
+# la caché. Se encolan al final del rerun para no competir con lo que falta
+# dibujar; las tareas de la selección anterior de esta sesión que no hayan
+# empezado se cancelan
+load_background_builds().sync(st.session_state['profile_session'], [
+    (nombre, (sel.key, panel_args(nombre, 'Muestra', UMBRAL_INEFICIENCIA)),
+     get_panel, (datos, load_memo(), nombre, sel, 'Muestra', UMBRAL_INEFICIENCIA))
+    for otro, (nombre, _) in PANELES.items() if otro != panel_activo
+])
+
+# Contadores de la caché por filtros (compartida entre sesiones)
+with st.sidebar:
+    memo_stats = memo.stats()
+    st.caption(f"🗄️ Caché: {memo_stats['hits']:,} aciertos · {memo_stats['misses']:,} fallos · "
+               f"{memo_stats['bytes'] / 2**20:.1f} / {memo_stats['budget_bytes'] / 2**20:.0f} MB · "
+               f"{load_background_builds().stats()['pending']} paneles en cola")
+    st.caption(f"📦 Datos v{datos.version[:8]} · cargados {datos.loaded_at:%H:%M:%S} · "
+               f"armado en {datos.build_seconds:.2f} s · consultas {datos.backend.name}"
+               + (f" · {reloader.reloads} recargas (última {reloader.last_reload_seconds:.2f} s)"
+                  if reloader and reloader.reloads else ""))
+    if reloader and reloader.last_error:
+        st.caption(f"⚠️ Recarga fallida, se mantiene la versión actual: {reloader.last_error}")
+    st.caption(f"🔥 Pre-cálculo: {prewarm_job.done}/{len(prewarm_job.selections)} selecciones"
+               + (f" · {prewarm_job.seconds:.1f} s" if prewarm_job.finished else " · en curso")
+               + (f" · {len(prewarm_job.errors)} errores" if prewarm_job.errors else ""))
+
+# Panel de debug: secciones de este rerun y p50/p99 históricos del log
+if prof.enabled:
+    perfil = prof.write()
+    with st.sidebar.expander("🐞 Perfil del rerun", expanded=False):
+        secciones = prof.to_frame()
+        st.caption(f"Total: {perfil['total_seconds'] * 1000:,.0f} ms · {len(secciones)} secciones "
+                   f"(las consultas a la caché se anidan dentro de los paneles)")
+        st.dataframe(
+            secciones.assign(ms=secciones['seconds'] * 1000).drop(columns='seconds'),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.markdown("**p50 / p99 por sección (log)**")
+        st.dataframe(summarize(read_log(prof.log_path, tail=SUMMARY_TAIL)).round(1),
+                     use_container_width=True)
 
 # ============================================================
 # FOOTER
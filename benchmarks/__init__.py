@@ -0,0 +1 @@
+"""Benchmarks de escalabilidad del dashboard y del pipeline de ``notebook.py``."""
@@ -0,0 +1,324 @@
+"""Prueba de carga del dashboard: muchas sesiones simultáneas contra un servidor local.
+
+Para cada tamaño de dataset sintético se levanta ``streamlit run app.py`` sin
+navegador (``--server.headless``) y se conectan ``--sessions`` clientes por el
+mismo websocket que usa el frontend. Cada sesión simulada repite acciones de
+un analista, con una pausa de ``--think`` segundos (±50%) entre ellas:
+
+- ``filtro``: cambia tipos y estados (a menudo todos, si no uno o varios).
+- ``panel``: cambia de panel (Costos, Scatter, Distribuciones, Ineficiencia).
+- ``vista``: alterna muestra/densidad en el scatter (si está visible).
+- ``cliente``: busca un ``cliente_id`` en el detalle de cliente.
+
+La latencia de un rerun va del envío de los widgets hasta el mensaje
+``script_finished`` del servidor. Por nivel de concurrencia se reportan p50,
+p95 y p99, reruns por segundo, CPU del servidor (100% = un núcleo) y su
+memoria residente actual y pico; también el CPU del propio arnés, que corre
+en otro proceso y en la misma máquina, para saber si fue el cuello de botella.
+El primer rerun de cada servidor (carga del dataset e índices) se mide aparte.
+
+Las sesiones hablan el protocolo interno del frontend (mensajes protobuf
+``BackMsg``/``ForwardMsg`` y el formato de los ids de widget), que Streamlit
+cambia entre versiones sin aviso. Por eso el arnés está fijado a la misma
+versión de Streamlit que ``requirements.txt`` (``streamlit==1.41.0``) y se
+niega a correr con otra; ``--any-streamlit`` lo fuerza bajo tu riesgo.
+
+Requiere el paquete ``websockets``, que no está en ``requirements.txt`` porque
+sólo lo usa este benchmark. Uso::
+
+    pip install websockets==17.2
+    python -m benchmarks.load --sizes 100k 1m --sessions 1 4 16 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from benchmarks.run import RESULTS_DIR, dataset_path
+from energia.synthetic import parse_size
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), 'app.py')
+REQUIREMENTS = os.path.join(os.path.dirname(BENCH_DIR), 'requirements.txt')
+
+# Peso relativo de cada acción de un analista
+ACTIONS = {'filtro': 4, 'panel': 3, 'vista': 1, 'cliente': 2}
+WIDGET_TYPES = ('multiselect', 'radio', 'text_input')
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+SERVER_TIMEOUT = 300
+
+
+def pinned_streamlit():
+    """Versión de Streamlit fijada en ``requirements.txt`` (la única que entiende el arnés)."""
+    with open(REQUIREMENTS, encoding='utf-8') as f:
+        for line in f:
+            name, sep, version = line.strip().partition('==')
+            if sep and name.strip().lower() == 'streamlit':
+                return version.strip()
+    raise RuntimeError("requirements.txt no fija la versión de streamlit")
+
+
+def _cpu_seconds(pid):
+    """Segundos de CPU (usuario + sistema) consumidos por ``pid``."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def _memory(pid):
+    """``(residente, pico residente)`` de ``pid`` en bytes."""
+    values = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'VmHWM'):
+                values[key] = int(value.split()[0]) * 1024
+    return values['VmRSS'], values['VmHWM']
+
+
+class Session:
+    """Una sesión del navegador: envía reruns con el estado de sus widgets."""
+
+    def __init__(self, ws, rng, client_ids):
+        self.ws = ws
+        self.rng = rng
+        self.client_ids = client_ids
+        self.widgets = {}
+        self.values = {}
+
+    async def rerun(self):
+        """Un rerun con los valores actuales; devuelve ``(segundos, error o None)``."""
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()
+        for wid, (kind, value) in self.values.items():
+            state = msg.rerun_script.widget_states.widgets.add(id=wid)
+            if kind == 'multiselect':
+                state.string_array_value.data.extend(value)
+            else:
+                state.string_value = value
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        error = None
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await self.ws.recv())
+            kind = fwd.WhichOneof('type')
+            if kind == 'script_finished':
+                if fwd.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    error = error or ForwardMsg.ScriptFinishedStatus.Name(fwd.script_finished)
+                return time.perf_counter() - start, error
+            if kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                element = fwd.delta.new_element
+                etype = element.WhichOneof('type')
+                if etype == 'exception':
+                    error = error or f"{element.exception.type}: {element.exception.message}"
+                elif etype in WIDGET_TYPES:
+                    proto = getattr(element, etype)
+                    # Los widgets con key se nombran por su key, el resto por su etiqueta
+                    # (formato interno del id en la versión fijada de Streamlit)
+                    key = proto.id.rsplit('-', 1)[1]
+                    self.widgets[proto.label if key == 'None' else key] = (etype, proto)
+
+    def _set(self, name, value):
+        kind, proto = self.widgets[name]
+        self.values[proto.id] = (kind, value)
+
+    def act(self):
+        """Aplica una acción aleatoria a los widgets y devuelve su nombre."""
+        rng = self.rng
+        action = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        if action == 'vista' and 'modo_scatter' not in self.widgets:
+            action = 'panel'
+        if action == 'filtro':
+            tipos = list(self.widgets['Tipo de Cliente'][1].options)
+            estados = list(self.widgets['Estado'][1].options)
+            self._set('Tipo de Cliente', tipos if rng.random() < 0.5 else [rng.choice(tipos)])
+            self._set('Estado', estados if rng.random() < 0.5
+                      else sorted(rng.sample(estados, rng.randint(1, 8))))
+        elif action == 'panel':
+            self._set('panel_activo', rng.choice(list(self.widgets['panel_activo'][1].options)))
+        elif action == 'vista':
+            self._set('modo_scatter', rng.choice(list(self.widgets['modo_scatter'][1].options)))
+        else:
+            self._set('cliente_detalle', rng.choice(self.client_ids))
+        return action
+
+
+async def run_session(url, seed, client_ids, deadline, think, samples):
+    """Sesión simulada hasta ``deadline``; agrega ``(acción, segundos, error)`` a ``samples``."""
+    rng = random.Random(seed)
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+        session = Session(ws, rng, client_ids)
+        seconds, error = await session.rerun()
+        samples.append(('inicial', seconds, error))
+        while time.perf_counter() < deadline:
+            if think > 0:
+                await asyncio.sleep(think * rng.uniform(0.5, 1.5))
+            action = session.act()
+            seconds, error = await session.rerun()
+            samples.append((action, seconds, error))
+
+
+def _percentiles(seconds):
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000 if len(seconds) else (np.nan,) * 3
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+
+
+def run_level(url, pid, n_sessions, duration, think, client_ids, seed):
+    """Un nivel de concurrencia: ``n_sessions`` sesiones durante ``duration`` segundos."""
+    samples = []
+    cpu_server, cpu_harness = _cpu_seconds(pid), time.process_time()
+    start = time.perf_counter()
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(run_session(url, seed + i, client_ids, deadline, think, samples)
+                               for i in range(n_sessions)))
+
+    asyncio.run(main())
+    wall = time.perf_counter() - start
+    rss, peak = _memory(pid)
+    # El rerun inicial de cada sesión se excluye de las percentiles de las acciones
+    actions = [s for s in samples if s[0] != 'inicial']
+    result = {
+        'sessions': n_sessions,
+        'reruns': len(actions),
+        'errors': sum(error is not None for _, _, error in samples),
+        'error_samples': sorted({error for _, _, error in samples if error})[:5],
+        'reruns_per_s': len(actions) / wall,
+        **_percentiles([s for _, s, _ in actions]),
+        'by_action': {a: {'reruns': sum(1 for s in actions if s[0] == a),
+                          **_percentiles([s for name, s, _ in actions if name == a])}
+                      for a in ACTIONS if any(s[0] == a for s in actions)},
+        'server_cpu_pct': (_cpu_seconds(pid) - cpu_server) / wall * 100,
+        'harness_cpu_pct': (time.process_time() - cpu_harness) / wall * 100,
+        'server_rss_bytes': rss,
+        'server_peak_rss_bytes': peak,
+    }
+    result['by_action']['inicial'] = {
+        'reruns': n_sessions, **_percentiles([s for a, s, _ in samples if a == 'inicial'])}
+    return result
+
+
+def start_server(csv_path, port):
+    """Lanza ``streamlit run app.py`` sobre ``csv_path`` y espera a que responda."""
+    env = dict(os.environ, ENERGIA_CSV=csv_path, ENERGIA_RELOAD_SECONDS='0')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', APP_PATH, '--server.headless', 'true',
+         '--server.port', str(port), '--server.fileWatcherType', 'none'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + SERVER_TIMEOUT
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1):
+                return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f"El servidor terminó con código {server.returncode}")
+            time.sleep(0.25)
+    server.kill()
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+def run_size(n_rows, levels, duration, think, port, seed):
+    csv_path = dataset_path(n_rows)
+    client_ids = pd.read_csv(csv_path, usecols=['cliente_id'])['cliente_id'].sample(
+        min(n_rows, 1000), random_state=seed).tolist()
+    server = start_server(csv_path, port)
+    url = f'ws://127.0.0.1:{port}/_stcore/stream'
+    try:
+        # Primer rerun del proceso: carga el dataset, el umbral y los índices
+        async def first():
+            samples = []
+            await run_session(url, seed, client_ids, 0, 0, samples)
+            return samples[0][1]
+
+        result = {'first_rerun_s': asyncio.run(first()), 'levels': []}
+        for n_sessions in levels:
+            print(f"  {n_sessions} sesiones...", flush=True)
+            result['levels'].append(
+                run_level(url, server.pid, n_sessions, duration, think, client_ids, seed))
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def print_table(results):
+    for n_rows, size in results['sizes'].items():
+        print(f"\n{int(n_rows):,} filas · primer rerun {size['first_rerun_s']:.2f} s")
+        print(f"{'sesiones':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'errores':>7} {'CPU srv':>8} {'CPU arnés':>9} {'RSS MB':>7} {'pico MB':>8}")
+        for lv in size['levels']:
+            print(f"{lv['sessions']:>8} {lv['reruns_per_s']:>9.1f} {lv['p50_ms']:>8.0f} "
+                  f"{lv['p95_ms']:>8.0f} {lv['p99_ms']:>8.0f} {lv['errors']:>7} "
+                  f"{lv['server_cpu_pct']:>7.0f}% {lv['harness_cpu_pct']:>8.0f}% "
+                  f"{lv['server_rss_bytes'] / 2**20:>7.0f} {lv['server_peak_rss_bytes'] / 2**20:>8.0f}")
+            for error in lv['error_samples']:
+                print(f"{'':>8} error: {error[:100]}")
+        worst = size['levels'][-1]['by_action']
+        print("  p95 por acción con más sesiones: " + " · ".join(
+            f"{a} {v['p95_ms']:.0f} ms" for a, v in worst.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['100k'],
+                        help="Tamaños de dataset (5k, 100k, 1m, 10m o un número)")
+    parser.add_argument('--sessions', nargs='+', type=int, default=[1, 4, 16],
+                        help="Niveles de concurrencia (sesiones simultáneas)")
+    parser.add_argument('--duration', type=float, default=30,
+                        help="Segundos por nivel de concurrencia")
+    parser.add_argument('--think', type=float, default=1.0,
+                        help="Pausa media entre acciones de una sesión (0 = sin pausa)")
+    parser.add_argument('--port', type=int, default=8599)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Archivo JSON de resultados (default: results/load-<fecha>.json)")
+    parser.add_argument('--any-streamlit', action='store_true',
+                        help="Correr aunque Streamlit no sea la versión de requirements.txt")
+    args = parser.parse_args(argv)
+
+    pinned = pinned_streamlit()
+    if streamlit.__version__ != pinned and not args.any_streamlit:
+        parser.error(f"el arnés habla el protocolo interno de streamlit=={pinned} (requirements.txt) "
+                     f"y está instalado {streamlit.__version__}; instala esa versión o usa --any-streamlit")
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'cpu_count': os.cpu_count(),
+        'streamlit_version': streamlit.__version__,
+        'duration_s': args.duration,
+        'think_s': args.think,
+        'sizes': {},
+    }
+    for size in args.sizes:
+        n_rows = parse_size(size)
+        print(f"Carga sobre {n_rows:,} filas...", flush=True)
+        results['sizes'][str(n_rows)] = run_size(
+            n_rows, args.sessions, args.duration, args.think, args.port, args.seed)
+    print_table(results)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, 'load-' + datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados: {output}")
+    return 1 if any(lv['errors'] for s in results['sizes'].values() for lv in s['levels']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""Benchmarks de tiempo y memoria pico por etapa sobre datasets sintéticos.
+
+Para cada tamaño (5k, 100k, 1m, 10m filas) se genera un CSV sintético con
+``energia.synthetic`` (se reutiliza si ya existe) y se miden las etapas que
+recorre el dashboard en un rerun y el pipeline de ``notebook.py``:
+
+- ``load_cold`` / ``load_warm``: ``load_data()`` compilando el snapshot y leyéndolo.
+- ``filter_mask``: la máscara de la selección y su vista por posiciones.
+- ``cube_build`` y ``kpis``: el cubo (tipo × estado) y las tarjetas KPI.
+- ``tab_costos``, ``tab_scatter``, ``tab_distribuciones``, ``tab_ineficiencia``:
+  los cálculos de cada panel (sin construir figuras de Plotly).
+- ``tabla_ineficientes``: el orden de la tabla descargable.
+- ``threshold_index_build`` y ``threshold_what_if``: el índice por umbral y el
+  ahorro de la selección para los 50 percentiles del slider (P50–P99).
+- ``sort_index_build`` y ``tabla_pagina``: los ordenamientos de la tabla y, para
+  cada columna en orden descendente, las cuentas por bloque de los ineficientes
+  de la selección y sus páginas 1, 2 y 10.
+- ``retrofit_simulation``: 1,000 programas Monte Carlo sobre los ineficientes de
+  la selección, en un solo proceso.
+- ``query_arrow``: P75, agregados por estado y correlación de la selección con
+  el backend de consultas fuera de memoria (``energia.query.ArrowBackend``).
+- ``notebook_streaming``: ``energia.streaming.run_streaming``.
+
+La memoria pico se mide con ``tracemalloc`` (asignaciones de Python y NumPy;
+los buffers internos de Arrow no se cuentan). Como ``tracemalloc`` vuelve
+lentas las asignaciones, cada tamaño se recorre dos veces: una para tiempos
+y otra, con ``tracemalloc`` activo, para memoria. Los resultados se guardan como
+JSON y se comparan contra un baseline guardado; una etapa se marca como
+regresión si su tiempo o su memoria crecen más que ``--tolerance``.
+
+Uso::
+
+    python -m benchmarks.run --sizes 5k 100k 1m --save-baseline
+    python -m benchmarks.run --sizes 5k 100k 1m   # compara contra el baseline
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from energia.charts import distribution_by_group, sample_positions
+from energia.clients import ClientIndex
+from energia.cube import build_cube
+from energia.dataset import SORTABLE_COLUMNS
+from energia.export import inefficient_positions
+from energia.mannwhitney import MannWhitneyEngine
+from energia.ordering import SortIndex
+from energia.peers import PeerIndex
+from energia.query import ArrowBackend
+from energia.simulation import Scenario, simulate
+from energia.snapshot import SNAPSHOT_DIR, load_snapshot
+from energia.streaming import run_streaming
+from energia.synthetic import parse_size, write_csv
+from energia.threshold import ThresholdIndex
+from energia.views import RowView
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+DEFAULT_TOLERANCE = 0.25
+# Diferencias menores a esto se consideran ruido aunque superen la tolerancia
+MIN_DELTA_SECONDS = 0.005
+MIN_DELTA_BYTES = 1 << 20
+
+# Selección típica de un usuario: un tipo y un tercio de los estados
+FILTRO_TIPOS = ['Comercial']
+# Programas simulados en la etapa retrofit_simulation
+SIM_BENCH_RUNS = 1000
+
+
+def measure(fn):
+    """Ejecuta ``fn()`` y devuelve ``(resultado, segundos, bytes pico)``.
+
+    Los bytes pico sólo son significativos si ``tracemalloc`` está activo.
+    """
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    return result, seconds, max(peak - base, 0)
+
+
+def dataset_path(n_rows):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'synthetic_{n_rows}.csv')
+    if not os.path.exists(path):
+        write_csv(n_rows, path)
+    return path
+
+
+def run_stages(n_rows):
+    """Ejecuta una vez todas las etapas para un dataset de ``n_rows`` filas."""
+    csv_path = dataset_path(n_rows)
+    shutil.rmtree(os.path.join(DATA_DIR, SNAPSHOT_DIR), ignore_errors=True)
+    stages = {}
+
+    def stage(name, fn):
+        result, seconds, peak = measure(fn)
+        stages[name] = {'seconds': seconds, 'peak_bytes': peak}
+        return result
+
+    stage('load_cold', lambda: load_snapshot(csv_path))
+    df = stage('load_warm', lambda: load_snapshot(csv_path))
+    umbral = df['costo_por_m2'].quantile(0.75)
+    estados = sorted(df['estado'].unique())[::3]
+
+    def filtrar():
+        mask = df['tipo_cliente'].isin(FILTRO_TIPOS) & df['estado'].isin(estados)
+        return mask, RowView.from_mask(df, mask)
+    row_mask, df_filtered = stage('filter_mask', filtrar)
+
+    cube = stage('cube_build', lambda: build_cube(df, umbral))
+    cube_mask = cube.mask(FILTRO_TIPOS, estados)
+    stage('kpis', lambda: cube.kpis(cube_mask))
+    stage('tab_costos', lambda: cube.by_estado(cube_mask)['costo_medio_m2'].sort_values())
+    stage('tab_scatter', lambda: (
+        sample_positions(df_filtered.column('superficie_m2'), df_filtered.column('costo_energia_mxn'),
+                         df_filtered.column('tipo_cliente')),
+        cube.polyfit(cube_mask, 'superficie_m2', 'costo_energia_mxn'),
+    ))
+    stage('tab_distribuciones', lambda: (
+        distribution_by_group(df_filtered, 'costo_energia_mxn', 'tipo_cliente'),
+        cube.corr(cube_mask),
+    ))
+    engine = stage('mann_whitney_build', lambda: MannWhitneyEngine(
+        df['costo_por_m2'], df['tipo_cliente'], df['estado']))
+    stage('tab_ineficiencia', lambda: (
+        cube.by_estado(cube_mask),
+        engine.test(df['estado'].isin(estados).to_numpy()),
+        engine.by_stratum(estados),
+        cube.savings(cube_mask),
+    ))
+    inef = stage('tabla_ineficientes', lambda: inefficient_positions(
+        df['costo_por_m2'].to_numpy(), row_mask.to_numpy(), umbral))
+    thresholds = stage('threshold_index_build', lambda: ThresholdIndex(df))
+    stage('threshold_what_if', lambda: [
+        thresholds.apply(cube, thresholds.quantile(p / 100)).savings(cube_mask)
+        for p in range(50, 100)])
+    sorts = stage('sort_index_build', lambda: SortIndex({c: df[c] for c in SORTABLE_COLUMNS}))
+    inef_mask = row_mask.to_numpy() & (df['costo_por_m2'].to_numpy() > umbral)
+
+    def paginas(column):
+        counts = sorts.block_counts(column, inef_mask, descending=True)
+        return [sorts.page(column, inef_mask, p, descending=True, counts=counts) for p in (0, 1, 9)]
+
+    stage('tabla_pagina', lambda: [paginas(c) for c in SORTABLE_COLUMNS])
+    estados_inef = df['estado'].iloc[inef].cat.remove_unused_categories()
+    stage('retrofit_simulation', lambda: simulate(
+        df['costo_energia_mxn'].to_numpy()[inef], df['superficie_m2'].to_numpy()[inef], estados_inef,
+        Scenario((0.3,) * len(estados_inef.cat.categories)), n_sims=SIM_BENCH_RUNS, workers=1))
+    peers = stage('peer_index_build', lambda: PeerIndex(df))
+    stage('peer_score', peers.score)
+    clients = stage('client_index_build', lambda: ClientIndex(df))
+    ids = df['cliente_id'].to_numpy()[::max(1, n_rows // 5000)].tolist()
+    stage('client_lookup_batch', lambda: clients.details(ids, umbral))
+    arrow = ArrowBackend.from_csv(csv_path)
+    stage('query_arrow', lambda: (
+        arrow.quantile('costo_por_m2', 0.75),
+        arrow.by_estado(umbral, FILTRO_TIPOS, estados),
+        arrow.corr(FILTRO_TIPOS, estados),
+    ))
+
+    output = os.path.join(DATA_DIR, f'processed_{n_rows}.csv')
+    stage('notebook_streaming', lambda: run_streaming(csv_path, output))
+    os.remove(output)
+    return stages
+
+
+def run_size(n_rows):
+    """Tiempos (sin ``tracemalloc``) y memoria pico (con ``tracemalloc``) por etapa."""
+    timed = run_stages(n_rows)
+    tracemalloc.start()
+    traced = run_stages(n_rows)
+    tracemalloc.stop()
+    return {name: {'seconds': m['seconds'], 'peak_bytes': traced[name]['peak_bytes']}
+            for name, m in timed.items()}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Lista de regresiones de ``results`` frente a ``baseline``."""
+    regressions = []
+    for size, stages in results['sizes'].items():
+        base_stages = baseline.get('sizes', {}).get(size, {})
+        for name, current in stages.items():
+            base = base_stages.get(name)
+            if base is None:
+                continue
+            for metric, floor in (('seconds', MIN_DELTA_SECONDS), ('peak_bytes', MIN_DELTA_BYTES)):
+                old, new = base[metric], current[metric]
+                if new > old * (1 + tolerance) and new - old > floor:
+                    regressions.append({'size': size, 'stage': name, 'metric': metric,
+                                        'baseline': old, 'current': new,
+                                        'ratio': new / old if old else float('inf')})
+    return regressions
+
+
+def print_table(results):
+    for size, stages in results['sizes'].items():
+        print(f"\n== {int(size):,} filas ==")
+        for name, m in stages.items():
+            print(f"  {name:<22} {m['seconds'] * 1000:>10,.1f} ms  {m['peak_bytes'] / 2**20:>9,.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['5k', '100k', '1m'],
+                        help="Tamaños a medir (5k, 100k, 1m, 10m o un número)")
+    parser.add_argument('--output', help="Archivo JSON de resultados (default: results/<fecha>.json)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Guarda estos resultados como nuevo baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'sizes': {},
+    }
+    for size in args.sizes:
+        n_rows = parse_size(size)
+        print(f"Midiendo {n_rows:,} filas...", flush=True)
+        results['sizes'][str(n_rows)] = run_size(n_rows)
+    print_table(results)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados: {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline guardado: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sin baseline para comparar (usa --save-baseline).")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for r in regressions:
+        unit = 'ms' if r['metric'] == 'seconds' else 'MB'
+        scale = 1000 if r['metric'] == 'seconds' else 1 / 2**20
+        print(f"REGRESIÓN {int(r['size']):,} filas · {r['stage']} · {r['metric']}: "
+              f"{r['baseline'] * scale:,.1f} -> {r['current'] * scale:,.1f} {unit} (x{r['ratio']:.2f})")
+    if not regressions:
+        print("Sin regresiones frente al baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
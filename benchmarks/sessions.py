@@ -0,0 +1,75 @@
+"""Memoria por sesión adicional del dashboard: dataset copiado vs compartido.
+
+Simula ``--sessions`` sesiones vivas al mismo tiempo, cada una con su rerun
+más reciente, y mide cuánta memoria agrega cada sesión sobre la primera:
+
+- ``copia``: lo que hacía ``load_data()`` con ``st.cache_data``, que entrega
+  a cada llamada una copia deserializada del DataFrame, más el ``df[mask]``
+  materializado del filtro.
+- ``compartido``: el DataFrame único de ``st.cache_resource`` (columnas sobre
+  el memory-map del snapshot) y una ``RowView`` con las posiciones filtradas.
+
+Se cuentan las asignaciones de Python y NumPy (``tracemalloc``) más las del
+pool de memoria de Arrow. Las páginas del memory-map no cuentan: son caché del
+sistema operativo compartida también entre procesos del servidor.
+
+Uso::
+
+    python -m benchmarks.sessions --sizes 100k 1m --sessions 8
+"""
+import argparse
+import pickle
+import tracemalloc
+
+import pyarrow as pa
+
+from benchmarks.run import FILTRO_TIPOS, dataset_path
+from energia.snapshot import load_snapshot
+from energia.synthetic import parse_size
+from energia.views import RowView
+
+
+def _allocated():
+    return tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+
+
+def _session_copy(shared, mask):
+    df = pickle.loads(pickle.dumps(shared, protocol=pickle.HIGHEST_PROTOCOL))
+    return df, df[mask]
+
+
+def _session_shared(shared, mask):
+    return shared, RowView.from_mask(shared, mask)
+
+
+def bytes_per_session(df, mask, session, n_sessions):
+    """Memoria promedio que agrega cada sesión después de la primera."""
+    tracemalloc.start()
+    sessions = [session(df, mask)]
+    base = _allocated()
+    sessions.extend(session(df, mask) for _ in range(n_sessions - 1))
+    extra = _allocated() - base
+    tracemalloc.stop()
+    del sessions
+    return extra / (n_sessions - 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['100k', '1m'])
+    parser.add_argument('--sessions', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    print(f"{'filas':>12} {'copia':>14} {'compartido':>14}   (MB por sesión adicional)")
+    for size in args.sizes:
+        n_rows = parse_size(size)
+        df = load_snapshot(dataset_path(n_rows))
+        estados = sorted(df['estado'].unique())[::3]
+        mask = (df['tipo_cliente'].isin(FILTRO_TIPOS) & df['estado'].isin(estados)).to_numpy()
+        copia = bytes_per_session(df, mask, _session_copy, args.sessions)
+        compartido = bytes_per_session(df, mask, _session_shared, args.sessions)
+        print(f"{n_rows:>12,} {copia / 2**20:>14,.2f} {compartido / 2**20:>14,.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Tiempo de arranque del dashboard: imports, carga de datos y primer render.
+
+Cada repetición corre en un intérprete nuevo (``--worker``) para medir el
+arranque en frío:
+
+- ``imports``: cada ``import`` de nivel superior de ``app.py``, uno por uno.
+- ``datos``: la sección ``carga_datos`` del perfilado del primer rerun
+  (dataset, umbral, cubo e índices compartidos).
+- ``render``: el resto del primer rerun (filtros, KPIs, panel visible y tablas)
+  ejecutado con ``streamlit.testing.v1.AppTest``, sin navegador.
+
+Al final se listan los módulos pesados que quedaron sin importar tras el
+primer rerun del hilo principal.
+
+Uso::
+
+    python -m benchmarks.startup --repeat 3
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), 'app.py')
+
+# Secciones de ``app.py`` que cuentan como carga de datos
+DATA_SECTIONS = ('carga_datos',)
+HEAVY_MODULES = ('plotly.express', 'plotly.graph_objects', 'scipy.stats', 'scipy.spatial')
+
+
+def _time_imports(path):
+    """Segundos de cada import de nivel superior de ``path``, en orden."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    times = {}
+    namespace = {}
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            code = compile(ast.Module(body=[node], type_ignores=[]), path, 'exec')
+            start = time.perf_counter()
+            exec(code, namespace)
+            times[ast.unparse(node)] = time.perf_counter() - start
+    return times
+
+
+def worker():
+    """Un arranque en frío; imprime el desglose como JSON."""
+    log_path = os.path.join(tempfile.mkdtemp(), 'startup.jsonl')
+    os.environ.update(ENERGIA_PROFILE='1', ENERGIA_PROFILE_LOG=log_path)
+    imports = _time_imports(APP_PATH)
+
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    start = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - start
+    # Se revisa antes de que el pool de segundo plano avance con otros paneles
+    not_loaded = [m for m in HEAVY_MODULES if m not in sys.modules]
+
+    with open(log_path, encoding='utf-8') as f:
+        sections = json.loads(f.readline())['sections']
+    datos = sum(s['seconds'] for s in sections if s['name'] in DATA_SECTIONS)
+    print(json.dumps({
+        'imports': imports,
+        'imports_total': sum(imports.values()),
+        'datos': datos,
+        'render': first_run - datos,
+        'not_loaded': not_loaded,
+        'exception': [str(e.value) for e in at.exception],
+    }))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.worker:
+        worker()
+        return
+
+    runs = []
+    for _ in range(args.repeat):
+        out = subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--worker'],
+                             capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(BENCH_DIR))
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    if runs[0]['exception']:
+        print("Excepción en el primer rerun:", runs[0]['exception'])
+
+    def med(key):
+        return statistics.median(r[key] for r in runs) * 1000
+
+    print(f"Arranque en frío (mediana de {len(runs)}):")
+    print(f"  imports  {med('imports_total'):>8,.0f} ms")
+    print(f"  datos    {med('datos'):>8,.0f} ms")
+    print(f"  render   {med('render'):>8,.0f} ms")
+    print(f"  total    {med('imports_total') + med('datos') + med('render'):>8,.0f} ms")
+    print("\nImports más lentos:")
+    for stmt in sorted(runs[0]['imports'], key=lambda s: -runs[0]['imports'][s])[:5]:
+        ms = statistics.median(r['imports'][stmt] for r in runs) * 1000
+        print(f"  {ms:>8,.0f} ms  {stmt.splitlines()[0][:70]}")
+    print(f"\nSin importar tras el primer rerun: {', '.join(runs[0]['not_loaded']) or '—'}")
+
+
+if __name__ == '__main__':
+    main()
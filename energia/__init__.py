@@ -0,0 +1 @@
+"""Utilidades compartidas por el dashboard (``app.py``) y el análisis (``notebook.py``)."""
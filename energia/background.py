@@ -0,0 +1,72 @@
+"""Cola acotada de construcciones en segundo plano para los paneles no visibles.
+
+Cada rerun pide preparar los paneles que el usuario no está viendo. Sin
+control, cada sesión encolaría en cada rerun las mismas tareas aunque ya
+estuvieran en la caché o en camino, y las de selecciones que el usuario ya
+dejó seguirían compitiendo con los reruns en primer plano. ``BackgroundBuilds``
+lleva las tareas pendientes por clave de la caché:
+
+- una clave que ya está en la caché o pendiente no se vuelve a encolar;
+- ``sync`` recibe todas las tareas que una sesión quiere en este rerun y
+  cancela las suyas que aún no empezaron y ya no pide (selección anterior),
+  salvo que otra sesión también las espere;
+- como máximo hay ``MAX_PENDING`` tareas en cola (``ENERGIA_BACKGROUND_MAX``);
+  las que no caben se omiten y, si hacen falta, se calculan al abrir el panel.
+"""
+import os
+import threading
+
+MAX_PENDING = int(os.environ.get('ENERGIA_BACKGROUND_MAX', 8))
+
+
+class BackgroundBuilds:
+    """Tareas de ``executor`` deduplicadas por ``(nombre, clave)`` de ``memo``."""
+
+    def __init__(self, memo, executor, max_pending=MAX_PENDING):
+        self._memo = memo
+        self._executor = executor
+        self.max_pending = max_pending
+        # Reentrante: add_done_callback/cancel pueden llamar a _done dentro de sync
+        self._lock = threading.RLock()
+        self._pending = {}  # (nombre, clave) -> [future, sesiones que la esperan]
+        self.submitted = 0
+        self.skipped = 0
+        self.cancelled = 0
+
+    def sync(self, owner, tasks):
+        """Deja en cola exactamente las tareas ``tasks`` de la sesión ``owner``.
+
+        ``tasks`` es una lista de ``(nombre, clave, fn, args)``; ``fn(*args)``
+        debe guardar su resultado en la caché bajo ``(nombre, clave)``.
+        """
+        wanted = {(name, key) for name, key, _, _ in tasks}
+        with self._lock:
+            for entry_key, (future, owners) in list(self._pending.items()):
+                if owner in owners and entry_key not in wanted:
+                    owners.discard(owner)
+                    # cancel() ejecuta el callback que ya la saca de _pending
+                    if not owners and future.cancel():
+                        self.cancelled += 1
+            for name, key, fn, args in tasks:
+                entry_key = (name, key)
+                if entry_key in self._pending:
+                    self._pending[entry_key][1].add(owner)
+                    continue
+                if self._memo.contains(name, key):
+                    continue
+                if len(self._pending) >= self.max_pending:
+                    self.skipped += 1
+                    continue
+                future = self._executor.submit(fn, *args)
+                self._pending[entry_key] = [future, {owner}]
+                self.submitted += 1
+                future.add_done_callback(lambda _, k=entry_key: self._done(k))
+
+    def _done(self, entry_key):
+        with self._lock:
+            self._pending.pop(entry_key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._pending), 'submitted': self.submitted,
+                    'skipped': self.skipped, 'cancelled': self.cancelled}
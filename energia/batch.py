@@ -0,0 +1,172 @@
+"""Análisis por estado en paralelo, sin interfaz gráfica.
+
+Calcula para cada estado lo que ``notebook.py`` calcula para todo el país:
+límites IQR y outliers de ``costo_energia_mxn``, umbral P75 de
+``costo_por_m2`` y clientes ineficientes, regresión de costo contra
+superficie, prueba Mann-Whitney (Comercial vs Residencial) y ahorro potencial
+si los ineficientes bajan al costo/m² medio de su estado.
+
+Los estados se reparten en bloques entre un pool de procesos; dentro de cada
+bloque todo se calcula con kernels vectorizados por grupo (``np.bincount`` y un
+solo ordenamiento por estado y valor), sin ciclos de Python por estado. Cada
+resultado depende sólo de las filas de su estado, en su orden original, así
+que el reporte es idéntico con cualquier número de procesos.
+
+Uso desde la terminal::
+
+    python -m energia.batch energy_consumption_mexico.csv --workers 8 --output-dir salida
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from energia.mannwhitney import MannWhitneyEngine
+from energia.snapshot import load_snapshot
+
+# Bloques por proceso: más de uno reparte mejor estados de distinto tamaño
+SHARDS_PER_WORKER = 4
+
+
+def _group_quantile(sorted_values, starts, counts, q):
+    """Cuantil ``q`` (interpolación lineal, como pandas) de cada grupo ya ordenado."""
+    pos = (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    a, b = sorted_values[starts + lo], sorted_values[starts + hi]
+    return a + (b - a) * (pos - lo)
+
+
+def state_stats(estado, tipo, superficie, costo):
+    """Métricas por estado de un bloque de filas; devuelve un DataFrame indexado por estado.
+
+    ``estado`` y ``tipo`` son arreglos de etiquetas; ``superficie`` y ``costo``
+    arreglos numéricos de la misma longitud.
+    """
+    estado = pd.Categorical(estado)
+    codes = estado.codes.astype(np.int64)
+    n_groups = len(estado.categories)
+    superficie = np.asarray(superficie, dtype=np.float64)
+    costo = np.asarray(costo, dtype=np.float64)
+    costo_m2 = costo / superficie
+
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+    def gsum(weights, mask=None):
+        if mask is None:
+            return np.bincount(codes, weights=weights, minlength=n_groups)
+        return np.bincount(codes[mask], weights=weights[mask], minlength=n_groups)
+
+    # Outliers IQR del costo total
+    costo_sorted = costo[np.lexsort((costo, codes))]
+    q1 = _group_quantile(costo_sorted, starts, counts, 0.25)
+    q3 = _group_quantile(costo_sorted, starts, counts, 0.75)
+    lower, upper = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    outlier = (costo < lower[codes]) | (costo > upper[codes])
+
+    # Umbral de ineficiencia y ahorro con el costo/m² medio del estado
+    m2_sorted = costo_m2[np.lexsort((costo_m2, codes))]
+    umbral = _group_quantile(m2_sorted, starts, counts, 0.75)
+    media_m2 = gsum(costo_m2) / counts
+    inef = costo_m2 > umbral[codes]
+    ahorro = gsum((costo_m2 - media_m2[codes]) * superficie, inef)
+
+    # Regresión costo ~ superficie con momentos centrados por estado
+    mx, my = gsum(superficie) / counts, gsum(costo) / counts
+    dx, dy = superficie - mx[codes], costo - my[codes]
+    sxx, syy, sxy = gsum(dx * dx), gsum(dy * dy), gsum(dx * dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pendiente = sxy / sxx
+        r2 = sxy * sxy / (sxx * syy)
+
+    table = pd.DataFrame({
+        'n_clientes': counts,
+        'q1_costo': q1, 'q3_costo': q3,
+        'lower_bound': lower, 'upper_bound': upper,
+        'n_outliers': np.bincount(codes[outlier], minlength=n_groups),
+        'costo_m2_medio': media_m2,
+        'umbral_p75': umbral,
+        'n_ineficientes': np.bincount(codes[inef], minlength=n_groups),
+        'ahorro_total': ahorro,
+        'pendiente': pendiente,
+        'intercepto': my - pendiente * mx,
+        'r2': r2,
+    }, index=pd.Index(estado.categories, name='estado'))
+
+    mw = MannWhitneyEngine(costo_m2, tipo, estado).by_stratum()
+    table[['n_comercial', 'n_residencial', 'u', 'p_value']] = mw[['n_a', 'n_b', 'u', 'p_value']]
+    return table
+
+
+def _run_shard(shard):
+    return state_stats(*shard)
+
+
+def _shards(df, n_shards):
+    """Bloques de estados completos (orden alfabético), con sus filas en orden original."""
+    estados = np.asarray(df['estado'].cat.remove_unused_categories().cat.categories)
+    codes = df['estado'].cat.set_categories(estados).cat.codes.to_numpy()
+    columns = [df['estado'].to_numpy(), df['tipo_cliente'].to_numpy(),
+               df['superficie_m2'].to_numpy(), df['costo_energia_mxn'].to_numpy()]
+    for bloque in np.array_split(np.arange(len(estados)), min(n_shards, len(estados))):
+        rows = np.flatnonzero(np.isin(codes, bloque))
+        yield tuple(np.asarray(col[rows]) for col in columns)
+
+
+def analyze_by_state(df, workers=None):
+    """Reporte por estado de ``df`` calculado con ``workers`` procesos (todos los núcleos por defecto)."""
+    workers = workers or os.cpu_count() or 1
+    shards = list(_shards(df, workers * SHARDS_PER_WORKER if workers > 1 else 1))
+    if workers == 1:
+        parts = [_run_shard(s) for s in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_run_shard, shards))
+    return pd.concat(parts).sort_index()
+
+
+def annotate(df, report):
+    """Agrega a ``df`` el umbral de su estado y las marcas de outlier e ineficiente."""
+    df = df.copy()
+    estado = df['estado'].astype(str)
+    umbral = estado.map(report['umbral_p75']).to_numpy()
+    lower = estado.map(report['lower_bound']).to_numpy()
+    upper = estado.map(report['upper_bound']).to_numpy()
+    costo = df['costo_energia_mxn'].to_numpy()
+    df['umbral_estado'] = umbral
+    df['outlier_estado'] = (costo < lower) | (costo > upper)
+    df['ineficiente_estado'] = df['costo_por_m2'].to_numpy() > umbral
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos (default: todos los núcleos)")
+    parser.add_argument('--output-dir', default='.')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    df = load_snapshot(args.csv_path)
+    report = analyze_by_state(df, args.workers)
+    os.makedirs(args.output_dir, exist_ok=True)
+    report_path = os.path.join(args.output_dir, 'reporte_por_estado.csv')
+    data_path = os.path.join(args.output_dir, 'energy_consumption_processed.csv')
+    report.to_csv(report_path)
+    annotate(df, report).to_csv(data_path, index=False)
+
+    print(f"Filas procesadas: {len(df):,} · estados: {len(report)} · "
+          f"{time.perf_counter() - start:.2f} s")
+    print("Top 5 Estados (Ahorro Mensual Potencial):")
+    print(report['ahorro_total'].sort_values(ascending=False).head(5).round(2))
+    print(f"Reporte: {report_path}")
+    print(f"Datos procesados: {data_path}")
+
+
+if __name__ == '__main__':
+    main()
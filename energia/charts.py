@@ -0,0 +1,109 @@
+"""Reducciones del lado del servidor para los gráficos con muchas filas.
+
+Por encima de ``MAX_ROWS_RAW`` filas el dashboard deja de enviar cada punto al
+navegador: el scatter usa una muestra estratificada que conserva los extremos
+(o una malla de densidad) y el histograma usa conteos de ``np.histogram`` con
+cuartiles y bigotes precalculados para el box marginal.
+
+El límite se configura con la variable de entorno ``ENERGIA_MAX_ROWS_RAW``.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_ROWS_RAW = int(os.environ.get('ENERGIA_MAX_ROWS_RAW', 20_000))
+SCATTER_SAMPLE_SIZE = int(os.environ.get('ENERGIA_SCATTER_SAMPLE', 10_000))
+HIST_BINS = 60
+DENSITY_BINS = 80
+
+# Fracción de la muestra reservada a puntos extremos en cualquiera de los ejes
+_EXTREME_SHARE = 0.1
+_EXTREME_QUANTILES = (0.005, 0.995)
+
+
+def needs_aggregation(n_rows, limit=None):
+    """``True`` si ``n_rows`` supera el límite para enviar filas crudas."""
+    return n_rows > (MAX_ROWS_RAW if limit is None else limit)
+
+
+def sample_positions(xv, yv, strata, n=SCATTER_SAMPLE_SIZE, seed=0):
+    """Posiciones (ordenadas) de una muestra estratificada que conserva los extremos.
+
+    Primero se reservan (hasta ``_EXTREME_SHARE * n``) las filas fuera de los
+    percentiles 0.5–99.5 de ``xv`` o ``yv``, que son las que el analista busca
+    en el scatter. El resto se reparte entre los estratos en proporción a su
+    tamaño. Con la misma ``seed`` la muestra es reproducible entre reruns.
+    """
+    if len(xv) <= n:
+        return np.arange(len(xv))
+    rng = np.random.default_rng(seed)
+    lo_x, hi_x = np.quantile(xv, _EXTREME_QUANTILES)
+    lo_y, hi_y = np.quantile(yv, _EXTREME_QUANTILES)
+    extreme = (xv < lo_x) | (xv > hi_x) | (yv < lo_y) | (yv > hi_y)
+
+    extreme_pos = np.flatnonzero(extreme)
+    n_extreme = min(len(extreme_pos), int(n * _EXTREME_SHARE))
+    keep = [rng.choice(extreme_pos, n_extreme, replace=False)]
+
+    rest = ~extreme
+    codes = pd.Categorical(strata).codes
+    budget = n - n_extreme
+    n_rest = rest.sum()
+    for code in np.unique(codes[rest]):
+        pos = np.flatnonzero(rest & (codes == code))
+        k = min(len(pos), round(budget * len(pos) / n_rest))
+        keep.append(rng.choice(pos, k, replace=False))
+    return np.sort(np.concatenate(keep))
+
+
+def density_grid(x, y, bins=DENSITY_BINS):
+    """Conteos 2D de ``(x, y)``: devuelve centros de ``x``, centros de ``y`` y la matriz."""
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    # histogram2d indexa [x, y]; los heatmaps esperan [y, x]
+    return x_centers, y_centers, counts.T
+
+
+def distribution_by_group(df, col, by, bins=HIST_BINS):
+    """Conteos de histograma y estadísticas de box de ``col`` por grupo ``by``.
+
+    Devuelve ``(edges, {grupo: {'counts': ..., 'box': ...}})``; todos los
+    grupos usan los mismos bordes para que las barras superpuestas sean
+    comparables. ``df`` puede ser un DataFrame o una ``RowView``.
+    """
+    values_all = df[col].to_numpy()
+    edges = np.histogram_bin_edges(values_all, bins=bins)
+    by_values = pd.Categorical(df[by])
+    groups = {}
+    for code, name in enumerate(by_values.categories):
+        values = values_all[by_values.codes == code]
+        if not len(values):
+            continue
+        groups[name] = {
+            'counts': np.histogram(values, bins=edges)[0],
+            'box': box_stats(values),
+        }
+    return edges, groups
+
+
+def box_stats(values):
+    """Cuartiles, media y bigotes (1.5 × IQR, acotados a los datos) de un box plot."""
+    values = np.asarray(values, dtype=np.float64)
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'mean': values.mean(),
+        'lowerfence': inside.min(),
+        'upperfence': inside.max(),
+    }
+
+
+def payload_size(fig):
+    """Tamaño en bytes del JSON de una figura de Plotly enviado al navegador."""
+    return len(fig.to_json().encode('utf-8'))
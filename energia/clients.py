@@ -0,0 +1,72 @@
+"""Índice de ``cliente_id`` para consultar clientes individuales sin recorrer el dataset.
+
+``ClientIndex`` se arma una vez por versión de los datos: un índice hash
+(``pd.Index``) de ``cliente_id`` a posición de fila y el percentil de
+``costo_por_m2`` de cada cliente dentro de su estado y tipo de cliente
+(``groupby().rank``). Con eso una consulta es una búsqueda en la tabla hash más
+lecturas por posición, en tiempo constante sin importar el tamaño del dataset,
+y ``details`` resuelve miles de IDs con una sola llamada vectorizada.
+
+Con varios periodos de facturación cargados (``energia.periods``) un cliente
+aparece una vez por periodo: el índice apunta a su fila del periodo más
+reciente y el percentil se calcula dentro de cada periodo.
+"""
+import numpy as np
+import pandas as pd
+
+DETAIL_COLUMNS = ['cliente_id', 'tipo_cliente', 'estado', 'superficie_m2', 'ocupantes',
+                  'costo_energia_mxn', 'costo_por_m2', 'costo_por_ocupante']
+
+
+def parse_ids(text):
+    """IDs separados por comas, espacios o saltos de línea, sin repetir y en orden."""
+    return list(dict.fromkeys(text.replace(',', ' ').split()))
+
+
+class ClientIndex:
+    """Posición de fila por ``cliente_id`` y percentil por estado × tipo de cada cliente."""
+
+    def __init__(self, df):
+        self.df = df
+        ids = df['cliente_id']
+        # Los periodos vienen en orden, así que la última aparición es la más reciente
+        latest = ~ids.duplicated(keep='last').to_numpy()
+        # dtype object: get_indexer contra listas de Python no convierte cada consulta
+        self.index = pd.Index(ids.to_numpy()[latest], dtype=object)
+        self._rows = np.flatnonzero(latest)
+        # La tabla hash de pandas es perezosa: se construye aquí y no en la primera consulta
+        self.index.get_indexer(self.index[:1])
+        keys = ['estado', 'tipo_cliente'] + (['periodo'] if 'periodo' in df else [])
+        self.percentil = (df.groupby(keys, observed=True)['costo_por_m2']
+                          .rank(pct=True).to_numpy())
+
+    def __len__(self):
+        return len(self.index)
+
+    def position(self, cliente_id):
+        """Posición de fila de ``cliente_id`` o ``None`` si no existe."""
+        try:
+            return int(self._rows[self.index.get_loc(cliente_id)])
+        except KeyError:
+            return None
+
+    def positions(self, ids):
+        """Posiciones de fila de ``ids`` (``-1`` para los que no existen)."""
+        found = self.index.get_indexer(pd.Index(ids, dtype=object))
+        return np.where(found >= 0, self._rows[found], -1)
+
+    def details(self, ids, umbral):
+        """Métricas, percentil dentro de estado × tipo y distancia al umbral de ``ids``.
+
+        Devuelve una fila por ID encontrado, en el orden pedido; los IDs que no
+        existen se omiten (compárese ``len`` del resultado con ``len(ids)``).
+        """
+        pos = self.positions(ids)
+        pos = pos[pos >= 0]
+        detail = self.df.iloc[pos][DETAIL_COLUMNS].reset_index(drop=True)
+        costo_m2 = detail['costo_por_m2'].to_numpy()
+        detail['percentil_estado_tipo'] = self.percentil[pos] * 100
+        detail['distancia_umbral_m2'] = costo_m2 - umbral
+        # Ahorro mensual si el cliente bajara exactamente al umbral
+        detail['exceso_mensual'] = np.maximum(costo_m2 - umbral, 0) * detail['superficie_m2'].to_numpy()
+        return detail
@@ -0,0 +1,165 @@
+"""Versión del dataset lista para el dashboard y recarga en caliente del CSV.
+
+``build_dataset`` arma, a partir del DataFrame cargado, todo lo que depende de
+la versión de los datos: el umbral de ineficiencia (P75 de ``costo_por_m2``),
+el cubo tipo × estado, el índice por umbral, el motor Mann-Whitney, los
+índices de pares y de clientes y los ordenamientos de la tabla paginada. El
+filtro, los agregados por estado, la correlación y el umbral se consultan con
+el backend de ``ENERGIA_QUERY_BACKEND`` (``energia.query``): pandas sobre el
+DataFrame, el cubo y el índice por umbral, o Arrow fuera de memoria sobre el
+snapshot o las particiones de periodos. El resultado (``Dataset``) es
+inmutable y se comparte entre sesiones.
+
+``HotReloader`` vigila el CSV de origen (tamaño y fecha de modificación cada
+``ENERGIA_RELOAD_SECONDS``, 30 por defecto). Si cambió, recompila el snapshot y
+arma el siguiente ``Dataset`` en un hilo de segundo plano mientras las sesiones
+siguen usando el actual; al terminar reemplaza la referencia de una sola vez
+(doble buffer). Cada rerun lee ``current`` una vez al inicio, así que nunca
+mezcla dos versiones, y la versión anterior se libera cuando ya nadie la usa.
+Las funciones registradas con ``subscribe`` se llaman con el ``Dataset`` nuevo
+justo después del intercambio (p. ej. para lanzar su pre-cálculo).
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+import pandas as pd
+
+from energia.clients import ClientIndex
+from energia.cube import Cube, build_cube
+from energia.mannwhitney import MannWhitneyEngine
+from energia.ordering import SortIndex
+from energia.peers import PeerIndex
+from energia.query import QUERY_BACKEND, PandasBackend, open_backend
+from energia.snapshot import load_snapshot
+from energia.threshold import ThresholdIndex
+
+RELOAD_POLL_SECONDS = float(os.environ.get('ENERGIA_RELOAD_SECONDS', 30))
+# Columnas por las que se puede ordenar la tabla de clientes ineficientes
+SORTABLE_COLUMNS = ['cliente_id', 'tipo_cliente', 'estado', 'superficie_m2', 'ocupantes',
+                    'costo_energia_mxn', 'costo_por_m2', 'costo_por_ocupante']
+SORTABLE_PEER_COLUMNS = ['pares_mediana_m2', 'percentil_pares']
+
+
+class Dataset(NamedTuple):
+    """Una versión de los datos con sus estructuras derivadas (de sólo lectura)."""
+    df: pd.DataFrame
+    version: str
+    umbral: float
+    cube: Cube
+    threshold_index: ThresholdIndex
+    mw_engine: MannWhitneyEngine
+    peer_index: PeerIndex
+    peer_scores: pd.DataFrame
+    client_index: ClientIndex
+    sort_index: SortIndex
+    loaded_at: datetime
+    build_seconds: float
+    backend: object
+
+
+def build_dataset(df, backend=None):
+    """Arma el ``Dataset`` de ``df`` (``df.attrs['version']`` debe existir).
+
+    ``backend`` es el de ``energia.query`` abierto sobre la misma fuente que
+    ``df``; sin él (o si es pandas) se usa pandas con el cubo y el índice por
+    umbral de esta versión.
+    """
+    start = time.perf_counter()
+    threshold_index = ThresholdIndex(df)
+    if backend is None or isinstance(backend, PandasBackend):
+        backend = PandasBackend(df, threshold_index=threshold_index)
+    # Umbral global de ineficiencia (Percentil 75)
+    umbral = backend.quantile('costo_por_m2', 0.75)
+    cube = build_cube(df, umbral)
+    if isinstance(backend, PandasBackend):
+        backend.cube = cube
+    peer_index = PeerIndex(df)
+    peer_scores = peer_index.score()
+    return Dataset(
+        df=df,
+        version=df.attrs['version'],
+        umbral=umbral,
+        cube=cube,
+        threshold_index=threshold_index,
+        mw_engine=MannWhitneyEngine(df['costo_por_m2'], df['tipo_cliente'], df['estado']),
+        peer_index=peer_index,
+        peer_scores=peer_scores,
+        client_index=ClientIndex(df),
+        sort_index=SortIndex({**{c: df[c] for c in SORTABLE_COLUMNS},
+                              **{c: peer_scores[c] for c in SORTABLE_PEER_COLUMNS}}),
+        loaded_at=datetime.now(),
+        build_seconds=time.perf_counter() - start,
+        backend=backend,
+    )
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class HotReloader:
+    """``Dataset`` actual de ``csv_path``, reemplazado en segundo plano cuando el CSV cambia."""
+
+    def __init__(self, csv_path, poll_seconds=RELOAD_POLL_SECONDS, backend=QUERY_BACKEND):
+        self.csv_path = csv_path
+        self.poll_seconds = poll_seconds
+        self.backend = backend
+        self.reloads = 0
+        self.last_error = None
+        self.last_reload_seconds = None
+        self._file_state = _file_state(csv_path)
+        self._listeners = {}
+        start = time.perf_counter()
+        self.current = self._build(load_snapshot(csv_path))
+        self.last_reload_seconds = time.perf_counter() - start
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if poll_seconds > 0:
+            threading.Thread(target=self._watch, name='recarga-datos', daemon=True).start()
+
+    def _build(self, df):
+        return build_dataset(df, open_backend(self.backend, csv_path=self.csv_path, df=df))
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, name, callback):
+        """Llama a ``callback(dataset)`` tras cada cambio de versión; reemplaza al de ``name``."""
+        self._listeners[name] = callback
+
+    def check(self):
+        """Recarga si el CSV cambió; devuelve ``True`` si se cambió de versión."""
+        with self._lock:
+            try:
+                state = _file_state(self.csv_path)
+                if state == self._file_state:
+                    return False
+                start = time.perf_counter()
+                # Se recompila el snapshot sólo si cambió el hash del contenido
+                df = load_snapshot(self.csv_path)
+                self._file_state = state
+                if df.attrs['version'] == self.current.version:
+                    return False
+                nuevo = self._build(df)
+            except Exception as exc:  # el CSV puede estar a medio escribir o ser inválido
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                return False
+            # Intercambio atómico: los reruns en curso conservan su referencia anterior
+            self.current = nuevo
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_seconds = time.perf_counter() - start
+            for callback in list(self._listeners.values()):
+                try:
+                    callback(nuevo)
+                except Exception as exc:  # la versión nueva ya está publicada
+                    self.last_error = f"{type(exc).__name__}: {exc}"
+            return True
@@ -0,0 +1,99 @@
+"""Exportación bajo demanda de la tabla de clientes ineficientes.
+
+La tabla se representa como posiciones de fila (``np.ndarray``) dentro del
+dataset completo, ordenadas por ``costo_por_m2`` descendente; no se copia
+ningún DataFrame. El archivo se genera sólo cuando el usuario lo pide y se
+escribe a disco por bloques de ``CHUNK_ROWS`` filas, así que nunca se tiene
+el archivo completo en memoria durante su construcción. Los archivos quedan
+en un directorio temporal y se reutilizan para la misma selección y formato;
+los que no se piden en ``EXPORT_MAX_AGE`` segundos (``ENERGIA_EXPORT_MAX_AGE``,
+una hora por defecto) se borran al preparar el siguiente.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from energia.snapshot import _write_atomic
+
+CHUNK_ROWS = 100_000
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'energia_exports')
+EXPORT_MAX_AGE = float(os.environ.get('ENERGIA_EXPORT_MAX_AGE', 3600))
+
+# Formato -> (extensión, tipo MIME)
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV comprimido (gzip)': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def inefficient_positions(values, row_mask, umbral):
+    """Posiciones de las filas de ``row_mask`` con ``values > umbral``, de mayor a menor."""
+    values = np.asarray(values)
+    pos = np.flatnonzero(np.asarray(row_mask) & (values > umbral))
+    return pos[np.argsort(-values[pos], kind='stable')]
+
+
+def _chunks(df, positions, chunk_rows):
+    for start in range(0, len(positions), chunk_rows):
+        yield df.iloc[positions[start:start + chunk_rows]]
+
+
+def write_export(df, positions, path, fmt, chunk_rows=CHUNK_ROWS):
+    """Escribe las filas ``positions`` de ``df`` en ``path`` con el formato ``fmt``."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación desconocido: {fmt}")
+
+    def write(tmp_path):
+        if fmt == 'Parquet':
+            schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                for chunk in _chunks(df, positions, chunk_rows):
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        else:
+            opener = gzip.open if fmt == 'CSV comprimido (gzip)' else open
+            with opener(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+                if not len(positions):
+                    df.iloc[:0].to_csv(f, index=False)
+                for i, chunk in enumerate(_chunks(df, positions, chunk_rows)):
+                    chunk.to_csv(f, index=False, header=i == 0)
+
+    # Temporal único: dos sesiones que exportan la misma selección no se pisan
+    _write_atomic(path, write)
+    return path
+
+
+def evict_exports(max_age=EXPORT_MAX_AGE, now=None):
+    """Borra de ``EXPORT_DIR`` los archivos sin usar en ``max_age`` segundos."""
+    now = time.time() if now is None else now
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+        except FileNotFoundError:  # otro proceso ya lo borró
+            pass
+
+
+def export_file(df, positions, fmt, key):
+    """Ruta del archivo de exportación para ``key``; lo genera si aún no existe.
+
+    ``key`` identifica la selección (p. ej. la clave canónica de filtros, que
+    incluye la versión del dataset).
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    evict_exports()
+    ext, _ = EXPORT_FORMATS[fmt]
+    name = hashlib.sha256(repr((key, fmt)).encode()).hexdigest()[:24]
+    path = os.path.join(EXPORT_DIR, name + ext)
+    if os.path.exists(path):
+        # Reutilizado: cuenta como usado para la expiración
+        os.utime(path)
+    else:
+        write_export(df, positions, path, fmt)
+    return path
@@ -0,0 +1,104 @@
+"""Memoización de los cálculos del dashboard por selección de filtros.
+
+Cada resultado se guarda bajo ``(nombre, clave_de_filtros)``, donde la clave
+es la forma canónica de ``(tipo_filter, estado_filter, versión del dataset)``:
+el orden en que el usuario eligió las opciones no importa. La caché tiene un
+presupuesto de memoria (``ENERGIA_MEMO_BUDGET_MB``, 256 MB por defecto) y
+desaloja las entradas usadas hace más tiempo (LRU) cuando se excede.
+
+Los valores guardados se comparten entre reruns y sesiones, así que deben
+tratarse como de sólo lectura.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET_BYTES = int(float(os.environ.get('ENERGIA_MEMO_BUDGET_MB', 256)) * 2**20)
+
+
+def canonical_key(tipo_filter, estado_filter, version):
+    """Clave independiente del orden y de duplicados en los filtros."""
+    return version, tuple(sorted(set(tipo_filter))), tuple(sorted(set(estado_filter)))
+
+
+def estimate_size(obj):
+    """Tamaño aproximado en bytes de un resultado (DataFrames, arreglos, figuras y contenedores)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, 'to_plotly_json'):
+        # Figuras de Plotly: se cuentan los datos de cada traza
+        return sum(estimate_size(trace.to_plotly_json()) for trace in obj.data)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_size(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class FilterMemo:
+    """Caché LRU con presupuesto de memoria y contadores de aciertos/fallos."""
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    def get(self, name, key, compute):
+        """Devuelve el valor de ``(name, key)``, calculándolo con ``compute()`` si falta."""
+        entry_key = (name, key)
+        with self._lock:
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return self._entries[entry_key][0]
+            self.misses += 1
+
+        # Se calcula fuera del lock para no bloquear otras sesiones
+        value = compute()
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.budget_bytes or entry_key in self._entries:
+                return value
+            self._entries[entry_key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.budget_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+        return value
+
+    def contains(self, name, key):
+        """``True`` si ``(name, key)`` ya está en la caché (no cuenta como acierto)."""
+        with self._lock:
+            return (name, key) in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Aciertos, fallos, desalojos, entradas y bytes ocupados."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'budget_bytes': self.budget_bytes,
+            }
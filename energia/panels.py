@@ -0,0 +1,360 @@
+"""Construcción memoizada de KPIs, paneles y tabla para una versión del dataset.
+
+Cada panel del dashboard se separa en construcción (figuras y tablas, aquí) y
+dibujo con Streamlit (en ``app.py``). Las funciones de este módulo reciben
+explícitamente el ``Dataset`` (``energia.dataset``) y la caché por filtros
+(``energia.memo``) y no llaman a ``st.*``, así que sirven igual para el rerun
+de una sesión, para los paneles que se preparan en segundo plano y para el
+pre-cálculo de una versión recién publicada por la recarga en caliente.
+
+Plotly se importa dentro de cada construcción para no pagarlo al arrancar.
+"""
+import time
+from functools import partial
+
+import numpy as np
+
+from energia.charts import (density_grid, distribution_by_group, needs_aggregation,
+                            payload_size, sample_positions)
+from energia.export import inefficient_positions
+from energia.prewarm import popular_selections
+from energia.views import select
+
+COLORES_TIPO = {'Residencial': '#6366f1', 'Comercial': '#f97316'}
+
+# Duración de la última construcción de cada panel (compartida entre sesiones)
+PANEL_TIMES = {}
+# Orden inicial de la tabla de ineficientes
+ORDEN_TABLA = 'costo_por_m2'
+
+
+def get_selection(datos, tipos, estados):
+    """``Selection`` de ``datos`` con la máscara de filas del backend de consultas."""
+    return select(datos.df, datos.cube, tipos, estados, datos.backend.mask(tipos, estados))
+
+
+def get_cube(datos, memo, umbral):
+    """Cubo con los ineficientes de ``umbral`` (una búsqueda binaria por celda, sin recorrer filas)."""
+    if umbral == datos.umbral:
+        return datos.cube
+    return memo.get('cubo_umbral', (datos.version, umbral),
+                    lambda: datos.threshold_index.apply(datos.cube, umbral))
+
+
+def get_kpis(datos, memo, sel, umbral):
+    """Medias de las tarjetas KPI e ineficientes de la selección para ``umbral``."""
+    return memo.get('kpis', (sel.key, umbral),
+                    lambda: get_cube(datos, memo, umbral).kpis(sel.cube_mask))
+
+
+def build_costos(datos, memo, sel):
+    """Figura de barras y top 5 de estados por costo/m²."""
+    import plotly.express as px
+
+    by_estado = memo.get('by_estado', sel.key,
+                         lambda: datos.backend.by_estado(datos.umbral, sel.tipos, sel.estados))
+    costo_by_state = by_estado['costo_medio_m2'].rename('costo_por_m2')
+    top_states = (costo_by_state
+                  .sort_values(ascending=True)
+                  .tail(15)
+                  .reset_index())
+
+    fig_bar = px.bar(
+        top_states,
+        x='costo_por_m2',
+        y='estado',
+        orientation='h',
+        title="Top 15 Estados — Costo Promedio por m²",
+        labels={'costo_por_m2': 'Costo / m² (MXN)', 'estado': ''},
+        color='costo_por_m2',
+        color_continuous_scale='Inferno'
+    )
+    fig_bar.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#cbd5e1',
+        title_font_size=18,
+        showlegend=False,
+        coloraxis_showscale=False,
+        height=500
+    )
+    top5 = (costo_by_state
+            .sort_values(ascending=False)
+            .head(5))
+    return {'fig_bar': fig_bar, 'top5': top5}
+
+
+def build_scatter(datos, memo, sel, modo_scatter='Muestra'):
+    """Scatter (o malla de densidad) con la recta de tendencia del cubo."""
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    # Arriba de MAX_ROWS_RAW filas se envía una muestra (WebGL) o una malla de densidad
+    rows = sel.rows
+    agregar_scatter = needs_aggregation(len(rows))
+    if modo_scatter == 'Densidad' and agregar_scatter:
+        x_c, y_c, densidad = density_grid(rows.column('superficie_m2'),
+                                          rows.column('costo_energia_mxn'))
+        n_puntos = densidad.size
+        fig_scatter = go.Figure(go.Heatmap(
+            x=x_c, y=y_c, z=densidad,
+            colorscale='Inferno',
+            colorbar=dict(title='Clientes')
+        ))
+        fig_scatter.update_layout(
+            title="Correlación: Superficie vs Costo Energético",
+            xaxis_title='Superficie (m²)',
+            yaxis_title='Costo Mensual (MXN)'
+        )
+    else:
+        muestra = (rows.take(sample_positions(rows.column('superficie_m2'),
+                                              rows.column('costo_energia_mxn'),
+                                              rows.column('tipo_cliente')))
+                   if agregar_scatter else rows)
+        scatter_df = muestra.frame(['superficie_m2', 'costo_energia_mxn', 'tipo_cliente',
+                                    'ocupantes', 'cliente_id', 'estado', 'costo_por_m2'])
+        n_puntos = len(scatter_df)
+        fig_scatter = px.scatter(
+            scatter_df,
+            x='superficie_m2',
+            y='costo_energia_mxn',
+            color='tipo_cliente',
+            size='ocupantes',
+            title="Correlación: Superficie vs Costo Energético",
+            labels={
+                'superficie_m2': 'Superficie (m²)',
+                'costo_energia_mxn': 'Costo Mensual (MXN)',
+                'tipo_cliente': 'Tipo'
+            },
+            opacity=0.5,
+            color_discrete_map=COLORES_TIPO,
+            hover_data=['cliente_id', 'estado', 'costo_por_m2'],
+            render_mode='webgl' if agregar_scatter else 'auto'
+        )
+
+    # Línea de tendencia
+    z, x_extent = memo.get('polyfit', sel.key, lambda: (
+        datos.cube.polyfit(sel.cube_mask, 'superficie_m2', 'costo_energia_mxn'),
+        datos.cube.extent(sel.cube_mask, 'superficie_m2')
+    ))
+    x_line = np.linspace(*x_extent, 100)
+    y_line = z[0] * x_line + z[1]
+    fig_scatter.add_trace(go.Scatter(
+        x=x_line, y=y_line,
+        mode='lines',
+        name=f'Tendencia (pendiente={z[0]:.2f})',
+        line=dict(color='#f43f5e', width=2, dash='dash')
+    ))
+
+    fig_scatter.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#cbd5e1',
+        title_font_size=18,
+        height=550
+    )
+    return {
+        'fig_scatter': fig_scatter,
+        'modo': modo_scatter,
+        'agregado': agregar_scatter,
+        'n_puntos': n_puntos,
+        'payload': payload_size(fig_scatter) if agregar_scatter else None,
+        'pendiente': z[0],
+        'n_filas': len(rows),
+        'pearson': memo.get('corr', sel.key, lambda: datos.backend.corr(sel.tipos, sel.estados))
+                   .loc['superficie_m2', 'costo_energia_mxn'],
+    }
+
+
+def build_distribuciones(datos, memo, sel):
+    """Histograma con box marginal y heatmap de correlación."""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    agregar_hist = needs_aggregation(len(sel.rows))
+    n_bins = None
+    if agregar_hist:
+        # Conteos con np.histogram y box con cuartiles/bigotes precalculados
+        edges, grupos = distribution_by_group(sel.rows, 'costo_energia_mxn', 'tipo_cliente')
+        n_bins = len(edges) - 1
+        centros = (edges[:-1] + edges[1:]) / 2
+        fig_hist = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                                 row_heights=[0.25, 0.75], vertical_spacing=0.03)
+        for tipo, g in grupos.items():
+            color = COLORES_TIPO.get(tipo)
+            fig_hist.add_trace(go.Bar(
+                x=centros, y=g['counts'], width=np.diff(edges),
+                name=tipo, legendgroup=tipo, marker_color=color, opacity=0.7
+            ), row=2, col=1)
+            box = g['box']
+            fig_hist.add_trace(go.Box(
+                y=[tipo], q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+                mean=[box['mean']], lowerfence=[box['lowerfence']],
+                upperfence=[box['upperfence']], orientation='h',
+                name=tipo, legendgroup=tipo, marker_color=color, showlegend=False
+            ), row=1, col=1)
+        fig_hist.update_layout(
+            title="Distribución de Costo Energético",
+            barmode='overlay',
+            bargap=0,
+            legend_title_text='Tipo'
+        )
+        fig_hist.update_xaxes(title_text='Costo (MXN)', row=2, col=1)
+        fig_hist.update_yaxes(title_text='count', row=2, col=1)
+    else:
+        fig_hist = px.histogram(
+            sel.rows.frame(['costo_energia_mxn', 'tipo_cliente']),
+            x='costo_energia_mxn',
+            color='tipo_cliente',
+            marginal='box',
+            title="Distribución de Costo Energético",
+            labels={'costo_energia_mxn': 'Costo (MXN)', 'tipo_cliente': 'Tipo'},
+            color_discrete_map=COLORES_TIPO,
+            barmode='overlay',
+            opacity=0.7
+        )
+    fig_hist.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#cbd5e1',
+        height=450
+    )
+
+    # Heatmap de correlación
+    corr_matrix = memo.get('corr', sel.key, lambda: datos.backend.corr(sel.tipos, sel.estados))
+    fig_heatmap = px.imshow(
+        corr_matrix,
+        text_auto='.2f',
+        title="Matriz de Correlación",
+        color_continuous_scale='RdBu_r',
+        aspect='auto'
+    )
+    fig_heatmap.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#cbd5e1',
+        height=450
+    )
+    return {
+        'fig_hist': fig_hist,
+        'fig_heatmap': fig_heatmap,
+        'agregado': agregar_hist,
+        'n_filas': len(sel.rows),
+        'n_bins': n_bins,
+        'payload': payload_size(fig_hist) if agregar_hist else None,
+    }
+
+
+def build_ineficiencia(datos, memo, sel, umbral):
+    """Barras de % de ineficientes por estado, Mann-Whitney y ahorro potencial para ``umbral``."""
+    import plotly.express as px
+
+    cube_umbral = get_cube(datos, memo, umbral)
+    inef_by_state = (memo.get('by_estado', (sel.key, umbral),
+                              lambda: datos.backend.by_estado(umbral, sel.tipos, sel.estados))
+                     .reset_index()
+                     .sort_values('pct_ineficientes', ascending=True))
+
+    fig_inef = px.bar(
+        inef_by_state,
+        x='pct_ineficientes',
+        y='estado',
+        orientation='h',
+        title="Porcentaje de Clientes Ineficientes por Estado",
+        labels={'pct_ineficientes': '% Ineficientes', 'estado': ''},
+        color='pct_ineficientes',
+        color_continuous_scale='YlOrRd',
+        hover_data=['costo_medio_m2', 'n_clientes']
+    )
+    fig_inef.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#cbd5e1',
+        title_font_size=18,
+        coloraxis_showscale=False,
+        height=600
+    )
+    return {
+        'fig_inef': fig_inef,
+        'mw': memo.get('mann_whitney', sel.key, lambda: datos.mw_engine.test(sel.row_mask)),
+        'mw_por_estado': memo.get('mann_whitney_by_state', sel.key,
+                                  lambda: datos.mw_engine.by_stratum(sel.estados)),
+        'ahorro': memo.get('savings', (sel.key, umbral), lambda: cube_umbral.savings(sel.cube_mask)),
+        'umbral': umbral,
+    }
+
+
+# Nombre en la caché -> construcción
+BUILDS = {
+    'panel_costos': build_costos,
+    'panel_scatter': build_scatter,
+    'panel_distribuciones': build_distribuciones,
+    'panel_ineficiencia': build_ineficiencia,
+}
+
+
+def panel_args(nombre, modo, umbral):
+    """Argumentos extra de la construcción (vista del scatter o umbral de la ineficiencia)."""
+    return (modo,) if nombre == 'panel_scatter' else (umbral,) if nombre == 'panel_ineficiencia' else ()
+
+
+def _timed_build(datos, memo, nombre, sel, args):
+    inicio = time.perf_counter()
+    panel = BUILDS[nombre](datos, memo, sel, *args)
+    PANEL_TIMES[nombre] = time.perf_counter() - inicio
+    return panel
+
+
+def get_panel(datos, memo, nombre, sel, modo='Muestra', umbral=None):
+    """Panel ``nombre`` memoizado por filtros (y por vista o umbral en el scatter y la ineficiencia).
+
+    ``umbral`` es el de ineficiencia; ``None`` usa el P75 de ``datos``.
+    """
+    args = panel_args(nombre, modo, datos.umbral if umbral is None else umbral)
+    return memo.get(nombre, (sel.key, args), lambda: _timed_build(datos, memo, nombre, sel, args))
+
+
+def get_ineficientes(datos, memo, sel, umbral):
+    """Posiciones de fila (no una copia del DataFrame), ordenadas por costo/m² descendente."""
+    return memo.get('ineficientes', (sel.key, umbral), lambda: inefficient_positions(
+        datos.df['costo_por_m2'].to_numpy(), sel.row_mask, umbral
+    ))
+
+
+def get_mascara_ineficientes(datos, memo, sel, umbral):
+    """Máscara de filas de la selección con costo/m² sobre ``umbral`` (para paginar la tabla)."""
+    return memo.get('ineficientes_mascara', (sel.key, umbral),
+                    lambda: sel.row_mask & (datos.df['costo_por_m2'].to_numpy() > umbral))
+
+
+def get_bloques_tabla(datos, memo, sel, umbral, column, descending):
+    """Ineficientes de la selección acumulados por bloque del orden de ``column`` (para paginar)."""
+    return memo.get('ineficientes_bloques', (sel.key, umbral, column, descending),
+                    lambda: datos.sort_index.block_counts(
+                        column, get_mascara_ineficientes(datos, memo, sel, umbral), descending))
+
+
+def get_estados_ineficientes(datos, memo, sel, umbral):
+    """Estados de la selección con algún cliente sobre ``umbral`` (de las celdas del cubo)."""
+    cells = get_cube(datos, memo, umbral).cells
+    con_inef = sel.cube_mask & (cells['n_inef'].to_numpy() > 0)
+    return cells['estado'][con_inef].cat.remove_unused_categories().cat.categories
+
+
+def prewarm(datos, memo, tipos, estados):
+    """KPIs, paneles y tabla de una selección con el umbral P75 de ``datos``, directo a la caché."""
+    sel = get_selection(datos, tipos, estados)
+    get_kpis(datos, memo, sel, datos.umbral)
+    for nombre in BUILDS:
+        get_panel(datos, memo, nombre, sel)
+    get_bloques_tabla(datos, memo, sel, datos.umbral, ORDEN_TABLA, True)
+
+
+def prewarm_version(runner, memo, datos):
+    """Lanza en ``runner`` el pre-cálculo de las selecciones comunes de ``datos`` (una vez por versión)."""
+    return runner.ensure(
+        datos.version,
+        popular_selections(datos.df['tipo_cliente'].cat.categories, datos.df['estado'].cat.categories),
+        partial(prewarm, datos, memo)
+    )
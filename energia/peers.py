@@ -0,0 +1,151 @@
+"""Comparación de cada cliente contra edificios similares (grupo de pares).
+
+El umbral global P75 compara un local comercial de 70 m² con cualquier otro
+inmueble del país. ``PeerIndex`` arma un KD-tree (``scipy.spatial.cKDTree``)
+por cada combinación ``tipo_cliente`` × ``estado`` sobre ``superficie_m2`` y
+``ocupantes`` escalados por su desviación estándar global, y compara el
+``costo_por_m2`` de cada cliente con el de sus ``k`` vecinos más cercanos
+(sin contarse a sí mismo). Con varios periodos de facturación cargados
+(``energia.periods``) los grupos son además por ``periodo``: un cliente
+aparece una vez por periodo y sus filas de otros meses no cuentan como pares.
+
+Como ambas características son enteras, muchos clientes comparten el mismo
+punto; el árbol se construye sobre los puntos distintos y cada uno guarda sus
+filas. Los pares de un cliente son las primeras ``k`` filas al recorrer los
+puntos del más cercano al más lejano (dentro de un punto, en orden de fila),
+así que los vecinos se resuelven una vez por punto distinto y no por fila.
+
+``score()`` califica a todos los clientes con operaciones vectorizadas por
+bloques y ``peers_of()`` resuelve un solo cliente con una consulta al árbol de
+su grupo. ``k`` se ajusta con ``ENERGIA_PEER_K``.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+PEER_K = int(os.environ.get('ENERGIA_PEER_K', 20))
+FEATURES = ['superficie_m2', 'ocupantes']
+# Filas (o puntos distintos) por bloque vectorizado; acota la memoria de ``score``
+QUERY_BLOCK = 200_000
+
+
+class _Group:
+    """Puntos distintos de un grupo, sus filas y el KD-tree sobre ellos."""
+
+    def __init__(self, members, points, k, tree_class):
+        uniq, inv, counts = np.unique(points[members], axis=0, return_inverse=True,
+                                      return_counts=True)
+        order = np.argsort(inv.ravel(), kind='stable')
+        self.rows = members[order]                 # filas agrupadas por punto
+        self.point_of = inv.ravel()[order]         # punto de cada fila de ``rows``
+        self.offsets = np.r_[0, np.cumsum(counts)]
+        self.counts = counts
+        self.rank = np.arange(len(order)) - self.offsets[self.point_of]  # orden dentro del punto
+        self.k = min(k, len(members) - 1)
+        self.tree = tree_class(uniq)
+
+    def candidates(self, points):
+        """Primeras ``k + 1`` filas (y distancias) alrededor de cada punto distinto de ``points``."""
+        width = self.k + 1
+        n_near = min(len(self.counts), width)
+        dist, near = self.tree.query(self.tree.data[points], k=n_near)
+        dist, near = dist.reshape(len(points), n_near), near.reshape(len(points), n_near)
+        counts = self.counts[near]
+        before = np.cumsum(counts, axis=1) - counts
+        slot = np.arange(width)
+        # Punto vecino que ocupa cada lugar y posición de la fila dentro de él
+        col = (before[:, :, None] <= slot).sum(axis=1) - 1
+        near_col = np.take_along_axis(near, col, axis=1)
+        within = slot - np.take_along_axis(before, col, axis=1)
+        return (self.rows[self.offsets[near_col] + within],
+                np.take_along_axis(dist, col, axis=1))
+
+
+def _drop_slot(values, slot):
+    """Quita de cada fila de ``values`` la columna ``slot`` (una por fila)."""
+    keep = np.ones(values.shape, dtype=bool)
+    keep[np.arange(len(values)), slot] = False
+    return values[keep].reshape(len(values), values.shape[1] - 1)
+
+
+class PeerIndex:
+    """Un KD-tree por grupo ``tipo_cliente`` × ``estado`` (× ``periodo``) sobre las características escaladas."""
+
+    def __init__(self, df, k=PEER_K):
+        from scipy.spatial import cKDTree
+        self.k = k
+        features = df[FEATURES].to_numpy(dtype=np.float64)
+        scale = features.std(axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0)
+        points = features / self.scale
+        self.costo_m2 = df['costo_por_m2'].to_numpy(dtype=np.float64)
+
+        keys = ['tipo_cliente', 'estado'] + (['periodo'] if 'periodo' in df else [])
+        grouped = df.groupby(keys, observed=True, sort=True)
+        self.group_of = grouped.ngroup().to_numpy()
+        self.group_names = list(grouped.groups)
+        order = np.argsort(self.group_of, kind='stable')
+        bounds = np.cumsum(np.bincount(self.group_of, minlength=len(self.group_names)))[:-1]
+        self.groups = [_Group(members, points, k, cKDTree) for members in np.split(order, bounds)]
+        # Lugar de cada fila dentro de ``rows`` de su grupo
+        self.slot = np.empty(len(df), dtype=np.int64)
+        for group in self.groups:
+            self.slot[group.rows] = np.arange(len(group.rows))
+
+    def peers_of(self, pos):
+        """Posiciones de fila y distancias (escaladas) de los pares de la fila ``pos``."""
+        group = self.groups[self.group_of[pos]]
+        i = self.slot[pos]
+        rows, dist = group.candidates(group.point_of[i:i + 1])
+        if group.rank[i] <= group.k:
+            return _drop_slot(rows, [group.rank[i]])[0], _drop_slot(dist, [group.rank[i]])[0]
+        return rows[0, :-1], dist[0, :-1]
+
+    def score(self):
+        """Calificación de todas las filas frente a sus pares, en el orden de ``df``.
+
+        Columnas: mediana y P75 del ``costo_por_m2`` de los pares, percentil del
+        cliente dentro de ellos (fracción de pares más baratos), razón contra la
+        mediana e ``ineficiente_pares`` (por encima del P75 de sus pares).
+        """
+        n = len(self.costo_m2)
+        mediana = np.full(n, np.nan)
+        p75 = np.full(n, np.nan)
+        percentil = np.full(n, np.nan)
+        for group in self.groups:
+            if group.k < 1:
+                continue
+            n_points = len(group.counts)
+            # Pares comunes de cada punto: las primeras k filas sin contar las del propio
+            # punto que caen dentro de ellas (ésas se resuelven aparte)
+            base = np.empty((n_points, group.k))
+            special_vals = []
+            for start in range(0, n_points, QUERY_BLOCK):
+                points = np.arange(start, min(start + QUERY_BLOCK, n_points))
+                rows, _ = group.candidates(points)
+                vals = self.costo_m2[rows]
+                base[points] = np.sort(vals[:, :-1], axis=1)
+                special_vals.append(vals)
+            special_vals = np.concatenate(special_vals)
+
+            own = self.costo_m2[group.rows]
+            special = group.rank < group.k
+            for start in range(0, len(group.rows), QUERY_BLOCK):
+                block = np.arange(start, min(start + QUERY_BLOCK, len(group.rows)))
+                vecinos = base[group.point_of[block]]
+                sp = block[special[block]]
+                if len(sp):
+                    vecinos[special[block]] = np.sort(
+                        _drop_slot(special_vals[group.point_of[sp]], group.rank[sp]), axis=1)
+                rows = group.rows[block]
+                mediana[rows] = np.median(vecinos, axis=1)
+                p75[rows] = np.quantile(vecinos, 0.75, axis=1)
+                percentil[rows] = (vecinos < own[block, None]).mean(axis=1)
+        return pd.DataFrame({
+            'pares_mediana_m2': mediana,
+            'pares_p75_m2': p75,
+            'percentil_pares': percentil,
+            'razon_vs_pares': self.costo_m2 / mediana,
+            'ineficiente_pares': self.costo_m2 > p75,
+        })
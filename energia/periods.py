@@ -0,0 +1,253 @@
+"""Almacén append-only de periodos de facturación particionado por mes.
+
+Cada periodo (``AAAA-MM``) se guarda como una partición Arrow IPC sin
+compresión en ``<almacén>/periodo=AAAA-MM/data.arrow``, con las mismas
+columnas y codificación que el snapshot de ``energia.snapshot``. Agregar un
+periodo nunca reescribe los anteriores: sólo se escribe la partición nueva y
+se actualiza ``manifest.json``. Las escrituras van a temporales únicos y las
+altas se serializan con un candado de archivo (``.lock`` en el almacén), así
+que dos altas simultáneas no pierden periodos.
+
+El manifiesto guarda por periodo el hash del CSV de origen, el número de filas,
+el mínimo/máximo de ``costo_por_m2`` y conteo y suma por estado; el
+``QuantileSketch`` de ``costo_por_m2`` (decenas de KB) va aparte, en
+``sketch.json`` junto a la partición, para que el manifiesto siga siendo un
+índice ligero que el dashboard lee en cada rerun. Como todo esto se combina
+sumando, el umbral P75 y los promedios por estado de cualquier conjunto de
+periodos se obtienen sin leer filas (``summarize_periods``).
+``eficiencia_relativa`` depende del mínimo/máximo de los periodos elegidos,
+así que se calcula al leer (``load_periods``) con los límites del manifiesto.
+
+Uso desde la terminal::
+
+    python -m energia.periods append energy_consumption_mexico.csv 2026-01
+    python -m energia.periods list
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from energia.snapshot import _write_atomic, file_hash, read_snapshot_table, read_source_csv
+from energia.streaming import QuantileSketch
+
+try:
+    import fcntl
+except ImportError:  # sin candados de archivo (Windows): sólo se serializa dentro del proceso
+    fcntl = None
+
+STORE_DIR = os.environ.get(
+    'ENERGIA_PERIODS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'periodos'))
+MANIFEST = 'manifest.json'
+SKETCH = 'sketch.json'
+_PERIOD_RE = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+class PeriodExistsError(ValueError):
+    """El periodo ya existe en el almacén con otro contenido."""
+
+
+def _partition_path(store, periodo):
+    return os.path.join(store, f'periodo={periodo}', 'data.arrow')
+
+
+def _sketch_path(store, periodo):
+    return os.path.join(store, f'periodo={periodo}', SKETCH)
+
+
+_append_lock = threading.Lock()
+
+
+@contextmanager
+def _store_lock(store):
+    """Candado exclusivo del almacén entre hilos y procesos."""
+    with _append_lock, open(os.path.join(store, '.lock'), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def read_manifest(store=STORE_DIR):
+    """Manifiesto del almacén (``{'periods': {...}}``); vacío si no existe."""
+    try:
+        with open(os.path.join(store, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'periods': {}}
+
+
+def _write_json(path, data):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    _write_atomic(path, write)
+
+
+def read_sketch(periodo, store=STORE_DIR):
+    """``QuantileSketch`` de ``costo_por_m2`` del periodo."""
+    with open(_sketch_path(store, periodo), encoding='utf-8') as f:
+        return QuantileSketch.from_dict(json.load(f))
+
+
+# Manifiesto (inodo, tamaño y fecha) -> periodos, para no releerlo en cada rerun
+_periods_cache = {}
+
+
+def list_periods(store=STORE_DIR):
+    """Periodos disponibles, del más antiguo al más reciente.
+
+    Se relee el manifiesto sólo si cambió su tamaño o fecha de modificación.
+    """
+    path = os.path.join(store, MANIFEST)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return []
+    state = (st.st_ino, st.st_size, st.st_mtime_ns)
+    cached = _periods_cache.get(path)
+    if cached is None or cached[0] != state:
+        cached = _periods_cache[path] = (state, sorted(read_manifest(store)['periods']))
+    return list(cached[1])
+
+
+def append_period(csv_path, periodo, store=STORE_DIR):
+    """Agrega el CSV de ``periodo`` al almacén y devuelve su entrada del manifiesto.
+
+    Si el periodo ya existe con el mismo contenido no hace nada; si existe con
+    otro contenido lanza ``PeriodExistsError`` (el historial no se reescribe).
+    """
+    if not _PERIOD_RE.match(periodo):
+        raise ValueError(f"Periodo inválido '{periodo}': se espera AAAA-MM")
+    source_hash = file_hash(csv_path)
+    os.makedirs(store, exist_ok=True)
+    # Todo el alta bajo el candado: otra alta no puede leer el manifiesto a medias
+    with _store_lock(store):
+        manifest = read_manifest(store)
+        existing = manifest['periods'].get(periodo)
+        if existing is not None:
+            if existing['source_sha256'] == source_hash:
+                return existing
+            raise PeriodExistsError(f"El periodo {periodo} ya existe con otro contenido")
+
+        df = read_source_csv(csv_path).drop(columns='eficiencia_relativa')
+        path = _partition_path(store, periodo)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        def write(tmp_path):
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        _write_atomic(path, write)
+        _write_json(_sketch_path(store, periodo),
+                    QuantileSketch().update(df['costo_por_m2'].to_numpy()).to_dict())
+
+        por_estado = df.groupby('estado', observed=True)['costo_por_m2'].agg(['count', 'sum'])
+        entry = {
+            'source_sha256': source_hash,
+            'rows': len(df),
+            'costo_por_m2_min': float(df['costo_por_m2'].min()),
+            'costo_por_m2_max': float(df['costo_por_m2'].max()),
+            'costo_por_m2_sum': float(df['costo_por_m2'].sum()),
+            'por_estado': {e: [int(r['count']), float(r['sum'])] for e, r in por_estado.iterrows()},
+        }
+        manifest['periods'][periodo] = entry
+        _write_json(os.path.join(store, MANIFEST), manifest)
+    return entry
+
+
+def summarize_periods(periodos=None, store=STORE_DIR):
+    """Agregados combinados de ``periodos`` (todos si es ``None``) leídos del manifiesto.
+
+    Devuelve filas, mínimo/máximo y promedio de ``costo_por_m2``, el umbral P75
+    (del sketch, error relativo ``QuantileSketch.alpha``) y el promedio por estado.
+    """
+    entries = read_manifest(store)['periods']
+    periodos = sorted(entries) if periodos is None else list(periodos)
+    faltantes = [p for p in periodos if p not in entries]
+    if faltantes:
+        raise KeyError(f"Periodos inexistentes: {', '.join(faltantes)}")
+
+    sketch, estados = None, {}
+    for p in periodos:
+        e = entries[p]
+        s = read_sketch(p, store)
+        sketch = s if sketch is None else sketch.merge(s)
+        for estado, (n, total) in e['por_estado'].items():
+            prev = estados.get(estado, (0, 0.0))
+            estados[estado] = (prev[0] + n, prev[1] + total)
+    rows = sum(entries[p]['rows'] for p in periodos)
+    return {
+        'periodos': periodos,
+        'rows': rows,
+        'costo_por_m2_min': min(entries[p]['costo_por_m2_min'] for p in periodos),
+        'costo_por_m2_max': max(entries[p]['costo_por_m2_max'] for p in periodos),
+        'costo_por_m2_mean': sum(entries[p]['costo_por_m2_sum'] for p in periodos) / rows,
+        'umbral_p75': sketch.quantile(0.75),
+        'costo_m2_por_estado': pd.Series({e: t / n for e, (n, t) in estados.items()},
+                                         name='costo_por_m2').sort_values(ascending=False),
+    }
+
+
+def load_periods(periodos, store=STORE_DIR):
+    """DataFrame de los ``periodos`` pedidos, leyendo sólo sus particiones (memory-map).
+
+    Agrega la columna categórica ``periodo`` y ``eficiencia_relativa`` escalada
+    con el mínimo/máximo de esos periodos. ``df.attrs['version']`` combina los
+    hashes de origen de los periodos leídos.
+    """
+    periodos = sorted(periodos)
+    entries = read_manifest(store)['periods']
+    tables = []
+    for p in periodos:
+        table = read_snapshot_table(_partition_path(store, p))
+        tables.append(table.append_column(
+            'periodo', pa.DictionaryArray.from_arrays(
+                pa.array(np.zeros(table.num_rows, dtype=np.int32)), pa.array([p]))))
+    table = pa.concat_tables(tables, promote_options='permissive').unify_dictionaries()
+    df = table.to_pandas(split_blocks=True)
+
+    min_val = min(entries[p]['costo_por_m2_min'] for p in periodos)
+    max_val = max(entries[p]['costo_por_m2_max'] for p in periodos)
+    df.insert(df.columns.get_loc('costo_por_ocupante') + 1, 'eficiencia_relativa',
+              (df['costo_por_m2'] - min_val) / (max_val - min_val))
+    df['periodo'] = df['periodo'].cat.set_categories(periodos)
+    df.attrs['version'] = hashlib.sha256(
+        ''.join(p + entries[p]['source_sha256'] for p in periodos).encode()).hexdigest()
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--store', default=STORE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_append = sub.add_parser('append', help="Agrega el CSV de un periodo")
+    p_append.add_argument('csv_path')
+    p_append.add_argument('periodo', help="AAAA-MM")
+    sub.add_parser('list', help="Lista los periodos y sus agregados")
+    args = parser.parse_args(argv)
+
+    if args.command == 'append':
+        entry = append_period(args.csv_path, args.periodo, args.store)
+        print(f"Periodo {args.periodo}: {entry['rows']:,} filas")
+    periodos = list_periods(args.store)
+    if not periodos:
+        print("El almacén no tiene periodos.")
+        return
+    resumen = summarize_periods(store=args.store)
+    print(f"Periodos: {', '.join(periodos)} · {resumen['rows']:,} filas")
+    print(f"Umbral de Ineficiencia (P75): {resumen['umbral_p75']:.2f}")
+    print("Top 5 Estados (Costo/m2):")
+    print(resumen['costo_m2_por_estado'].head(5))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Pre-cálculo en segundo plano de las selecciones de filtros más comunes.
+
+Casi todas las sesiones abren con la selección por defecto (todos los tipos y
+todos los estados). Después de cargar los datos, ``PrewarmRunner`` calcula en
+un hilo de segundo plano las figuras y tablas de esa selección y de las
+combinaciones listadas en ``ENERGIA_PREWARM_FILE`` (``prewarm.json`` en la raíz
+del repositorio por defecto) y las deja en la caché por filtros, así que la
+primera sesión no espera. Cuando aparece una versión nueva del dataset se
+lanza su pre-cálculo; se conservan los de las ``MAX_VERSIONS`` versiones más
+recientes (p. ej. sesiones con distintos periodos de facturación) y los más
+viejos se cancelan.
+
+La recarga en caliente lanza el pre-cálculo de la versión nueva en cuanto la
+publica, sin esperar al siguiente rerun (``energia.panels.prewarm_version``
+recibe el ``Dataset`` de esa versión).
+
+Formato del archivo (los valores que no existan en los datos se ignoran)::
+
+    [
+        {"tipos": ["Comercial"]},
+        {"tipos": ["Residencial"], "estados": ["Jalisco", "Nuevo León"]}
+    ]
+
+Una entrada sin ``tipos`` o sin ``estados`` usa todos los valores.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from energia.memo import canonical_key
+
+PREWARM_FILE = os.environ.get(
+    'ENERGIA_PREWARM_FILE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prewarm.json'))
+MAX_VERSIONS = 4
+
+
+def popular_selections(tipos, estados, path=PREWARM_FILE):
+    """Selección por defecto seguida de las de ``path``, como pares ``(tipos, estados)``.
+
+    Se descartan valores desconocidos, entradas vacías y repetidas.
+    """
+    tipos, estados = sorted(tipos), sorted(estados)
+    entries = []
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+    selections, seen = [], set()
+    for entry in [{}] + entries:
+        sel_tipos = [t for t in entry.get('tipos', tipos) if t in tipos]
+        sel_estados = [e for e in entry.get('estados', estados) if e in estados]
+        key = canonical_key(sel_tipos, sel_estados, None)
+        if sel_tipos and sel_estados and key not in seen:
+            seen.add(key)
+            selections.append((sel_tipos, sel_estados))
+    return selections
+
+
+class PrewarmJob:
+    """Pre-cálculo de una versión del dataset; avanza una selección a la vez."""
+
+    def __init__(self, version, selections):
+        self.version = version
+        self.selections = selections
+        self.done = 0
+        self.errors = []
+        self.seconds = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def finished(self):
+        return self.seconds is not None
+
+    def run(self, warm):
+        start = time.perf_counter()
+        for tipos, estados in self.selections:
+            if self._cancelled.is_set():
+                break
+            try:
+                warm(tipos, estados)
+            except Exception as exc:  # una selección fallida no detiene las demás
+                self.errors.append(f"{tipos} × {len(estados)} estados: {exc}")
+            self.done += 1
+        self.seconds = time.perf_counter() - start
+
+
+class PrewarmRunner:
+    """Lanza un ``PrewarmJob`` por versión del dataset en ``executor``."""
+
+    def __init__(self, executor, max_versions=MAX_VERSIONS):
+        self._executor = executor
+        self._lock = threading.Lock()
+        self.max_versions = max_versions
+        self.jobs = OrderedDict()
+
+    def ensure(self, version, selections, warm):
+        """Devuelve el pre-cálculo de ``version``, lanzándolo si falta.
+
+        ``warm(tipos, estados)`` calcula y guarda en caché una selección; corre
+        fuera del hilo de Streamlit, así que no debe llamar a ``st.*``.
+        """
+        with self._lock:
+            if version in self.jobs:
+                self.jobs.move_to_end(version)
+                return self.jobs[version]
+            job = self.jobs[version] = PrewarmJob(version, selections)
+            while len(self.jobs) > self.max_versions:
+                self.jobs.popitem(last=False)[1].cancel()
+        self._executor.submit(job.run, warm)
+        return job
@@ -0,0 +1,182 @@
+"""Perfilado opcional de cada rerun del dashboard.
+
+Con ``ENERGIA_PROFILE=1`` (o ``?debug=1`` en la URL) ``RerunProfiler`` mide
+cada sección de ``app.py``: duración, filas procesadas, si el resultado vino
+de la caché por filtros y el tamaño del JSON de cada figura enviada. Al final
+del rerun el perfil se agrega como una línea JSON a ``ENERGIA_PROFILE_LOG``
+(``profile_log.jsonl`` por defecto), de modo que se puedan seguir p50 y p99
+por sección entre sesiones::
+
+    python -m energia.profiling profile_log.jsonl
+
+Al pasar de ``ENERGIA_PROFILE_LOG_MB`` (50 MB por defecto) el log se rota a
+``<log>.1`` y se empieza uno nuevo. El panel de debug lee sólo las últimas
+``SUMMARY_TAIL`` líneas, desde el final del archivo.
+
+Desactivado, cada sección cuesta una llamada a función vacía.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+PROFILE_ENV = 'ENERGIA_PROFILE'
+DEFAULT_LOG_PATH = os.environ.get('ENERGIA_PROFILE_LOG', 'profile_log.jsonl')
+MAX_LOG_BYTES = int(float(os.environ.get('ENERGIA_PROFILE_LOG_MB', 50)) * 2**20)
+# Registros más recientes que se leen para los percentiles del panel de debug
+SUMMARY_TAIL = 2_000
+_TAIL_BLOCK = 1 << 16
+
+
+def profiling_requested(query_params=None):
+    """``True`` si el perfilado se pidió por variable de entorno o por la URL."""
+    if os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes'):
+        return True
+    return bool(query_params) and query_params.get('debug') in ('1', 'true')
+
+
+class _MemoProxy:
+    """Envuelve ``FilterMemo.get`` para registrar cada consulta como sección."""
+
+    def __init__(self, memo, profiler):
+        self._memo = memo
+        self._profiler = profiler
+
+    def get(self, name, key, compute):
+        computed = []
+
+        def wrapped():
+            computed.append(True)
+            return compute()
+
+        with self._profiler.section(name) as record:
+            value = self._memo.get(name, key, wrapped)
+            record['cache_hit'] = not computed
+        return value
+
+    def __getattr__(self, attr):
+        return getattr(self._memo, attr)
+
+
+class RerunProfiler:
+    """Secciones medidas de un rerun; no hace nada si ``enabled`` es falso."""
+
+    def __init__(self, enabled, session_id=None, log_path=DEFAULT_LOG_PATH):
+        self.enabled = enabled
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.log_path = log_path
+        self.rows = None
+        self.sections = []
+        self._thread = threading.get_ident()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def section(self, name, rows=None):
+        """Mide el bloque ``with``; el dict producido admite campos extra."""
+        record = {'name': name}
+        # Las secciones de hilos en segundo plano no pertenecen a este rerun
+        if not self.enabled or threading.get_ident() != self._thread:
+            yield record
+            return
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record.setdefault('rows', self.rows if rows is None else rows)
+            self.sections.append(record)
+
+    def wrap_memo(self, memo):
+        """Devuelve ``memo`` o, si el perfilado está activo, un proxy que mide cada ``get``."""
+        return _MemoProxy(memo, self) if self.enabled else memo
+
+    def record_figure(self, name, fig):
+        """Registra el tamaño del JSON que se enviará al navegador para ``fig``."""
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        size = len(fig.to_json().encode('utf-8'))
+        self.sections.append({'name': f'figura:{name}', 'seconds': time.perf_counter() - start,
+                              'rows': self.rows, 'payload_bytes': size})
+
+    def to_frame(self):
+        return pd.DataFrame(self.sections, columns=['name', 'seconds', 'rows', 'cache_hit',
+                                                    'payload_bytes'])
+
+    def write(self):
+        """Agrega el perfil del rerun como una línea JSON al log."""
+        if not self.enabled:
+            return None
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'session': self.session_id,
+            'total_seconds': time.perf_counter() - self._start,
+            'sections': self.sections,
+        }
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > MAX_LOG_BYTES:
+            os.replace(self.log_path, self.log_path + '.1')
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=float) + '\n')
+        return entry
+
+
+def _tail_lines(log_path, n):
+    """Últimas ``n`` líneas completas de ``log_path``, leyendo por bloques desde el final."""
+    with open(log_path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        data, pos = b'', end
+        while pos > 0 and data.count(b'\n') <= n:
+            pos = max(0, pos - _TAIL_BLOCK)
+            f.seek(pos)
+            data = f.read(end - pos)
+    # Un bloque puede empezar a mitad de un carácter: sólo afecta a la primera línea
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    # La primera línea puede estar cortada si no se llegó al inicio del archivo
+    if pos > 0:
+        lines = lines[1:]
+    return lines[-n:]
+
+
+def read_log(log_path=DEFAULT_LOG_PATH, tail=None):
+    """Secciones del log como DataFrame (una fila por sección de cada rerun)."""
+    if not os.path.exists(log_path):
+        return pd.DataFrame(columns=['timestamp', 'session', 'name', 'seconds'])
+    if tail:
+        lines = _tail_lines(log_path, tail)
+    else:
+        with open(log_path, encoding='utf-8') as f:
+            lines = f.readlines()
+    rows = []
+    for line in lines:
+        entry = json.loads(line)
+        rows.append({'timestamp': entry['timestamp'], 'session': entry['session'],
+                     'name': 'total', 'seconds': entry['total_seconds']})
+        for s in entry['sections']:
+            rows.append({'timestamp': entry['timestamp'], 'session': entry['session'], **s})
+    return pd.DataFrame(rows)
+
+
+def summarize(log, by='name'):
+    """p50, p99, media y conteo de ``seconds`` por sección."""
+    if log.empty:
+        return pd.DataFrame(columns=['n', 'p50_ms', 'p99_ms', 'mean_ms'])
+    g = log.groupby(by)['seconds']
+    return pd.DataFrame({
+        'n': g.size(),
+        'p50_ms': g.quantile(0.50) * 1000,
+        'p99_ms': g.quantile(0.99) * 1000,
+        'mean_ms': g.mean() * 1000,
+    }).sort_values('p99_ms', ascending=False)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LOG_PATH
+    log = read_log(path)
+    print(f"Reruns: {(log['name'] == 'total').sum():,} · sesiones: {log['session'].nunique():,}")
+    print(summarize(log).round(2).to_string())
@@ -0,0 +1,336 @@
+"""Interfaz de consultas (filtro, agregados por estado, correlación, cuantiles).
+
+Las mismas consultas tienen dos implementaciones intercambiables:
+
+- ``PandasBackend`` (por defecto): sobre el DataFrame en memoria. Con el cubo y
+  el índice por umbral de ``energia.dataset`` responde los agregados por
+  estado, la correlación y el cuantil global sin recorrer filas.
+- ``ArrowBackend``: fuera de memoria sobre el snapshot Arrow del CSV o las
+  particiones del almacén de periodos, con ``pyarrow.dataset``. El filtro por
+  tipo/estado y la selección de columnas se empujan al escaneo, que recorre
+  lotes de ``BATCH_SIZE`` filas leídos por memory-map; la memoria usada
+  depende del lote, no del número de filas. Con el almacén de periodos sólo
+  se abren las particiones pedidas, así que el total puede no caber en RAM.
+
+Los resultados coinciden: conteos y el cuantil (interpolación lineal, como
+``Series.quantile``) son exactos; medias y correlaciones coinciden hasta el
+redondeo de punto flotante (los momentos por lote se combinan con la fórmula
+por pares de Chan et al., como en ``energia.cube``).
+
+El cuantil exacto fuera de memoria se obtiene por refinamiento de histograma:
+se cuenta en ``QUANTILE_BINS`` intervalos entre el mínimo y el máximo, se
+estrecha el rango al intervalo que contiene el rango buscado y se repite hasta
+que quedan a lo más ``QUANTILE_COLLECT`` valores, que se ordenan en memoria
+(con muchos empates se guardan sólo los valores distintos y su conteo).
+
+El dashboard hace su filtro, sus agregados por estado, sus correlaciones y el
+umbral P75 con el backend de ``ENERGIA_QUERY_BACKEND`` (``Dataset.backend``).
+``pyarrow.dataset`` se importa sólo al abrir un ``ArrowBackend``, así que el
+backend pandas no lo carga.
+
+Uso desde la terminal::
+
+    python -m energia.query energy_consumption_mexico.csv --backend arrow --tipos Comercial
+    python -m energia.query --periodos 2026-01 2026-02 --backend arrow
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from energia.periods import STORE_DIR, _partition_path, load_periods, read_manifest
+from energia.schema import COLUMNAS_NUMERICAS
+from energia.snapshot import ensure_snapshot, load_snapshot, read_snapshot_table, snapshot_paths
+
+QUERY_BACKEND = os.environ.get('ENERGIA_QUERY_BACKEND', 'pandas')
+BATCH_SIZE = 1 << 18
+QUANTILE_BINS = 1 << 16
+QUANTILE_COLLECT = 1 << 20
+QUANTILE_ROUNDS = 4
+
+
+def _ipc_dataset(paths):
+    """``pyarrow.dataset`` sobre archivos Arrow IPC leídos por memory-map."""
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+
+    # Con memory-map los lotes son vistas del archivo (caché del sistema operativo)
+    # y sólo se asignan las columnas filtradas de cada lote
+    return ds.dataset(paths, format='ipc', filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+
+def _isin(frame, tipos, estados):
+    """Máscara booleana de las filas de ``frame`` con esos tipos y estados (``None``: todos)."""
+    mask = np.ones(len(frame), dtype=bool)
+    if tipos is not None:
+        mask &= frame['tipo_cliente'].isin(tipos).to_numpy()
+    if estados is not None:
+        mask &= frame['estado'].isin(estados).to_numpy()
+    return mask
+
+
+def _lerp(lo, hi, frac):
+    """Interpolación lineal igual a la de ``np.quantile`` entre dos valores."""
+    return float(np.quantile(np.array([lo, hi]), frac))
+
+
+class PandasBackend:
+    """Consultas sobre un DataFrame en memoria.
+
+    ``cube`` (``energia.cube``) y ``threshold_index`` (``energia.threshold``)
+    son opcionales y deben ser de ``df``; ``build_dataset`` asigna el cubo
+    cuando ya conoce el umbral.
+    """
+
+    name = 'pandas'
+
+    def __init__(self, df, cube=None, threshold_index=None):
+        self.df = df
+        self.cube = cube
+        self.threshold_index = threshold_index
+
+    def _filter(self, tipos, estados, columns):
+        return self.df.loc[self.mask(tipos, estados), columns]
+
+    def mask(self, tipos=None, estados=None):
+        """Máscara booleana de las filas de la selección."""
+        return _isin(self.df, tipos, estados)
+
+    def count(self, tipos=None, estados=None):
+        """Número de filas de la selección."""
+        if self.cube is not None:
+            return int(self.cube.cells['n'].to_numpy()[_isin(self.cube.cells, tipos, estados)].sum())
+        return int(self.mask(tipos, estados).sum())
+
+    def quantile(self, column, q, tipos=None, estados=None):
+        """Cuantil ``q`` de ``column`` en la selección."""
+        if (self.threshold_index is not None and column == 'costo_por_m2'
+                and tipos is None and estados is None):
+            return self.threshold_index.quantile(q)
+        return self._filter(tipos, estados, [column])[column].quantile(q)
+
+    def by_estado(self, umbral, tipos=None, estados=None):
+        """Por estado: número de clientes, costo medio por m² y % sobre ``umbral``."""
+        cube = self.cube
+        if cube is not None and umbral != cube.umbral:
+            cube = self.threshold_index.apply(cube, umbral) if self.threshold_index else None
+        if cube is not None:
+            return cube.by_estado(_isin(cube.cells, tipos, estados))
+        df = self._filter(tipos, estados, ['estado', 'costo_por_m2'])
+        grouped = df.groupby('estado', observed=True)['costo_por_m2']
+        return pd.DataFrame({
+            'n_clientes': grouped.size(),
+            'costo_medio_m2': grouped.mean(),
+            'pct_ineficientes': (df['costo_por_m2'] > umbral).groupby(
+                df['estado'], observed=True).mean() * 100,
+        })
+
+    def corr(self, tipos=None, estados=None, columns=COLUMNAS_NUMERICAS):
+        """Matriz de correlación de Pearson de ``columns`` en la selección."""
+        if self.cube is not None and list(columns) == self.cube.columns:
+            return self.cube.corr(_isin(self.cube.cells, tipos, estados))
+        return self._filter(tipos, estados, list(columns)).corr()
+
+
+class ArrowBackend:
+    """Consultas por lotes sobre archivos Arrow IPC, sin cargar el dataset."""
+
+    name = 'arrow'
+
+    def __init__(self, dataset, derived=None, batch_size=BATCH_SIZE):
+        self.dataset = dataset
+        # Columnas calculadas al escanear (expresiones de pyarrow.compute)
+        self.derived = derived or {}
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_csv(cls, csv_path, **kwargs):
+        """Backend sobre el snapshot de ``csv_path`` (compilándolo si hace falta)."""
+        import pyarrow.dataset as ds
+
+        ensure_snapshot(csv_path)
+        # El snapshot se reemplaza al cambiar el CSV: se fija el archivo de esta
+        # versión (memory-map, sin copiar) para que no cambie bajo un Dataset publicado
+        return cls(ds.dataset(read_snapshot_table(snapshot_paths(csv_path)[0])), **kwargs)
+
+    @classmethod
+    def from_periods(cls, periodos, store=STORE_DIR, **kwargs):
+        """Backend sobre las particiones de ``periodos``; las demás no se abren."""
+        entries = read_manifest(store)['periods']
+        min_val = min(entries[p]['costo_por_m2_min'] for p in periodos)
+        max_val = max(entries[p]['costo_por_m2_max'] for p in periodos)
+        # Igual que load_periods: eficiencia_relativa se escala con los periodos elegidos
+        derived = {'eficiencia_relativa':
+                   (pc.field('costo_por_m2') - min_val) / (max_val - min_val)}
+        # En el mismo orden que load_periods, así que las máscaras coinciden fila a fila
+        paths = [os.path.abspath(_partition_path(store, p)) for p in sorted(periodos)]
+        return cls(_ipc_dataset(paths), derived, **kwargs)
+
+    @staticmethod
+    def _filter(tipos, estados):
+        """Expresión de filtro de la selección (``None`` si no filtra)."""
+        expr = None
+        for col, values in (('tipo_cliente', tipos), ('estado', estados)):
+            if values is not None:
+                cond = pc.field(col).isin(pa.array(list(values), type=pa.string()))
+                expr = cond if expr is None else expr & cond
+        return expr
+
+    def _batches(self, tipos, estados, columns):
+        """DataFrames por lote con ``columns`` de las filas de la selección."""
+        projection = {c: self.derived.get(c, pc.field(c)) for c in columns}
+        scanner = self.dataset.scanner(columns=projection, filter=self._filter(tipos, estados),
+                                       batch_size=self.batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def _values(self, column, tipos, estados, lo=-np.inf, hi=np.inf, closed=True):
+        """Valores no nulos de ``column`` por lote, dentro de ``[lo, hi]`` (o ``[lo, hi)``)."""
+        for batch in self._batches(tipos, estados, [column]):
+            values = batch[column].to_numpy(dtype=np.float64)
+            yield values[(values >= lo) & ((values <= hi) if closed else (values < hi))]
+
+    def mask(self, tipos=None, estados=None):
+        """Máscara booleana de las filas de la selección, en el orden de los archivos."""
+        expr = self._filter(tipos, estados)
+        if expr is None:
+            return np.ones(self.dataset.count_rows(), dtype=bool)
+        table = self.dataset.to_table(columns={'sel': expr}, batch_size=self.batch_size)
+        return table['sel'].to_numpy()
+
+    def count(self, tipos=None, estados=None):
+        """Número de filas de la selección."""
+        return self.dataset.count_rows(filter=self._filter(tipos, estados))
+
+    def quantile(self, column, q, tipos=None, estados=None):
+        """Cuantil ``q`` exacto de ``column`` (interpolación lineal, como pandas)."""
+        n, lo, hi = 0, np.inf, -np.inf
+        for values in self._values(column, tipos, estados):
+            if len(values):
+                n += len(values)
+                lo, hi = min(lo, values.min()), max(hi, values.max())
+        if not n:
+            return np.nan
+        pos = q * (n - 1)
+        rank = int(np.floor(pos))
+        ranks = [rank, min(rank + 1, n - 1)]
+
+        # Se estrecha [lo, hi] a los intervalos que contienen ``ranks``;
+        # ``below`` es cuántos valores quedan por debajo de ``lo``
+        below, closed = 0, True
+        for _ in range(QUANTILE_ROUNDS):
+            edges = np.linspace(lo, hi, QUANTILE_BINS + 1)
+            counts = np.zeros(QUANTILE_BINS, dtype=np.int64)
+            for values in self._values(column, tipos, estados, lo, hi, closed):
+                bins = np.clip(np.searchsorted(edges, values, side='right') - 1,
+                               0, QUANTILE_BINS - 1)
+                counts += np.bincount(bins, minlength=QUANTILE_BINS)
+            cum = below + np.cumsum(counts)
+            first = int(np.searchsorted(cum, ranks[0], side='right'))
+            last = int(np.searchsorted(cum, ranks[1], side='right'))
+            below = int(cum[first - 1]) if first else below
+            closed = closed and last == QUANTILE_BINS - 1
+            lo, hi = edges[first], edges[last + 1]
+            if int(cum[last]) - below <= QUANTILE_COLLECT:
+                break
+
+        # Valores distintos del rango con su multiplicidad: acota la memoria aun con empates
+        found = pd.Series(dtype=np.int64)
+        for values in self._values(column, tipos, estados, lo, hi, closed):
+            uniq, mult = np.unique(values, return_counts=True)
+            found = found.add(pd.Series(mult, index=uniq), fill_value=0)
+        cum = below + np.cumsum(found.sort_index().to_numpy())
+        v0, v1 = (found.index[int(np.searchsorted(cum, r, side='right'))] for r in ranks)
+        return _lerp(v0, v1, pos - rank)
+
+    def by_estado(self, umbral, tipos=None, estados=None):
+        """Por estado: número de clientes, costo medio por m² y % sobre ``umbral``."""
+        total = None
+        for batch in self._batches(tipos, estados, ['estado', 'costo_por_m2']):
+            batch['inef'] = batch['costo_por_m2'] > umbral
+            agg = batch.groupby('estado', observed=True).agg(
+                n=('costo_por_m2', 'size'), suma=('costo_por_m2', 'sum'), n_inef=('inef', 'sum'))
+            total = agg if total is None else total.add(agg, fill_value=0)
+        if total is None:
+            return pd.DataFrame({'n_clientes': pd.Series(dtype=np.int64),
+                                 'costo_medio_m2': pd.Series(dtype=np.float64),
+                                 'pct_ineficientes': pd.Series(dtype=np.float64)})
+        total = total.sort_index()
+        return pd.DataFrame({
+            'n_clientes': total['n'].astype(np.int64),
+            'costo_medio_m2': total['suma'] / total['n'],
+            'pct_ineficientes': total['n_inef'] / total['n'] * 100,
+        })
+
+    def corr(self, tipos=None, estados=None, columns=COLUMNAS_NUMERICAS):
+        """Matriz de correlación de Pearson de ``columns`` en la selección."""
+        columns = list(columns)
+        k = len(columns)
+        n, mean, comoment = 0, np.zeros(k), np.zeros((k, k))
+        for batch in self._batches(tipos, estados, columns):
+            values = batch[columns].to_numpy(dtype=np.float64)
+            n_b = len(values)
+            mean_b = values.mean(axis=0)
+            centered = values - mean_b
+            delta = mean_b - mean
+            total = n + n_b
+            comoment += centered.T @ centered + np.outer(delta, delta) * (n * n_b / total)
+            mean += delta * (n_b / total)
+            n = total
+        std = np.sqrt(np.diag(comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = comoment / np.outer(std, std) if n > 1 else np.full((k, k), np.nan)
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+BACKENDS = {'pandas': PandasBackend, 'arrow': ArrowBackend}
+
+
+def open_backend(name=QUERY_BACKEND, csv_path=None, periodos=None, store=STORE_DIR, df=None):
+    """Backend ``name`` sobre ``csv_path`` o sobre los ``periodos`` del almacén.
+
+    ``df`` es el DataFrame ya cargado de esa misma fuente; el backend pandas lo
+    usa en vez de volver a leerlo.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+    if name == 'arrow':
+        return (ArrowBackend.from_periods(periodos, store) if periodos
+                else ArrowBackend.from_csv(csv_path))
+    if df is None:
+        df = load_periods(periodos, store) if periodos else load_snapshot(csv_path)
+    return PandasBackend(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', help="CSV de origen (o usar --periodos)")
+    parser.add_argument('--periodos', nargs='+', help="Periodos del almacén a consultar")
+    parser.add_argument('--store', default=STORE_DIR)
+    parser.add_argument('--backend', choices=list(BACKENDS), default=QUERY_BACKEND)
+    parser.add_argument('--tipos', nargs='+')
+    parser.add_argument('--estados', nargs='+')
+    args = parser.parse_args(argv)
+    if not args.csv_path and not args.periodos:
+        parser.error("Indica un CSV o --periodos")
+
+    backend = open_backend(args.backend, args.csv_path, args.periodos, args.store)
+    sel = dict(tipos=args.tipos, estados=args.estados)
+    # El umbral es el P75 global; la selección sólo filtra los agregados
+    umbral = backend.quantile('costo_por_m2', 0.75)
+    print(f"Backend: {backend.name}")
+    print(f"Filas en la selección: {backend.count(**sel):,}")
+    print(f"Umbral P75 global: ${umbral:,.4f}/m²")
+    print(f"P75 de la selección: ${backend.quantile('costo_por_m2', 0.75, **sel):,.4f}/m²")
+    print("\nPor estado:")
+    print(backend.by_estado(umbral, **sel).round(2).to_string())
+    print("\nCorrelación:")
+    print(backend.corr(**sel).round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
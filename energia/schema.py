@@ -0,0 +1,73 @@
+"""Esquema del dataset de consumo energético y métricas derivadas."""
+import pandas as pd
+
+# Columnas del CSV original y su tipo esperado
+COLUMNAS_ORIGEN = {
+    'cliente_id': 'object',
+    'tipo_cliente': 'category',
+    'estado': 'category',
+    'superficie_m2': 'int64',
+    'ocupantes': 'int64',
+    'costo_energia_mxn': 'float64',
+}
+
+# Columnas codificadas por diccionario (pocas categorías repetidas)
+COLUMNAS_CATEGORICAS = ['tipo_cliente', 'estado']
+
+# Métricas calculadas a partir de las columnas originales
+COLUMNAS_DERIVADAS = ['costo_por_m2', 'costo_por_ocupante', 'eficiencia_relativa']
+
+# Columnas numéricas usadas en la matriz de correlación
+COLUMNAS_NUMERICAS = ['superficie_m2', 'ocupantes', 'costo_energia_mxn',
+                      'costo_por_m2', 'costo_por_ocupante', 'eficiencia_relativa']
+
+
+class SchemaError(ValueError):
+    """El archivo de datos no cumple con el esquema esperado."""
+
+
+def validate_schema(df):
+    """Verifica columnas, nulos y rangos; lanza ``SchemaError`` si algo falla."""
+    faltantes = [c for c in COLUMNAS_ORIGEN if c not in df.columns]
+    if faltantes:
+        raise SchemaError(f"Columnas faltantes: {', '.join(faltantes)}")
+
+    nulos = df[list(COLUMNAS_ORIGEN)].isnull().sum()
+    nulos = nulos[nulos > 0]
+    if len(nulos):
+        raise SchemaError(f"Valores nulos en: {', '.join(nulos.index)}")
+
+    for col in ['superficie_m2', 'ocupantes', 'costo_energia_mxn']:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            raise SchemaError(f"La columna '{col}' debe ser numérica")
+    if (df['superficie_m2'] <= 0).any() or (df['ocupantes'] <= 0).any():
+        raise SchemaError("superficie_m2 y ocupantes deben ser mayores a cero")
+
+    if df['cliente_id'].duplicated().any():
+        raise SchemaError("cliente_id contiene identificadores duplicados")
+
+
+def cast_types(df):
+    """Convierte las columnas originales a sus tipos compactos."""
+    df = df.copy()
+    for col, dtype in COLUMNAS_ORIGEN.items():
+        df[col] = df[col].astype(str) if dtype == 'object' else df[col].astype(dtype)
+    return df
+
+
+def add_derived_metrics(df, min_val=None, max_val=None):
+    """Agrega costo_por_m2, costo_por_ocupante y eficiencia_relativa.
+
+    ``min_val``/``max_val`` permiten escalar con límites globales cuando
+    ``df`` es sólo una parte del dataset (p. ej. un chunk).
+    """
+    df['costo_por_m2'] = df['costo_energia_mxn'] / df['superficie_m2']
+    df['costo_por_ocupante'] = df['costo_energia_mxn'] / df['ocupantes']
+
+    # Eficiencia relativa (0 = más eficiente, 1 = menos eficiente)
+    if min_val is None:
+        min_val = df['costo_por_m2'].min()
+    if max_val is None:
+        max_val = df['costo_por_m2'].max()
+    df['eficiencia_relativa'] = (df['costo_por_m2'] - min_val) / (max_val - min_val)
+    return df
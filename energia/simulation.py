@@ -0,0 +1,241 @@
+"""Simulación Monte Carlo del ahorro de un programa de retrofit.
+
+El bloque "Oportunidad de Ahorro" supone que todos los ineficientes bajan al
+costo/m² medio. Aquí cada simulación es un programa posible:
+
+- cada cliente ineficiente se inscribe con la tasa de adopción de su estado;
+- el retrofit reduce su costo mensual en un porcentaje uniforme entre
+  ``reduction`` (15–20% por defecto, la estimación del README);
+- con presupuesto, los retrofits (``cost_m2`` MXN por m²) se financian en el
+  orden en que vienen los clientes —del mayor al menor costo/m²— hasta agotarlo.
+
+Las simulaciones se calculan por bloques como operaciones de arreglos
+(``float32``, una fila por simulación y una columna por cliente). Los clientes
+se agrupan por estado, así que la suma por estado es ``np.add.reduceat`` sobre
+tramos contiguos. Cada proceso recibe un grupo contiguo de bloques y los
+arreglos de los clientes se le envían una sola vez, por memoria compartida.
+Cada bloque tiene su propia semilla derivada de ``seed``, así que el resultado
+es el mismo con cualquier número de procesos.
+Se reportan percentiles del ahorro mensual y anual por estado y del total (los
+percentiles del total se toman sobre la suma por simulación, no se suman).
+
+Uso desde la terminal::
+
+    python -m energia.simulation energy_consumption_mexico.csv --adopcion 0.3 --presupuesto 5e6
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from energia.export import inefficient_positions
+from energia.snapshot import load_snapshot
+
+N_SIMS = 5000
+PERCENTILES = (5, 50, 95)
+DEFAULT_COST_M2 = 250.0
+SIM_WORKERS = int(os.environ.get('ENERGIA_SIM_WORKERS', os.cpu_count() or 1))
+# Elementos (simulaciones × clientes) por bloque: ~16 MB por arreglo float32
+_BLOCK_ELEMENTS = 1 << 22
+# Primer prefijo (clientes en orden de prioridad) donde se busca el fin del presupuesto
+_FIRST_PREFIX = 1 << 12
+
+
+class Scenario(NamedTuple):
+    """Supuestos de un programa de retrofit."""
+    uptake: tuple                 # tasa de adopción (0–1) por estado, en el orden de ``estados``
+    reduction: tuple = (0.15, 0.20)
+    budget: float = None          # MXN totales; ``None`` = sin tope
+    cost_m2: float = DEFAULT_COST_M2
+
+
+def _share(arrays):
+    """Copia ``arrays`` a un bloque de memoria compartida; devuelve el bloque y cómo leerlo."""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays)))
+    specs, offset = [], 0
+    for a in arrays:
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf, offset=offset)[...] = a
+        specs.append((a.dtype.str, a.shape, offset))
+        offset += a.nbytes
+    return shm, (shm.name, specs)
+
+
+def _simulate_blocks(task):
+    """Ahorro, retrofits e inversión por estado de varios bloques de simulaciones.
+
+    ``data`` son los arreglos de los clientes o, en otro proceso, el nombre del
+    bloque de memoria compartida donde están (así se envían una sola vez).
+    """
+    data, n_states, scenario, blocks = task
+    shm = None
+    if isinstance(data[0], str):
+        name, specs = data
+        shm = shared_memory.SharedMemory(name=name)
+        data = [np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+                for dtype, shape, offset in specs]
+    try:
+        parts = [_simulate_block(*data, n_states, scenario, n_sims, seed)
+                 for n_sims, seed in blocks]
+    finally:
+        if shm is not None:
+            del data
+            shm.close()
+    return [np.concatenate(m) for m in zip(*parts)]
+
+
+def _funded(inversion, order, rank, budget):
+    """Máscara (por estado) de los clientes que el presupuesto alcanza a financiar.
+
+    Se financia en orden de prioridad, así que en cada simulación los
+    financiados son un prefijo de ese orden: basta con hallar dónde la suma
+    acumulada pasa de ``budget``. Se acumula sobre prefijos que se duplican
+    hasta agotar el presupuesto en todas las simulaciones.
+    """
+    n_sims, n = inversion.shape
+    cutoff = np.full(n_sims, n)
+    pending = np.arange(n_sims)
+    width = _FIRST_PREFIX
+    while len(pending):
+        width = min(width, n)
+        spent = np.cumsum(inversion[np.ix_(pending, rank[:width])], axis=1, dtype=np.float64)
+        done = (spent[:, -1] > budget) | (width == n)
+        cutoff[pending[done]] = [np.searchsorted(row, budget, side='right') for row in spent[done]]
+        pending = pending[~done]
+        width *= 2
+    return order < cutoff[:, None]
+
+
+def _simulate_block(costo, superficie, codes, order, rank, n_states, scenario, n_sims, seed):
+    """Un bloque de ``n_sims`` simulaciones sobre los clientes ordenados por estado."""
+    rng = np.random.default_rng(seed)
+    uptake = np.asarray(scenario.uptake, dtype=np.float32)[codes]
+    lo, hi = scenario.reduction
+    # Condicionado a inscribirse, u / adopción ~ U(0, 1): el mismo número da la
+    # reducción, así que ahorro = u · pendiente + base (con adopción 0 nadie se inscribe)
+    slope = np.where(uptake > 0, (hi - lo) / np.where(uptake > 0, uptake, 1), 0) * costo
+    base = (lo * costo).astype(np.float32)
+
+    u = rng.random((n_sims, len(costo)), dtype=np.float32)
+    joins = u < uptake
+    inversion = joins * (scenario.cost_m2 * superficie).astype(np.float32)
+    if scenario.budget is not None:
+        joins &= _funded(inversion, order, rank, scenario.budget)
+        inversion *= joins
+    savings = u
+    savings *= slope.astype(np.float32)
+    savings += base
+    savings *= joins
+
+    # Suma por estado sobre tramos contiguos; los estados sin clientes quedan en 0
+    counts = np.bincount(codes, minlength=n_states)
+    present = counts > 0
+    starts = (np.cumsum(counts) - counts)[present]
+    sums = []
+    for values in (savings, joins.view(np.int8), inversion):
+        total = np.zeros((n_sims, n_states), dtype=np.float64)
+        total[:, present] = np.add.reduceat(values, starts, axis=1,
+                                            dtype=np.int32 if values.dtype == np.int8 else None)
+        sums.append(total)
+    return sums
+
+
+def simulate(costo, superficie, estados, scenario, n_sims=N_SIMS, seed=0,
+             workers=SIM_WORKERS, executor=None, percentiles=PERCENTILES):
+    """Percentiles del ahorro por estado (y ``'Total'``) en ``n_sims`` programas simulados.
+
+    ``costo``, ``superficie`` y ``estados`` describen a los clientes
+    ineficientes en orden de prioridad; ``scenario.uptake`` trae una tasa por
+    categoría de ``estados`` (``pd.Categorical``). ``executor`` reutiliza un
+    pool de procesos; si no se da, se crea uno con ``workers`` procesos.
+    """
+    estados = pd.Categorical(estados)
+    codes = estados.codes.astype(np.int64)
+    n_states = len(estados.categories)
+    # Clientes agrupados por estado (``order``) y la posición de cada uno en ese orden (``rank``)
+    order = np.argsort(codes, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    arrays = [np.asarray(costo, dtype=np.float32)[order],
+              np.asarray(superficie, dtype=np.float64)[order],
+              codes[order].astype(np.int32), order, rank]
+
+    # Bloques de tamaño fijo con su propia semilla: el resultado no depende de los procesos
+    per_block = max(1, _BLOCK_ELEMENTS // max(len(codes), 1))
+    sizes = [min(per_block, n_sims - start) for start in range(0, n_sims, per_block)]
+    blocks = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    # Un grupo contiguo de bloques por proceso
+    n_tasks = max(1, min(workers, len(blocks)))
+    bounds = np.linspace(0, len(blocks), n_tasks + 1).round().astype(int)
+    groups = [blocks[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    if n_tasks == 1:
+        parts = [_simulate_blocks((arrays, n_states, scenario, blocks))]
+    else:
+        shm, shared = _share(arrays)
+        try:
+            tasks = [(shared, n_states, scenario, group) for group in groups]
+            if executor is not None:
+                parts = list(executor.map(_simulate_blocks, tasks))
+            else:
+                with ProcessPoolExecutor(max_workers=n_tasks) as pool:
+                    parts = list(pool.map(_simulate_blocks, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+    savings, retrofits, inversion = (np.concatenate(m) for m in zip(*parts))
+
+    # Columnas: estados + total por simulación
+    savings = np.column_stack([savings, savings.sum(axis=1)])
+    index = pd.Index(list(estados.categories) + ['Total'], name='estado')
+    bands = np.percentile(savings, percentiles, axis=0)
+    result = pd.DataFrame({
+        'clientes': np.r_[np.bincount(codes, minlength=n_states), len(codes)],
+        'retrofits_p50': np.median(np.column_stack([retrofits, retrofits.sum(axis=1)]), axis=0),
+        'inversion_p50': np.median(np.column_stack([inversion, inversion.sum(axis=1)]), axis=0),
+    }, index=index)
+    for p, band in zip(percentiles, bands):
+        result[f'mensual_p{p}'] = band
+    for p, band in zip(percentiles, bands):
+        result[f'anual_p{p}'] = band * 12
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path')
+    parser.add_argument('--adopcion', type=float, default=0.3,
+                        help="Tasa de adopción para todos los estados (0–1)")
+    parser.add_argument('--reduccion', type=float, nargs=2, default=[0.15, 0.20],
+                        metavar=('MIN', 'MAX'))
+    parser.add_argument('--presupuesto', type=float, help="MXN totales (default: sin tope)")
+    parser.add_argument('--costo-m2', type=float, default=DEFAULT_COST_M2,
+                        help="Costo del retrofit por m² (MXN)")
+    parser.add_argument('--simulaciones', type=int, default=N_SIMS)
+    parser.add_argument('--workers', type=int, default=SIM_WORKERS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df = load_snapshot(args.csv_path)
+    costo_m2 = df['costo_por_m2'].to_numpy()
+    pos = inefficient_positions(costo_m2, np.ones(len(df), dtype=bool),
+                                df['costo_por_m2'].quantile(0.75))
+    estados = df['estado'].to_numpy()[pos]
+    n_estados = len(pd.Categorical(estados).categories)
+    scenario = Scenario((args.adopcion,) * n_estados, tuple(args.reduccion),
+                        args.presupuesto, args.costo_m2)
+
+    start = time.perf_counter()
+    result = simulate(df['costo_energia_mxn'].to_numpy()[pos], df['superficie_m2'].to_numpy()[pos],
+                      estados, scenario, args.simulaciones, args.seed, args.workers)
+    print(f"{args.simulaciones:,} programas sobre {len(pos):,} clientes ineficientes · "
+          f"{time.perf_counter() - start:.2f} s")
+    print(result.round(0).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Snapshot columnar (Arrow IPC) del CSV de consumo energético.
+
+El CSV se compila una sola vez a un archivo Arrow sin compresión con
+``tipo_cliente``/``estado`` codificados por diccionario y las métricas
+derivadas ya calculadas. El snapshot se reconstruye únicamente cuando cambia
+el hash del contenido del CSV; en los demás arranques se lee mediante
+memory-map, sin volver a parsear texto.
+
+Uso desde la terminal::
+
+    python -m energia.snapshot energy_consumption_mexico.csv
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+from energia.schema import COLUMNAS_CATEGORICAS, add_derived_metrics, cast_types, validate_schema
+
+# Se incrementa cuando cambia el formato del snapshot para forzar su reconstrucción
+SCHEMA_VERSION = 1
+
+SNAPSHOT_DIR = '.snapshot'
+_BLOCK_SIZE = 1 << 20
+
+
+def file_hash(path):
+    """SHA-256 del contenido del archivo, leído en bloques de 1 MiB."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def snapshot_paths(csv_path):
+    """Rutas del snapshot ``.arrow`` y de su metadata ``.json`` para un CSV."""
+    folder = os.path.join(os.path.dirname(os.path.abspath(csv_path)), SNAPSHOT_DIR)
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(folder, name + '.arrow'), os.path.join(folder, name + '.json')
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    # Temporal único en el mismo directorio: dos procesos que recompilan a la
+    # vez no escriben sobre el mismo archivo, y el último os.replace gana entero
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_meta(meta_path, meta):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+    _write_atomic(meta_path, write)
+
+
+def read_source_csv(csv_path):
+    """Lee el CSV original con tipos compactos, valida el esquema y agrega métricas."""
+    dtypes = {col: 'category' for col in COLUMNAS_CATEGORICAS}
+    df = pd.read_csv(csv_path, dtype=dtypes)
+    validate_schema(df)
+    df = cast_types(df)
+    return add_derived_metrics(df)
+
+
+def compile_snapshot(csv_path, source_hash=None):
+    """Compila el CSV a un snapshot Arrow y devuelve su metadata."""
+    snap_path, meta_path = snapshot_paths(csv_path)
+    os.makedirs(os.path.dirname(snap_path), exist_ok=True)
+
+    if source_hash is None:
+        source_hash = file_hash(csv_path)
+    df = read_source_csv(csv_path)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'source_sha256': source_hash.encode(),
+    })
+
+    def write(tmp_path):
+        # Sin compresión para poder leerlo con memory-map sin copias
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    _write_atomic(snap_path, write)
+
+    stat = os.stat(csv_path)
+    meta = {
+        'schema_version': SCHEMA_VERSION,
+        'source_sha256': source_hash,
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'rows': len(df),
+    }
+    _write_meta(meta_path, meta)
+    return meta
+
+
+def ensure_snapshot(csv_path):
+    """Garantiza un snapshot vigente para ``csv_path`` y devuelve su metadata.
+
+    Si tamaño y fecha de modificación coinciden con la metadata guardada no se
+    recalcula el hash. Si cambiaron, se compara el hash del contenido y sólo se
+    recompila cuando éste es distinto.
+    """
+    snap_path, meta_path = snapshot_paths(csv_path)
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get('schema_version') != SCHEMA_VERSION or not os.path.exists(snap_path):
+        return compile_snapshot(csv_path)
+
+    stat = os.stat(csv_path)
+    if meta['source_size'] == stat.st_size and meta['source_mtime_ns'] == stat.st_mtime_ns:
+        return meta
+
+    source_hash = file_hash(csv_path)
+    if source_hash != meta['source_sha256']:
+        return compile_snapshot(csv_path, source_hash)
+
+    # Mismo contenido (p. ej. el archivo sólo fue tocado): actualizar metadata
+    meta.update(source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns)
+    _write_meta(meta_path, meta)
+    return meta
+
+
+def read_snapshot_table(snap_path):
+    """Abre el snapshot como ``pyarrow.Table`` respaldada por memory-map."""
+    source = pa.memory_map(snap_path, 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+def load_snapshot(csv_path):
+    """Devuelve el DataFrame del snapshot de ``csv_path`` (compilándolo si hace falta).
+
+    ``df.attrs['version']`` contiene el hash del CSV de origen y sirve como
+    versión del dataset.
+    """
+    meta = ensure_snapshot(csv_path)
+    snap_path, _ = snapshot_paths(csv_path)
+    table = read_snapshot_table(snap_path)
+
+    # split_blocks evita consolidar columnas numéricas (lectura sin copia)
+    df = table.to_pandas(split_blocks=True)
+    df.attrs['version'] = meta['source_sha256']
+    return df
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Uso: python -m energia.snapshot <archivo.csv>")
+        sys.exit(1)
+    meta = compile_snapshot(sys.argv[1])
+    print(f"Snapshot compilado: {meta['rows']:,} filas · sha256 {meta['source_sha256'][:12]}")
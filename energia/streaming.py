@@ -0,0 +1,217 @@
+"""Versión por chunks del pipeline de ``notebook.py`` con memoria acotada.
+
+El CSV se recorre dos veces sin cargarlo completo:
+
+1. Se acumulan sketches de cuantiles (``QuantileSketch``) para
+   ``costo_energia_mxn`` y ``costo_por_m2``, el mínimo/máximo global de
+   ``costo_por_m2`` y conteos/sumas por estado.
+2. Con los límites ya conocidos (IQR, umbral P75, promedio global) se cuentan
+   outliers e ineficientes, se calcula el ahorro potencial y se escribe
+   ``energy_consumption_processed.csv`` chunk por chunk.
+
+La memoria pico depende del tamaño del chunk y del número de buckets del
+sketch (algunas decenas de miles de enteros), no del número de filas.
+
+Cota de error: ``QuantileSketch`` agrupa los valores en buckets logarítmicos
+de razón ``gamma = (1 + alpha) / (1 - alpha)``. Para ``alpha = 0.0001`` (por
+defecto) el cuantil estimado difiere a lo más 0.01% (error relativo) del valor
+observado de rango ``floor(q * (n - 1))``. El cuantil exacto de pandas
+interpola entre ese valor y el siguiente, así que la diferencia contra
+``Series.quantile(q)`` es a lo más ``alpha * |x|`` más la distancia entre esos
+dos valores consecutivos (despreciable con millones de filas).
+
+Uso desde la terminal::
+
+    python -m energia.streaming energy_consumption_mexico.csv --chunksize 500000
+"""
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+from energia.schema import COLUMNAS_CATEGORICAS, add_derived_metrics, cast_types, validate_schema
+
+DEFAULT_CHUNKSIZE = 250_000
+DEFAULT_ALPHA = 0.0001
+
+
+class QuantileSketch:
+    """Sketch de cuantiles con error relativo ``alpha`` que se puede combinar.
+
+    Cada valor positivo ``x`` cae en el bucket ``ceil(log_gamma(x))``; los
+    valores ``<= 0`` se cuentan aparte y se estiman como 0. Dos sketches con
+    el mismo ``alpha`` se combinan sumando sus conteos (``merge``), por lo que
+    pueden construirse por chunk o por proceso y unirse al final.
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        if not 0 < alpha < 1:
+            raise ValueError("alpha debe estar entre 0 y 1")
+        self.alpha = alpha
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self._offset = 0
+        self._counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+
+    def _grow(self, lo, hi):
+        """Amplía el arreglo de conteos para cubrir los índices ``lo..hi``."""
+        if not len(self._counts):
+            self._offset = lo
+            self._counts = np.zeros(hi - lo + 1, dtype=np.int64)
+            return
+        cur_hi = self._offset + len(self._counts) - 1
+        new_lo, new_hi = min(lo, self._offset), max(hi, cur_hi)
+        if (new_lo, new_hi) == (self._offset, cur_hi):
+            return
+        counts = np.zeros(new_hi - new_lo + 1, dtype=np.int64)
+        start = self._offset - new_lo
+        counts[start:start + len(self._counts)] = self._counts
+        self._offset, self._counts = new_lo, counts
+
+    def update(self, values):
+        """Agrega un arreglo de valores al sketch."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        self.count += len(values)
+        if not len(positive):
+            return self
+        idx = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        lo, hi = int(idx.min()), int(idx.max())
+        self._grow(lo, hi)
+        self._counts += np.bincount(idx - self._offset, minlength=len(self._counts))
+        return self
+
+    def merge(self, other):
+        """Suma los conteos de ``other`` (mismo ``alpha``) a este sketch."""
+        if other.alpha != self.alpha:
+            raise ValueError("Sólo se pueden combinar sketches con el mismo alpha")
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(other._counts):
+            self._grow(other._offset, other._offset + len(other._counts) - 1)
+            start = other._offset - self._offset
+            self._counts[start:start + len(other._counts)] += other._counts
+        return self
+
+    def to_dict(self):
+        """Representación serializable a JSON (se guarda en manifiestos)."""
+        return {'alpha': self.alpha, 'offset': self._offset, 'counts': self._counts.tolist(),
+                'zero_count': self.zero_count, 'count': self.count}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['alpha'])
+        sketch._offset = data['offset']
+        sketch._counts = np.asarray(data['counts'], dtype=np.int64)
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        return sketch
+
+    def quantile(self, q):
+        """Estimación del cuantil ``q`` (0–1) con error relativo ``alpha``."""
+        if not self.count:
+            return float('nan')
+        rank = math.floor(q * (self.count - 1))
+        if rank < self.zero_count:
+            return 0.0
+        cum = np.cumsum(self._counts)
+        i = int(np.searchsorted(cum, rank - self.zero_count, side='right'))
+        return 2 * self._gamma ** (i + self._offset) / (self._gamma + 1)
+
+
+def _read_chunks(csv_path, chunksize):
+    dtypes = {col: 'category' for col in COLUMNAS_CATEGORICAS}
+    return pd.read_csv(csv_path, dtype=dtypes, chunksize=chunksize)
+
+
+def _prepare_chunk(chunk, min_val=None, max_val=None):
+    # Los duplicados de cliente_id sólo se detectan dentro de cada chunk
+    validate_schema(chunk)
+    return add_derived_metrics(cast_types(chunk), min_val, max_val)
+
+
+def run_streaming(csv_path, output_path='energy_consumption_processed.csv',
+                  chunksize=DEFAULT_CHUNKSIZE, alpha=DEFAULT_ALPHA):
+    """Ejecuta el pipeline de ``notebook.py`` por chunks y devuelve un resumen.
+
+    El resumen incluye los límites IQR, el umbral P75, los promedios por
+    estado, el número de outliers e ineficientes y el ahorro mensual potencial.
+    """
+    # --- Pasada 1: sketches, extremos y agregados por estado ---
+    sketch_costo = QuantileSketch(alpha)
+    sketch_m2 = QuantileSketch(alpha)
+    min_val, max_val = math.inf, -math.inf
+    suma_m2 = 0.0
+    por_estado = None
+    for chunk in _read_chunks(csv_path, chunksize):
+        chunk = _prepare_chunk(chunk)
+        sketch_costo.update(chunk['costo_energia_mxn'].to_numpy())
+        sketch_m2.update(chunk['costo_por_m2'].to_numpy())
+        min_val = min(min_val, chunk['costo_por_m2'].min())
+        max_val = max(max_val, chunk['costo_por_m2'].max())
+        suma_m2 += chunk['costo_por_m2'].sum()
+        agg = (chunk.groupby('estado', observed=True)['costo_por_m2']
+               .agg(['count', 'sum']))
+        por_estado = agg if por_estado is None else por_estado.add(agg, fill_value=0)
+
+    n = sketch_m2.count
+    q1, q3 = sketch_costo.quantile(0.25), sketch_costo.quantile(0.75)
+    iqr = q3 - q1
+    lower_bound, upper_bound = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    umbral = sketch_m2.quantile(0.75)
+    promedio_m2 = suma_m2 / n
+
+    # --- Pasada 2: conteos con límites globales y escritura por chunk ---
+    n_outliers = n_ineficientes = 0
+    ahorro_total = 0.0
+    header = True
+    for chunk in _read_chunks(csv_path, chunksize):
+        chunk = _prepare_chunk(chunk, min_val, max_val)
+        costo = chunk['costo_energia_mxn']
+        n_outliers += int(((costo < lower_bound) | (costo > upper_bound)).sum())
+        inef = chunk[chunk['costo_por_m2'] > umbral]
+        n_ineficientes += len(inef)
+        ahorro_total += ((inef['costo_por_m2'] - promedio_m2) * inef['superficie_m2']).sum()
+        chunk.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+
+    media_estado = (por_estado['sum'] / por_estado['count']).sort_values(ascending=False)
+    return {
+        'filas': n,
+        'lower_bound': lower_bound,
+        'upper_bound': upper_bound,
+        'n_outliers': n_outliers,
+        'umbral': umbral,
+        'n_ineficientes': n_ineficientes,
+        'ahorro_total': ahorro_total,
+        'costo_m2_por_estado': media_estado,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path')
+    parser.add_argument('--output', default='energy_consumption_processed.csv')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                        help="Error relativo máximo de los cuantiles (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    r = run_streaming(args.csv_path, args.output, args.chunksize, args.alpha)
+    print(f"Filas procesadas: {r['filas']:,}")
+    print(f"Límites de Outliers: {r['lower_bound']:.2f} - {r['upper_bound']:.2f}")
+    print(f"Número de outliers detectados: {r['n_outliers']}")
+    print("Top 5 Estados (Costo/m2):")
+    print(r['costo_m2_por_estado'].head(5))
+    print(f"Umbral de Ineficiencia: {r['umbral']:.2f}")
+    print(f"Clientes Ineficientes: {r['n_ineficientes']}")
+    print(f"Ahorro Mensual Potencial Total: ${r['ahorro_total']:,.2f}")
+
+
+if __name__ == '__main__':
+    main()
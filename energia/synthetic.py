@@ -0,0 +1,84 @@
+"""Generador de datasets sintéticos con el esquema de ``energy_consumption_mexico.csv``.
+
+Cada fila sintética parte de una fila del CSV original elegida al azar
+(bootstrap), así que se conservan las proporciones de los 25 estados y los
+dos tipos de cliente y la distribución conjunta de ``superficie_m2``,
+``ocupantes`` y costo. El costo se perturba con ruido log-normal pequeño
+(``COST_NOISE``) para que los valores no se repitan exactamente, y
+``cliente_id`` se renumera. Se genera por bloques para escribir datasets de
+decenas de millones de filas con memoria acotada.
+
+Uso desde la terminal::
+
+    python -m energia.synthetic 1000000 synthetic_1m.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from energia.schema import COLUMNAS_ORIGEN
+
+SOURCE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'energy_consumption_mexico.csv')
+COST_NOISE = 0.03
+CHUNK_ROWS = 1_000_000
+
+# Tamaños estándar de los benchmarks
+SIZES = {'5k': 5_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+
+def _id_width(n_rows):
+    return max(4, len(str(n_rows)))
+
+
+def generate_chunks(n_rows, seed=0, source_csv=SOURCE_CSV, chunk_rows=CHUNK_ROWS):
+    """Genera ``n_rows`` filas sintéticas como DataFrames de hasta ``chunk_rows`` filas."""
+    source = pd.read_csv(source_csv, usecols=list(COLUMNAS_ORIGEN))
+    rng = np.random.default_rng(seed)
+    width = _id_width(n_rows)
+    for start in range(0, n_rows, chunk_rows):
+        size = min(chunk_rows, n_rows - start)
+        chunk = source.iloc[rng.integers(0, len(source), size)].reset_index(drop=True)
+        noise = rng.lognormal(0.0, COST_NOISE, size)
+        chunk['costo_energia_mxn'] = (chunk['costo_energia_mxn'] * noise).round(2)
+        chunk['cliente_id'] = [f'CLIENTE_{i:0{width}d}' for i in range(start + 1, start + size + 1)]
+        yield chunk
+
+
+def generate(n_rows, seed=0, source_csv=SOURCE_CSV):
+    """DataFrame sintético completo de ``n_rows`` filas (usar sólo si cabe en memoria)."""
+    return pd.concat(generate_chunks(n_rows, seed, source_csv), ignore_index=True)
+
+
+def write_csv(n_rows, path, seed=0, source_csv=SOURCE_CSV):
+    """Escribe un CSV sintético de ``n_rows`` filas por bloques y devuelve su ruta."""
+    tmp_path = path + '.tmp'
+    for i, chunk in enumerate(generate_chunks(n_rows, seed, source_csv)):
+        chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def parse_size(text):
+    """Convierte ``'5k'``, ``'1m'``, ``'10m'`` o ``'2500'`` a número de filas."""
+    text = text.lower().replace('_', '')
+    if text in SIZES:
+        return SIZES[text]
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1])
+    return int(float(text[:-1]) * factor) if factor else int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=parse_size, help="Número de filas (p. ej. 5k, 100k, 1m, 10m)")
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_csv(args.rows, args.output, args.seed)
+    print(f"Dataset sintético escrito: {args.rows:,} filas -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Índice ordenado por celda para cambiar el umbral de ineficiencia al vuelo.
+
+El cubo (``energia.cube``) guarda por celda (tipo_cliente × estado) el conteo y
+las sumas de los clientes sobre el umbral P75, fijado al construirlo. Para un
+umbral cualquiera, ``ThresholdIndex`` ordena una sola vez ``costo_por_m2``
+dentro de cada celda y guarda las sumas acumuladas de ``costo_por_m2 *
+superficie_m2`` (el costo mensual) y de ``superficie_m2`` en ese orden. Con una
+búsqueda binaria por celda se obtienen los clientes sobre el umbral y sus
+sumas, que es todo lo que necesitan los KPIs, las barras por estado y el
+ahorro potencial; mover el umbral no recorre ni reordena filas.
+
+``apply`` devuelve un ``Cube`` con esas columnas recalculadas para el umbral
+pedido, así que los paneles lo usan sin cambios.
+"""
+import numpy as np
+
+from energia.cube import Cube
+
+
+class ThresholdIndex:
+    """``costo_por_m2`` ordenado por celda con sumas acumuladas de costo y superficie."""
+
+    def __init__(self, df):
+        grouped = df.groupby(['tipo_cliente', 'estado'], observed=True, sort=True)
+        codes = grouped.ngroup().to_numpy()
+        # Mismas celdas y en el mismo orden que build_cube
+        self.cells = grouped.size().rename('n').reset_index()
+        costo_m2 = df['costo_por_m2'].to_numpy(dtype=np.float64)
+        superficie = df['superficie_m2'].to_numpy(dtype=np.float64)
+
+        order = np.lexsort((costo_m2, codes))
+        self.values = costo_m2[order]
+        self.offsets = np.r_[0, np.cumsum(self.cells['n'].to_numpy())]
+        self.cum_costo = np.r_[0.0, np.cumsum(costo_m2[order] * superficie[order])]
+        self.cum_superficie = np.r_[0.0, np.cumsum(superficie[order])]
+        # Orden global, para convertir percentiles en umbrales
+        self.sorted_global = np.sort(costo_m2)
+
+    def quantile(self, q):
+        """Cuantil ``q`` global de ``costo_por_m2`` (igual a ``Series.quantile``)."""
+        n = len(self.sorted_global)
+        pos = q * (n - 1)
+        lo = int(np.floor(pos))
+        hi = min(lo + 1, n - 1)
+        return float(np.quantile(self.sorted_global[[lo, hi]], pos - lo))
+
+    def percentile_of(self, umbral):
+        """Porcentaje de clientes con ``costo_por_m2 <= umbral``."""
+        return np.searchsorted(self.sorted_global, umbral, side='right') / len(self.sorted_global) * 100
+
+    def above(self, umbral):
+        """Por celda: clientes con ``costo_por_m2 > umbral`` y sus sumas de costo y superficie."""
+        starts, ends = self.offsets[:-1], self.offsets[1:]
+        cuts = np.array([start + np.searchsorted(self.values[start:end], umbral, side='right')
+                         for start, end in zip(starts, ends)], dtype=np.int64)
+        return (ends - cuts,
+                self.cum_costo[ends] - self.cum_costo[cuts],
+                self.cum_superficie[ends] - self.cum_superficie[cuts])
+
+    def apply(self, cube, umbral):
+        """``cube`` con los conteos y sumas de ineficientes recalculados para ``umbral``."""
+        n_inef, sum_costo, sum_superficie = self.above(umbral)
+        cells = cube.cells.assign(n_inef=n_inef, inef_sum_costo=sum_costo,
+                                  inef_sum_superficie=sum_superficie)
+        return Cube(cells, cube.comoments, umbral, cube.columns)
@@ -0,0 +1,81 @@
+"""Vistas por posición sobre el dataset compartido de sólo lectura.
+
+El dashboard carga el dataset una sola vez por proceso (``st.cache_resource``)
+y todas las sesiones leen el mismo objeto: las columnas numéricas del snapshot
+son vistas de sólo lectura sobre el memory-map de Arrow, así que además varios
+procesos del servidor comparten las mismas páginas del sistema operativo. Por
+eso el dataset no debe modificarse en ningún lugar.
+
+Filtrar no copia filas: ``RowView`` guarda la base y un arreglo de posiciones
+y sólo materializa las columnas (o las filas de una muestra) que un panel pide.
+``Selection`` agrupa todo lo que los paneles necesitan de una selección de
+filtros, de modo que puedan construirse para selecciones que no son la de la
+sesión actual (p. ej. al pre-calcular en segundo plano).
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from energia.memo import canonical_key
+
+
+class RowView:
+    """Filas ``positions`` de ``base`` sin copiarlas."""
+
+    def __init__(self, base, positions):
+        self.base = base
+        self.positions = np.asarray(positions, dtype=np.int64)
+
+    @classmethod
+    def from_mask(cls, base, mask):
+        return cls(base, np.flatnonzero(np.asarray(mask)))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def column(self, name):
+        """Valores de la columna ``name`` en las filas de la vista (copia sólo esa columna).
+
+        Las columnas numéricas se devuelven como arreglo de NumPy; las demás
+        (categorías, texto) conservan su arreglo de pandas.
+        """
+        column = self.base[name]
+        if isinstance(column.dtype, np.dtype):
+            return column.to_numpy()[self.positions]
+        return column.array.take(self.positions)
+
+    def __getitem__(self, name):
+        return pd.Series(self.column(name), name=name)
+
+    def take(self, positions):
+        """Subvista con las posiciones ``positions`` (relativas a esta vista)."""
+        return RowView(self.base, self.positions[positions])
+
+    def frame(self, columns=None):
+        """DataFrame materializado con ``columns`` (todas por defecto)."""
+        base = self.base if columns is None else self.base[columns]
+        return base.iloc[self.positions]
+
+
+class Selection(NamedTuple):
+    """Una selección de filtros: clave canónica, máscaras y vista de sus filas."""
+    tipos: tuple
+    estados: tuple
+    key: tuple
+    row_mask: np.ndarray
+    cube_mask: np.ndarray
+    rows: RowView
+
+
+def select(df, cube, tipos, estados, mask=None):
+    """``Selection`` de ``df`` (y de las celdas de ``cube``) para los filtros dados.
+
+    ``mask`` es la máscara de filas ya calculada (p. ej. por el backend de
+    consultas de ``energia.query``); sin ella se filtra ``df``.
+    """
+    if mask is None:
+        mask = (df['tipo_cliente'].isin(tipos) & df['estado'].isin(estados)).to_numpy()
+    return Selection(tuple(tipos), tuple(estados),
+                     canonical_key(tipos, estados, df.attrs['version']),
+                     mask, cube.mask(tipos, estados), RowView.from_mask(df, mask))
@@ -9,7 +9,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy import stats
+
+from energia.mannwhitney import MannWhitneyEngine
 
 # Configuración visual
 plt.style.use('ggplot')
@@ -102,11 +103,13 @@ print("Top 5 Estados (Costo/m2):")
 print(top_states)
 
 # Prueba Mann-Whitney (Comercial vs Residencial)
-comercial = df[df['tipo_cliente'] == 'Comercial']['costo_por_m2']
-residencial = df[df['tipo_cliente'] == 'Residencial']['costo_por_m2']
-stat, p_val = stats.mannwhitneyu(comercial, residencial)
+mw = MannWhitneyEngine(df['costo_por_m2'], df['tipo_cliente'], df['estado'])
+p_val = mw.test()['p_value']
 print(f"Mann-Whitney p-value: {p_val:.4f}")
 
+# Misma prueba por estado, reutilizando el ordenamiento
+print(mw.by_stratum()[['n_a', 'n_b', 'p_value']].sort_values('p_value'))
+
 # Umbral de Ineficiencia (> P75)
 umbral = df['costo_por_m2'].quantile(0.75)
 ineficientes = df[df['costo_por_m2'] > umbral].copy()
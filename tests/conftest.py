@@ -0,0 +1,10 @@
+import pytest
+
+from energia.schema import add_derived_metrics, cast_types
+from energia.synthetic import generate
+
+
+@pytest.fixture(scope='session')
+def df():
+    """Dataset sintético pequeño con el esquema del CSV original."""
+    return add_derived_metrics(cast_types(generate(5000, seed=7)))
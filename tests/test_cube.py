@@ -0,0 +1,82 @@
+"""El cubo responde igual que pandas sobre las filas de la selección."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from energia.cube import build_cube
+from energia.schema import COLUMNAS_NUMERICAS
+
+SELECCIONES = [
+    (['Comercial', 'Residencial'], None),
+    (['Comercial'], None),
+    (['Residencial'], ['Jalisco', 'Nuevo León', 'Yucatán']),
+    (['Comercial', 'Residencial'], ['Ciudad de México']),
+]
+
+
+@pytest.fixture(scope='module')
+def umbral(df):
+    return df['costo_por_m2'].quantile(0.75)
+
+
+@pytest.fixture(scope='module')
+def cube(df, umbral):
+    return build_cube(df, umbral)
+
+
+def _select(df, cube, tipos, estados):
+    estados = list(df['estado'].cat.categories) if estados is None else estados
+    rows = df[df['tipo_cliente'].isin(tipos) & df['estado'].isin(estados)]
+    return rows, cube.mask(tipos, estados)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES)
+def test_kpis(df, cube, umbral, tipos, estados):
+    rows, mask = _select(df, cube, tipos, estados)
+    kpis = cube.kpis(mask)
+    assert kpis['n'] == len(rows)
+    assert kpis['avg_cost'] == pytest.approx(rows['costo_energia_mxn'].mean(), rel=1e-12)
+    assert kpis['avg_cost_m2'] == pytest.approx(rows['costo_por_m2'].mean(), rel=1e-12)
+    assert kpis['avg_cost_occ'] == pytest.approx(rows['costo_por_ocupante'].mean(), rel=1e-12)
+    assert kpis['n_ineficientes'] == (rows['costo_por_m2'] > umbral).sum()
+    assert kpis['pct_ineficientes'] == pytest.approx((rows['costo_por_m2'] > umbral).mean() * 100)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES)
+def test_by_estado(df, cube, umbral, tipos, estados):
+    rows, mask = _select(df, cube, tipos, estados)
+    grouped = rows.groupby('estado', observed=True)
+    expected = pd.DataFrame({
+        'n_clientes': grouped.size(),
+        'costo_medio_m2': grouped['costo_por_m2'].mean(),
+        'pct_ineficientes': grouped['costo_por_m2'].apply(lambda s: (s > umbral).mean() * 100),
+    })
+    pd.testing.assert_frame_equal(cube.by_estado(mask), expected, check_dtype=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES)
+def test_corr_and_polyfit(df, cube, tipos, estados):
+    rows, mask = _select(df, cube, tipos, estados)
+    pd.testing.assert_frame_equal(cube.corr(mask), rows[COLUMNAS_NUMERICAS].corr(), rtol=1e-10)
+    slope, intercept = cube.polyfit(mask, 'superficie_m2', 'costo_energia_mxn')
+    expected = np.polyfit(rows['superficie_m2'], rows['costo_energia_mxn'], 1)
+    np.testing.assert_allclose([slope, intercept], expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES)
+def test_extent_and_savings(df, cube, umbral, tipos, estados):
+    rows, mask = _select(df, cube, tipos, estados)
+    assert cube.extent(mask, 'costo_por_m2') == (rows['costo_por_m2'].min(), rows['costo_por_m2'].max())
+
+    inef = rows[rows['costo_por_m2'] > umbral]
+    expected = (inef['costo_energia_mxn'] - rows['costo_por_m2'].mean() * inef['superficie_m2']).sum()
+    savings = cube.savings(mask)
+    assert savings['n_ineficientes'] == len(inef)
+    assert savings['ahorro_total'] == pytest.approx(expected, rel=1e-9)
+
+
+def test_empty_selection(df, cube):
+    mask = cube.mask([], [])
+    assert cube.kpis(mask)['n'] == 0
+    assert cube.by_estado(mask).empty
+    assert cube.savings(mask)['n_ineficientes'] == 0
@@ -0,0 +1,48 @@
+"""El motor Mann-Whitney coincide con ``scipy.stats.mannwhitneyu``."""
+import numpy as np
+import pytest
+from scipy import stats
+
+from energia.mannwhitney import MannWhitneyEngine
+
+
+@pytest.fixture(scope='module')
+def engine(df):
+    return MannWhitneyEngine(df['costo_por_m2'], df['tipo_cliente'], df['estado'])
+
+
+def _scipy(df, mask):
+    rows = df[mask]
+    a = rows.loc[rows['tipo_cliente'] == 'Comercial', 'costo_por_m2']
+    b = rows.loc[rows['tipo_cliente'] == 'Residencial', 'costo_por_m2']
+    return stats.mannwhitneyu(a, b, alternative='two-sided'), len(a), len(b)
+
+
+def _check(result, expected, n_a, n_b):
+    assert (result['n_a'], result['n_b']) == (n_a, n_b)
+    assert result['u'] == expected.statistic
+    assert abs(result['p_value'] - expected.pvalue) <= 1e-9
+
+
+@pytest.mark.parametrize('estados', [None, ['Jalisco', 'Nuevo León'], ['Yucatán']])
+def test_matches_scipy(df, engine, estados):
+    mask = np.ones(len(df), dtype=bool) if estados is None else df['estado'].isin(estados).to_numpy()
+    expected, n_a, n_b = _scipy(df, mask)
+    _check(engine.test(mask), expected, n_a, n_b)
+
+
+def test_small_samples_use_exact_distribution(df, engine):
+    # Pocas filas por grupo: SciPy usa la distribución exacta y el motor delega en ella
+    comercial = np.flatnonzero(df['tipo_cliente'].to_numpy() == 'Comercial')[:5]
+    residencial = np.flatnonzero(df['tipo_cliente'].to_numpy() == 'Residencial')[:7]
+    mask = np.zeros(len(df), dtype=bool)
+    mask[np.r_[comercial, residencial]] = True
+    expected, n_a, n_b = _scipy(df, mask)
+    _check(engine.test(mask), expected, n_a, n_b)
+
+
+def test_by_stratum_matches_scipy(df, engine):
+    table = engine.by_stratum()
+    for estado, row in table.iterrows():
+        expected, n_a, n_b = _scipy(df, (df['estado'] == estado).to_numpy())
+        _check(row, expected, n_a, n_b)
@@ -0,0 +1,88 @@
+"""Las páginas de ``SortIndex`` coinciden con ordenar la selección con pandas."""
+import numpy as np
+import pytest
+
+from energia import ordering
+from energia.ordering import PAGE_SIZE, SortIndex
+
+COLUMNAS = ['cliente_id', 'tipo_cliente', 'estado', 'ocupantes', 'costo_por_m2', 'con_faltantes']
+
+
+@pytest.fixture(scope='module')
+def datos(df):
+    # Una columna con empates y faltantes, que van al final en ambos sentidos
+    con_faltantes = df['ocupantes'].astype(np.float64).round(-1)
+    con_faltantes[np.random.default_rng(1).random(len(df)) < 0.05] = np.nan
+    return df.assign(con_faltantes=con_faltantes).reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def index(datos):
+    return SortIndex({c: datos[c] for c in COLUMNAS})
+
+
+@pytest.fixture(scope='module', params=['todas', 'filtrada', 'vacia'])
+def mask(request, datos):
+    if request.param == 'todas':
+        return np.ones(len(datos), dtype=bool)
+    if request.param == 'vacia':
+        return np.zeros(len(datos), dtype=bool)
+    return (datos['tipo_cliente'].eq('Comercial')
+            & (datos['costo_por_m2'] > datos['costo_por_m2'].quantile(0.5))).to_numpy()
+
+
+@pytest.fixture(params=[ordering.BLOCK_SIZE, 64])
+def block_size(request, monkeypatch):
+    # Con bloques chicos las páginas cruzan muchos bordes de bloque
+    monkeypatch.setattr(ordering, 'BLOCK_SIZE', request.param)
+    return request.param
+
+
+def _expected(datos, mask, column, descending):
+    return (datos.loc[mask, [column]]
+            .sort_values(column, ascending=not descending, kind='stable')
+            .index.to_numpy())
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('column', COLUMNAS)
+def test_pages_match_sort_values(datos, index, mask, block_size, column, descending):
+    expected = _expected(datos, mask, column, descending)
+    counts = index.block_counts(column, mask, descending)
+    n_pages = -(-len(expected) // PAGE_SIZE)
+    # Primeras, intermedias, la última (parcial) y más allá del final
+    for page in sorted({0, 1, n_pages // 2, n_pages - 1, n_pages, n_pages + 5} - {-1}):
+        got = index.page(column, mask, page, PAGE_SIZE, descending, counts)
+        np.testing.assert_array_equal(got, expected[page * PAGE_SIZE:(page + 1) * PAGE_SIZE])
+
+
+def test_last_partial_page_and_beyond(datos, index):
+    mask = np.zeros(len(datos), dtype=bool)
+    mask[::7] = True
+    total = int(mask.sum())
+    assert total % PAGE_SIZE
+    expected = _expected(datos, mask, 'costo_por_m2', True)
+    last = total // PAGE_SIZE
+    got = index.page('costo_por_m2', mask, last, PAGE_SIZE, True)
+    assert len(got) == total % PAGE_SIZE
+    np.testing.assert_array_equal(got, expected[last * PAGE_SIZE:])
+    assert len(index.page('costo_por_m2', mask, last + 1, PAGE_SIZE, True)) == 0
+
+
+@pytest.mark.parametrize('delta', [-1, 0, 1])
+def test_pages_across_block_boundaries(datos, index, block_size, delta):
+    page_size = block_size + delta
+    mask = np.ones(len(datos), dtype=bool)
+    expected = _expected(datos, mask, 'costo_por_m2', False)
+    for page in range(-(-len(expected) // page_size)):
+        np.testing.assert_array_equal(index.page('costo_por_m2', mask, page, page_size),
+                                      expected[page * page_size:(page + 1) * page_size])
+
+
+def test_block_counts(datos, index, mask, block_size):
+    counts = index.block_counts('estado', mask, descending=True)
+    assert len(counts) == -(-len(datos) // block_size)
+    assert counts[-1] == mask.sum()
+    order = index.order('estado', descending=True)
+    np.testing.assert_array_equal(counts, np.cumsum(mask[order])[
+        np.minimum(np.arange(1, len(counts) + 1) * block_size, len(order)) - 1])
@@ -0,0 +1,66 @@
+"""Los pares del KD-tree coinciden con una búsqueda por fuerza bruta."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from energia.peers import FEATURES, PeerIndex
+
+K = 10
+
+
+@pytest.fixture(scope='module')
+def index(df):
+    return PeerIndex(df, k=K)
+
+
+@pytest.fixture(scope='module')
+def muestra(df):
+    return np.random.default_rng(5).choice(len(df), 300, replace=False)
+
+
+def _brute_force(df, index, pos):
+    """Distancias (escaladas) de ``pos`` a todas las demás filas de su grupo."""
+    same = ((df['tipo_cliente'] == df['tipo_cliente'].iloc[pos])
+            & (df['estado'] == df['estado'].iloc[pos]))
+    if 'periodo' in df:
+        same &= df['periodo'] == df['periodo'].iloc[pos]
+    same = same.to_numpy(copy=True)
+    same[pos] = False
+    rows = np.flatnonzero(same)
+    points = df[FEATURES].to_numpy(dtype=np.float64) / index.scale
+    return rows, np.linalg.norm(points[rows] - points[pos], axis=1)
+
+
+def test_peers_match_brute_force(df, index, muestra):
+    for pos in muestra:
+        rows, dist = _brute_force(df, index, pos)
+        peers, peer_dist = index.peers_of(pos)
+        k = min(K, len(rows))
+        expected = np.sort(dist)[:k]
+        assert pos not in peers and len(set(peers)) == k
+        np.testing.assert_allclose(np.sort(peer_dist), expected, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(peer_dist, dist[np.searchsorted(rows, peers)], atol=1e-12)
+        # Con empates en la k-ésima distancia cualquier fila empatada vale; las más cercanas no
+        assert set(rows[dist < expected[-1] - 1e-12]) <= set(peers)
+
+
+def test_score_matches_peers_of(df, index, muestra):
+    score = index.score()
+    costo = df['costo_por_m2'].to_numpy()
+    for pos in muestra:
+        vecinos = costo[index.peers_of(pos)[0]]
+        assert score['pares_mediana_m2'].iloc[pos] == pytest.approx(np.median(vecinos), rel=1e-12)
+        assert score['pares_p75_m2'].iloc[pos] == pytest.approx(np.quantile(vecinos, 0.75), rel=1e-12)
+        assert score['percentil_pares'].iloc[pos] == pytest.approx((vecinos < costo[pos]).mean())
+
+
+def test_groups_by_period(df):
+    periodos = pd.concat([df.assign(periodo='2026-01'), df.assign(periodo='2026-02')],
+                         ignore_index=True)
+    periodos['periodo'] = periodos['periodo'].astype('category')
+    index = PeerIndex(periodos, k=K)
+    for pos in (0, len(df) + 17):
+        rows, dist = _brute_force(periodos, index, pos)
+        peers, peer_dist = index.peers_of(pos)
+        assert (periodos['periodo'].iloc[peers] == periodos['periodo'].iloc[pos]).all()
+        np.testing.assert_allclose(np.sort(peer_dist), np.sort(dist)[:K], atol=1e-12)
@@ -0,0 +1,96 @@
+"""Los backends de consultas responden igual que pandas sobre las filas de la selección."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from energia.cube import build_cube
+from energia.query import ArrowBackend, PandasBackend
+from energia.schema import COLUMNAS_NUMERICAS
+from energia.snapshot import load_snapshot
+from energia.synthetic import generate
+from energia.threshold import ThresholdIndex
+
+SELECCIONES = [
+    (None, None),
+    (['Comercial'], None),
+    (['Residencial'], ['Jalisco', 'Nuevo León', 'Yucatán']),
+    (None, ['Ciudad de México']),
+]
+CUANTILES = [0.0, 0.25, 0.75, 0.999, 1.0]
+
+
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory):
+    # Los mismos datos que el fixture ``df``, escritos como CSV para el snapshot Arrow
+    path = tmp_path_factory.mktemp('query') / 'datos.csv'
+    generate(5000, seed=7).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def snapshot_df(csv_path):
+    return load_snapshot(csv_path)
+
+
+@pytest.fixture(scope='module', params=['pandas', 'pandas_cubo', 'arrow'])
+def backend(request, csv_path, snapshot_df):
+    if request.param == 'arrow':
+        return ArrowBackend.from_csv(csv_path, batch_size=1000)
+    if request.param == 'pandas_cubo':
+        umbral = snapshot_df['costo_por_m2'].quantile(0.75)
+        return PandasBackend(snapshot_df, build_cube(snapshot_df, umbral), ThresholdIndex(snapshot_df))
+    return PandasBackend(snapshot_df)
+
+
+def _rows(df, tipos, estados):
+    mask = np.ones(len(df), dtype=bool)
+    if tipos is not None:
+        mask &= df['tipo_cliente'].isin(tipos).to_numpy()
+    if estados is not None:
+        mask &= df['estado'].isin(estados).to_numpy()
+    return mask, df[mask]
+
+
+def test_snapshot_matches_fixture(df, snapshot_df):
+    pd.testing.assert_frame_equal(snapshot_df[df.columns], df, check_categorical=False)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES + [([], None)])
+def test_count_and_mask(df, backend, tipos, estados):
+    mask, rows = _rows(df, tipos, estados)
+    assert backend.count(tipos, estados) == len(rows)
+    np.testing.assert_array_equal(backend.mask(tipos, estados), mask)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES)
+@pytest.mark.parametrize('q', CUANTILES)
+def test_quantile(df, backend, tipos, estados, q):
+    _, rows = _rows(df, tipos, estados)
+    expected = rows['costo_por_m2'].quantile(q)
+    assert backend.quantile('costo_por_m2', q, tipos, estados) == pytest.approx(expected, rel=1e-12)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES)
+@pytest.mark.parametrize('cuantil', [0.5, 0.75, 0.9])
+def test_by_estado(df, backend, tipos, estados, cuantil):
+    _, rows = _rows(df, tipos, estados)
+    umbral = df['costo_por_m2'].quantile(cuantil)
+    grouped = rows.groupby('estado', observed=True)['costo_por_m2']
+    result = backend.by_estado(umbral, tipos, estados)
+    np.testing.assert_array_equal(result.index.astype(str), grouped.size().index.astype(str))
+    np.testing.assert_array_equal(result['n_clientes'], grouped.size())
+    np.testing.assert_allclose(result['costo_medio_m2'], grouped.mean(), rtol=1e-12)
+    np.testing.assert_allclose(result['pct_ineficientes'],
+                               grouped.apply(lambda s: (s > umbral).mean() * 100), rtol=1e-12)
+
+
+@pytest.mark.parametrize('tipos, estados', SELECCIONES)
+def test_corr(df, backend, tipos, estados):
+    _, rows = _rows(df, tipos, estados)
+    np.testing.assert_allclose(backend.corr(tipos, estados).to_numpy(),
+                               rows[COLUMNAS_NUMERICAS].corr().to_numpy(), rtol=1e-9, atol=1e-12)
+
+
+def test_empty_selection(backend):
+    assert len(backend.by_estado(0.0, [], None)) == 0
+    assert np.isnan(backend.quantile('costo_por_m2', 0.5, [], None))
@@ -0,0 +1,79 @@
+"""La simulación de retrofit no depende del número de procesos y respeta el presupuesto."""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from energia.export import inefficient_positions
+from energia.simulation import _BLOCK_ELEMENTS, Scenario, _funded, simulate
+
+N_SIMS = 8000
+
+
+@pytest.fixture(scope='module')
+def clientes(df):
+    costo_m2 = df['costo_por_m2'].to_numpy()
+    pos = inefficient_positions(costo_m2, np.ones(len(df), dtype=bool),
+                                df['costo_por_m2'].quantile(0.75))
+    estados = df['estado'].iloc[pos].cat.remove_unused_categories()
+    # Varios bloques de simulaciones, para que dos procesos se repartan trabajo
+    assert N_SIMS > 2 * (_BLOCK_ELEMENTS // len(pos))
+    return df['costo_energia_mxn'].to_numpy()[pos], df['superficie_m2'].to_numpy()[pos], estados
+
+
+@pytest.fixture(scope='module')
+def pool():
+    # spawn, como el dashboard: el proceso de pruebas ya tiene hilos
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield pool
+
+
+def _scenario(estados, budget=None):
+    n = len(estados.cat.categories)
+    # Adopción distinta por estado, con un estado sin adopción
+    return Scenario(tuple(np.linspace(0, 0.8, n)), (0.15, 0.20), budget, 250.0)
+
+
+@pytest.mark.parametrize('budget', [None, 2e6])
+def test_same_result_with_any_worker_count(clientes, pool, budget):
+    costo, superficie, estados = clientes
+    scenario = _scenario(estados, budget)
+    uno = simulate(costo, superficie, estados, scenario, N_SIMS, seed=3, workers=1)
+    dos = simulate(costo, superficie, estados, scenario, N_SIMS, seed=3, workers=2, executor=pool)
+    pd.testing.assert_frame_equal(uno, dos, check_exact=True)
+
+
+def test_budget_caps_investment(clientes):
+    costo, superficie, estados = clientes
+    budget = 2e6
+    sin_tope = simulate(costo, superficie, estados, _scenario(estados), N_SIMS, workers=1)
+    con_tope = simulate(costo, superficie, estados, _scenario(estados, budget), N_SIMS, workers=1)
+    assert con_tope.loc['Total', 'inversion_p50'] <= budget
+    assert sin_tope.loc['Total', 'inversion_p50'] > budget
+    assert con_tope.loc['Total', 'retrofits_p50'] < sin_tope.loc['Total', 'retrofits_p50']
+    # Un presupuesto que alcanza para todos da lo mismo que no tener tope
+    holgado = simulate(costo, superficie, estados, _scenario(estados, 1e18), N_SIMS, workers=1)
+    pd.testing.assert_frame_equal(holgado, sin_tope, check_exact=True)
+
+
+@pytest.mark.parametrize('budget', [0.0, 5e4, 1e6, 1e9])
+def test_funded_is_priority_prefix(clientes, budget):
+    _, superficie, estados = clientes
+    rng = np.random.default_rng(0)
+    codes = estados.cat.codes.to_numpy().astype(np.int64)
+    order = np.argsort(codes, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    # Inversión por simulación y cliente, con los clientes agrupados por estado
+    joins = rng.random((50, len(codes))) < 0.3
+    inversion = (joins * (250.0 * superficie))[:, order].astype(np.float32)
+
+    funded = _funded(inversion, order, rank, budget)
+    for sim in range(len(inversion)):
+        # Orden de prioridad: se financia mientras la suma acumulada no pase del presupuesto
+        spent = np.cumsum(inversion[sim, rank], dtype=np.float64)
+        expected = spent <= budget
+        np.testing.assert_array_equal(funded[sim, rank], expected)
+        assert (inversion[sim] * funded[sim]).sum(dtype=np.float64) <= budget
@@ -0,0 +1,43 @@
+"""``QuantileSketch`` cumple la cota de error documentada y se combina sin pérdida."""
+import numpy as np
+import pytest
+
+from energia.streaming import QuantileSketch
+
+CUANTILES = [0.0, 0.01, 0.25, 0.5, 0.75, 0.95, 0.999, 1.0]
+
+
+@pytest.fixture(scope='module')
+def values():
+    """Muestra sesgada (lognormal) con algunos ceros, como los costos reales."""
+    rng = np.random.default_rng(3)
+    return np.r_[rng.lognormal(6, 1.5, 200_000), np.zeros(500)]
+
+
+@pytest.mark.parametrize('alpha', [0.0001, 0.01])
+@pytest.mark.parametrize('q', CUANTILES)
+def test_relative_error(values, alpha, q):
+    sketch = QuantileSketch(alpha).update(values)
+    # La cota es contra el valor observado de rango floor(q * (n - 1))
+    expected = np.quantile(values, q, method='lower')
+    assert abs(sketch.quantile(q) - expected) <= alpha * abs(expected)
+
+
+def test_merge_matches_single_sketch(values):
+    whole = QuantileSketch().update(values)
+    merged = QuantileSketch()
+    for part in np.array_split(np.random.default_rng(0).permutation(values), 7):
+        merged.merge(QuantileSketch().update(part))
+    assert (merged.count, merged.zero_count) == (whole.count, whole.zero_count)
+    assert [merged.quantile(q) for q in CUANTILES] == [whole.quantile(q) for q in CUANTILES]
+
+
+def test_merge_with_empty_and_round_trip(values):
+    sketch = QuantileSketch().merge(QuantileSketch()).merge(QuantileSketch().update(values))
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert [restored.quantile(q) for q in CUANTILES] == [sketch.quantile(q) for q in CUANTILES]
+
+
+def test_merge_rejects_other_alpha():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.001))
@@ -0,0 +1,95 @@
+"""``ThresholdIndex`` cuenta y suma igual que un filtro directo de pandas para cualquier umbral."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from energia.cube import build_cube
+from energia.threshold import ThresholdIndex
+
+CELDA = ['tipo_cliente', 'estado']
+
+
+@pytest.fixture(scope='module')
+def index(df):
+    return ThresholdIndex(df)
+
+
+def _umbrales(df):
+    costo = np.sort(df['costo_por_m2'].to_numpy())
+    return {
+        'bajo_el_minimo': costo[0] - 1,
+        'en_el_minimo': costo[0],
+        'en_un_valor': costo[len(costo) // 3],
+        'p75': df['costo_por_m2'].quantile(0.75),
+        'en_el_maximo': costo[-1],
+        'sobre_el_maximo': costo[-1] + 1,
+    }
+
+
+def _expected(df, index, umbral):
+    """Conteo y sumas por celda de las filas con ``costo_por_m2 > umbral``, con ceros donde no hay."""
+    sobre = df[df['costo_por_m2'] > umbral]
+    agg = (sobre.assign(costo=sobre['costo_por_m2'] * sobre['superficie_m2'])
+           .groupby(CELDA, observed=True)
+           .agg(n=('costo', 'size'), costo=('costo', 'sum'), superficie=('superficie_m2', 'sum')))
+    return agg.reindex(pd.MultiIndex.from_frame(index.cells[CELDA]), fill_value=0)
+
+
+@pytest.mark.parametrize('caso', ['bajo_el_minimo', 'en_el_minimo', 'en_un_valor', 'p75',
+                                  'en_el_maximo', 'sobre_el_maximo'])
+def test_above_matches_filter(df, index, caso):
+    umbral = _umbrales(df)[caso]
+    n_inef, sum_costo, sum_superficie = index.above(umbral)
+    expected = _expected(df, index, umbral)
+    np.testing.assert_array_equal(n_inef, expected['n'])
+    np.testing.assert_allclose(sum_costo, expected['costo'], rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(sum_superficie, expected['superficie'], rtol=1e-9, atol=1e-6)
+
+
+def test_extremes(df, index):
+    umbrales = _umbrales(df)
+    assert (index.above(umbrales['bajo_el_minimo'])[0] == index.cells['n']).all()
+    assert index.above(umbrales['en_el_maximo'])[0].sum() == 0
+    assert index.above(umbrales['sobre_el_maximo'])[0].sum() == 0
+    # Comparación estricta: las filas iguales al umbral no cuentan
+    en_un_valor = umbrales['en_un_valor']
+    assert index.above(en_un_valor)[0].sum() == (df['costo_por_m2'] > en_un_valor).sum()
+
+
+def test_cells_without_inefficient_clients(df, index):
+    # Umbral que deja sin ineficientes a la celda de menor costo máximo y no a las demás
+    maximos = df.groupby(CELDA, observed=True)['costo_por_m2'].max()
+    umbral = maximos.min()
+    n_inef = index.above(umbral)[0]
+    vacias = n_inef == 0
+    assert vacias.any() and not vacias.all()
+    np.testing.assert_array_equal(n_inef, _expected(df, index, umbral)['n'])
+
+
+def test_single_row_cell(df):
+    # Una celda con una sola fila, justo en el umbral y por encima de él
+    sola = df.iloc[[0]].assign(estado=pd.Categorical(['Zacatecas'], categories=df['estado'].cat.categories))
+    resto = df[df['estado'] != 'Zacatecas']
+    datos = pd.concat([resto, sola], ignore_index=True)
+    index = ThresholdIndex(datos)
+    assert index.cells.loc[index.cells['estado'] == 'Zacatecas', 'n'].tolist() == [1]
+    valor = sola['costo_por_m2'].iloc[0]
+    for umbral in (valor, np.nextafter(valor, -np.inf)):
+        np.testing.assert_array_equal(index.above(umbral)[0], _expected(datos, index, umbral)['n'])
+
+
+@pytest.mark.parametrize('caso', ['bajo_el_minimo', 'en_un_valor', 'p75', 'sobre_el_maximo'])
+def test_apply_matches_build_cube(df, index, caso):
+    umbral = _umbrales(df)[caso]
+    applied = index.apply(build_cube(df, df['costo_por_m2'].quantile(0.75)), umbral).cells
+    rebuilt = build_cube(df, umbral).cells
+    np.testing.assert_array_equal(applied['n_inef'], rebuilt['n_inef'])
+    for col in ('inef_sum_costo', 'inef_sum_superficie'):
+        np.testing.assert_allclose(applied[col], rebuilt[col], rtol=1e-9, atol=1e-6)
+
+
+@pytest.mark.parametrize('q', [0.0, 0.1, 0.5, 0.75, 0.999, 1.0])
+def test_quantile_and_percentile(df, index, q):
+    umbral = index.quantile(q)
+    assert umbral == pytest.approx(df['costo_por_m2'].quantile(q), rel=1e-12)
+    assert index.percentile_of(umbral) == pytest.approx((df['costo_por_m2'] <= umbral).mean() * 100)